@@ -12,8 +12,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 import sys
+import tempfile
 from pathlib import Path
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'loans.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -102,13 +106,86 @@ else:
         }
     }
 
+# SQLite ignores select_for_update(), which create-loan, id block reservation,
+# rescoring chunks and the rollup watermark all rely on. In SQLite's default
+# DEFERRED mode two such read-then-write transactions fail with "database is
+# locked" rather than wait, so every transaction on SQLite begins IMMEDIATE:
+# it takes the write lock up front and waits up to `timeout` seconds for it.
+# This applies to every atomic() block, read-only ones included, which
+# serializes them; SQLite is the development and test backend, and
+# PostgreSQL (DATABASE_URL) keeps its row locks and concurrent readers.
+SQLITE_OPTIONS = {'transaction_mode': 'IMMEDIATE', 'timeout': 20}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update(SQLITE_OPTIONS)
+
 if 'test' in sys.argv:
+    # A file rather than :memory:, whose shared cache fails concurrent
+    # writers instead of making them wait.
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
+        'OPTIONS': SQLITE_OPTIONS,
+        # Named per run so that concurrent test runs do not share one file.
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), f'credit_approval_test_{os.getpid()}.sqlite3')},
     }
 
 
+# Caches
+# Credit scores are cached in their own alias. Set SCORE_CACHE_URL to a Redis
+# URL to share the cache between workers; give that Redis a maxmemory with the
+# volatile-lru policy so score keys (which all carry a TTL) are evicted first.
+
+SCORE_CACHE_TIMEOUT = int(os.getenv('SCORE_CACHE_TIMEOUT', 300))
+SCORE_CACHE_URL = os.getenv('SCORE_CACHE_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'scores': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'credit-scores',
+        'TIMEOUT': SCORE_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('SCORE_CACHE_MAX_ENTRIES', 10000))},
+    },
+}
+if SCORE_CACHE_URL:
+    CACHES['scores'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SCORE_CACHE_URL,
+        'TIMEOUT': SCORE_CACHE_TIMEOUT,
+        'KEY_PREFIX': 'scores',
+    }
+
+SCORE_CACHE_ALIAS = 'scores'
+
+# Concurrent score cache misses for one customer are computed once: other
+# callers wait up to SCORE_SINGLE_FLIGHT_WAIT seconds for the first one's
+# result, in other processes through a lock in the score cache that expires
+# after SCORE_SINGLE_FLIGHT_LOCK_TIMEOUT seconds should its holder die.
+SCORE_SINGLE_FLIGHT_WAIT = float(os.getenv('SCORE_SINGLE_FLIGHT_WAIT', 2))
+SCORE_SINGLE_FLIGHT_LOCK_TIMEOUT = int(os.getenv('SCORE_SINGLE_FLIGHT_LOCK_TIMEOUT', 10))
+
+# Celery task durations are counted in this cache so /metrics on the web
+# server can report tasks run by the workers. Point METRICS_CACHE_URL at the
+# Redis both of them reach; the local-memory default only sees this process.
+METRICS_CACHE_URL = os.getenv('METRICS_CACHE_URL')
+CACHES['metrics'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'metrics',
+    'TIMEOUT': None,
+}
+if METRICS_CACHE_URL:
+    CACHES['metrics'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': METRICS_CACHE_URL,
+        'TIMEOUT': None,
+        'KEY_PREFIX': 'metrics',
+    }
+
+METRICS_CACHE_ALIAS = 'metrics'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -149,6 +226,31 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Portfolio analytics rollups: an incremental refresh every
+# PORTFOLIO_REFRESH_SECONDS and a full rebuild once a day, which also moves
+# customers into new score bands when the year turns over.
+PORTFOLIO_REFRESH_SECONDS = int(os.getenv('PORTFOLIO_REFRESH_SECONDS', 300))
+CELERY_BEAT_SCHEDULE = {
+    'refresh-portfolio-rollups': {
+        'task': 'loans.tasks.refresh_portfolio_rollups',
+        'schedule': PORTFOLIO_REFRESH_SECONDS,
+    },
+    'rebuild-portfolio-rollups': {
+        'task': 'loans.tasks.refresh_portfolio_rollups',
+        'schedule': crontab(hour=2, minute=0),
+        'kwargs': {'full': True},
+    },
+    'rescore-customers': {
+        'task': 'loans.tasks.start_rescore',
+        'schedule': crontab(hour=1, minute=0),
+    },
+}
+if 'test' in sys.argv:
+    # Run tasks in-process against an in-memory broker during tests.
+    CELERY_BROKER_URL = 'memory://'
+    CELERY_RESULT_BACKEND = 'cache+memory://'
+    CELERY_TASK_ALWAYS_EAGER = True
+    CELERY_TASK_EAGER_PROPAGATES = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [
@@ -159,3 +261,54 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'loans.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Serve view-loan, view-loans, track-loans and check-eligibility from the async
+# views in loans.async_views. Only worth it under an ASGI server (see asgi.py).
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+# Largest number of applications accepted by /api/check-eligibility/batch
+ELIGIBILITY_BATCH_MAX_ITEMS = 10000
+# Largest (loan_amount x tenure x interest_rate) grid evaluated by /api/offers
+OFFER_GRID_MAX_CELLS = 10000
+# Largest number of applicants accepted by /api/register/bulk
+REGISTER_BULK_MAX_ITEMS = 10000
+
+# customer_id/loan_id values each worker thread reserves at a time
+ID_BLOCK_SIZE = int(os.getenv('ID_BLOCK_SIZE', 100))
+
+# Customers recounted per query by a portfolio rollup refresh, and how far
+# (seconds) each incremental refresh looks back before the last watermark
+PORTFOLIO_REFRESH_CHUNK_SIZE = 1000
+PORTFOLIO_WATERMARK_LAG = int(os.getenv('PORTFOLIO_WATERMARK_LAG', 60))
+
+# Customers per task of the nightly rescoring (loans.tasks.start_rescore)
+RESCORE_CHUNK_SIZE = int(os.getenv('RESCORE_CHUNK_SIZE', 1000))
+
+# Cursor pagination of /api/view-loans and /api/track-loans: default and
+# largest page size when a client passes cursor/limit
+LOAN_LIST_PAGE_SIZE = 100
+LOAN_LIST_MAX_PAGE_SIZE = 1000
+
+# Rows fetched per round trip by /api/export/* and the export_data command
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Columnar snapshot compiled by `manage.py compile_snapshot` (loans.columnar)
+LOAN_SNAPSHOT_DIR = os.getenv('LOAN_SNAPSHOT_DIR', BASE_DIR / 'snapshots')
+
+# Bulk ingestion: rows per bulk_create batch, and whether rows whose
+# customer_id/loan_id already exists are skipped ('ignore') or overwritten ('update')
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 1000))
+INGEST_CONFLICT_MODE = os.getenv('INGEST_CONFLICT_MODE', 'ignore')
+# Rows per parallel shard when `manage.py ingest_data` fans ingestion out
+INGEST_SHARD_SIZE = int(os.getenv('INGEST_SHARD_SIZE', 5000))
+
+# Uploaded files are spooled here until the process_upload task has streamed
+# them; it must be shared between the web and worker containers.
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', BASE_DIR / 'spool')
@@ -16,10 +16,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from loans.views import prometheus_metrics
 from .views import home
 
 urlpatterns = [
     path('', home, name='home'),
     path('admin/', admin.site.urls),
     path('api/', include('loans.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
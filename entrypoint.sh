@@ -33,7 +33,6 @@ else:
 "
 fi
 
-python manage.py migrate
-python manage.py createsuperuser --noinput
-python manage.py ingest_data
+# One process for every boot step; steps that are already done are skipped.
+python manage.py boot
 python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+def _as_arrays(principal, annual_rate, tenure):
+    principal = np.asarray(principal, dtype=np.float64)
+    annual_rate = np.asarray(annual_rate, dtype=np.float64)
+    tenure = np.asarray(tenure, dtype=np.float64)
+    return np.broadcast_arrays(principal, annual_rate, tenure)
+
+
+def monthly_rate(annual_rate):
+    return np.asarray(annual_rate, dtype=np.float64) / 12 / 100
+
+
+def emi(principal, annual_rate, tenure):
+    """Monthly instalment for each (principal, annual %, months) triple.
+
+    Inputs broadcast against each other like any NumPy ufunc. Zero-rate loans
+    are repaid in equal parts of the principal.
+    """
+    principal, annual_rate, tenure = _as_arrays(principal, annual_rate, tenure)
+    r = monthly_rate(annual_rate)
+    zero = r == 0
+    safe_r = np.where(zero, 1.0, r)
+    growth = (1 + safe_r) ** tenure
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortized = principal * safe_r * growth / (growth - 1)
+        flat = principal / tenure
+    return np.where(zero, flat, amortized)
+
+
+def total_interest(principal, annual_rate, tenure):
+    principal, annual_rate, tenure = _as_arrays(principal, annual_rate, tenure)
+    return emi(principal, annual_rate, tenure) * tenure - principal
+
+
+def schedule(principal, annual_rate, tenure):
+    """Month-by-month amortization for a batch of loans.
+
+    Returns a dict of ``(n_loans, max_tenure)`` arrays: ``payment``,
+    ``principal``, ``interest`` and closing ``balance``. Months past a loan's
+    own tenure are zero.
+    """
+    principal, annual_rate, tenure = _as_arrays(np.atleast_1d(principal), np.atleast_1d(annual_rate), np.atleast_1d(tenure))
+    instalment = emi(principal, annual_rate, tenure)
+    r = monthly_rate(annual_rate)[:, None]
+    months = np.arange(1, int(tenure.max(initial=0)) + 1, dtype=np.float64)[None, :]
+    active = months <= tenure[:, None]
+
+    p = principal[:, None]
+    payment = instalment[:, None]
+    zero = r == 0
+    safe_r = np.where(zero, 1.0, r)
+    growth = (1 + safe_r) ** months
+    closing = np.where(zero, p - payment * months, p * growth - payment * (growth - 1) / safe_r)
+    opening = np.where(zero, p - payment * (months - 1), p * growth / (1 + safe_r) - payment * (growth / (1 + safe_r) - 1) / safe_r)
+    interest = opening * r
+
+    return {
+        'payment': np.where(active, payment, 0.0),
+        'interest': np.where(active, interest, 0.0),
+        'principal': np.where(active, payment - interest, 0.0),
+        'balance': np.where(active & (months < tenure[:, None]), closing, 0.0),
+    }
@@ -0,0 +1,208 @@
+"""Portfolio dashboard rollups.
+
+Loan totals are kept per bucket of three dimensions (the borrower's credit
+score band, the interest-rate bucket and the start month) in
+``PortfolioRollup``. The rollups are refreshed by a Celery beat task rather
+than on every write: an incremental refresh recounts only the customers whose
+rows changed since the watermark, by taking their last counted loans
+(``PortfolioLoan``) out of the totals and adding their current ones.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import CreditProfile, Customer, Loan, PortfolioLoan, PortfolioRollup, RollupWatermark
+from .scoring import batch_credit_scores
+
+WATERMARK = 'portfolio'
+DIMENSIONS = ('score_band', 'rate_bucket', 'start_month')
+ROLLUP_FIELDS = ('loan_count', 'active_count', 'exposure', 'emi_total', 'volume', 'total_tenure', 'emis_paid_on_time')
+# Upper score of each band, matching the thresholds of ``loan_decision``.
+SCORE_BANDS = ((10, '0-10'), (30, '11-30'), (50, '31-50'), (100, '51-100'))
+RATE_BUCKET_WIDTH = 2
+
+
+def score_band(score):
+    for upper, label in SCORE_BANDS:
+        if score <= upper:
+            return label
+    return SCORE_BANDS[-1][1]
+
+
+def rate_bucket(interest_rate):
+    low = int(interest_rate // RATE_BUCKET_WIDTH) * RATE_BUCKET_WIDTH
+    return f'{low}-{low + RATE_BUCKET_WIDTH}'
+
+
+def bucket_order(dimension, bucket):
+    if dimension == 'score_band':
+        return [label for _, label in SCORE_BANDS].index(bucket)
+    if dimension == 'rate_bucket':
+        return int(bucket.split('-')[0])
+    return bucket
+
+
+def portfolio_loans(customer_pks):
+    """The current ``PortfolioLoan`` rows for every loan of ``customer_pks``."""
+    customer_ids = dict(Customer.objects.filter(pk__in=customer_pks).values_list('pk', 'customer_id'))
+    scores = batch_credit_scores(customer_ids.values())
+    bands = {pk: score_band(scores.get(customer_id, 0)) for pk, customer_id in customer_ids.items()}
+    loans = Loan.objects.filter(customer_id__in=customer_pks).values_list(
+        'pk', 'customer_id', 'interest_rate', 'start_date', 'loan_amount', 'monthly_repayment', 'tenure', 'emis_paid_on_time',
+    )
+    return [
+        PortfolioLoan(
+            loan_pk=pk,
+            customer_pk=customer_pk,
+            score_band=bands[customer_pk],
+            rate_bucket=rate_bucket(interest_rate),
+            start_month=start_date.strftime('%Y-%m'),
+            active=emis_paid_on_time < tenure,
+            loan_amount=loan_amount,
+            monthly_repayment=monthly_repayment,
+            tenure=tenure,
+            emis_paid_on_time=emis_paid_on_time,
+        )
+        for pk, customer_pk, interest_rate, start_date, loan_amount, monthly_repayment, tenure, emis_paid_on_time in loans
+    ]
+
+
+def rollup_totals(members):
+    """Sum a ``PortfolioLoan`` queryset into ``{(dimension, bucket): totals}``."""
+    active = models.Q(active=True)
+    totals = {}
+    for dimension in DIMENSIONS:
+        rows = members.values(dimension).annotate(
+            loan_count=models.Count('pk'),
+            active_count=models.Count('pk', filter=active),
+            exposure=models.Sum('loan_amount', filter=active, default=0),
+            emi_total=models.Sum('monthly_repayment', filter=active, default=0),
+            volume=models.Sum('loan_amount'),
+            total_tenure=models.Sum('tenure'),
+            emis_paid_on_time=models.Sum('emis_paid_on_time'),
+        ).order_by()
+        for row in rows:
+            totals[(dimension, row.pop(dimension))] = row
+    return totals
+
+
+def _apply(old, new):
+    empty = dict.fromkeys(ROLLUP_FIELDS, 0)
+    for key in old.keys() | new.keys():
+        before = old.get(key, empty)
+        after = new.get(key, empty)
+        deltas = {field: after[field] - before[field] for field in ROLLUP_FIELDS if after[field] != before[field]}
+        if not deltas:
+            continue
+        dimension, bucket = key
+        PortfolioRollup.objects.get_or_create(dimension=dimension, bucket=bucket)
+        PortfolioRollup.objects.filter(dimension=dimension, bucket=bucket).update(**{
+            field: models.F(field) + delta for field, delta in deltas.items()
+        })
+    PortfolioRollup.objects.filter(loan_count__lte=0).delete()
+
+
+def recount_customers(customer_pks):
+    """Replace the rollup contribution of ``customer_pks`` with their current loans."""
+    members = PortfolioLoan.objects.filter(customer_pk__in=customer_pks)
+    with transaction.atomic():
+        old = rollup_totals(members)
+        members.delete()
+        loans = PortfolioLoan.objects.bulk_create(portfolio_loans(customer_pks))
+        _apply(old, rollup_totals(members))
+    return len(loans)
+
+
+def forget_customer(customer_pk):
+    """Take a deleted customer's loans out of the rollups straight away.
+
+    The customer's rows are gone, so no watermark query can find them later.
+    """
+    members = PortfolioLoan.objects.filter(customer_pk=customer_pk)
+    with transaction.atomic():
+        _apply(rollup_totals(members), {})
+        members.delete()
+
+
+def rebuild_rollups(chunk_size):
+    PortfolioLoan.objects.all().delete()
+    PortfolioRollup.objects.all().delete()
+    customer_pks = list(Customer.objects.order_by('pk').values_list('pk', flat=True))
+    loans = 0
+    for start in range(0, len(customer_pks), chunk_size):
+        loans += len(PortfolioLoan.objects.bulk_create(portfolio_loans(customer_pks[start:start + chunk_size])))
+    PortfolioRollup.objects.bulk_create(
+        PortfolioRollup(dimension=dimension, bucket=bucket, **totals)
+        for (dimension, bucket), totals in rollup_totals(PortfolioLoan.objects.all()).items()
+    )
+    return len(customer_pks), loans
+
+
+def changed_customers(since):
+    """Pks of customers whose customer row, loans or credit profile changed after ``since``."""
+    changed = set(Customer.objects.filter(updated_at__gt=since).values_list('pk', flat=True))
+    changed.update(Loan.objects.filter(updated_at__gt=since).values_list('customer_id', flat=True))
+    # Profiles also move when a loan is deleted, which leaves no Loan row behind.
+    changed.update(CreditProfile.objects.filter(updated_at__gt=since).values_list('customer_id', flat=True))
+    return sorted(changed)
+
+
+def refresh_rollups(full=False, chunk_size=None):
+    """Bring the rollups up to date and move the watermark.
+
+    Without ``full`` only customers changed since the watermark (less
+    ``PORTFOLIO_WATERMARK_LAG`` seconds, to catch transactions that were still
+    open at the last refresh) are recounted. The first refresh is always a
+    full rebuild. Runs in one transaction that holds the watermark row, so
+    refreshes never overlap and readers never see half of one.
+    """
+    chunk_size = chunk_size or settings.PORTFOLIO_REFRESH_CHUNK_SIZE
+    started = time.perf_counter()
+    now = timezone.now()
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        full = full or watermark.value is None
+        if full:
+            customers, loans = rebuild_rollups(chunk_size)
+            watermark.rebuilt_at = now
+        else:
+            since = watermark.value - datetime.timedelta(seconds=settings.PORTFOLIO_WATERMARK_LAG)
+            customer_pks = changed_customers(since)
+            customers, loans = len(customer_pks), 0
+            for start in range(0, len(customer_pks), chunk_size):
+                loans += recount_customers(customer_pks[start:start + chunk_size])
+        watermark.value = now
+        watermark.refreshed_at = timezone.now()
+        watermark.save()
+    return {
+        'mode': 'full' if full else 'incremental',
+        'customers': customers,
+        'loans': loans,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def delinquency_ratio(totals):
+    """Share of scheduled EMIs that were not paid on time."""
+    if not totals['total_tenure']:
+        return 0.0
+    return round(1 - totals['emis_paid_on_time'] / totals['total_tenure'], 4)
+
+
+def portfolio_summary(dimensions=DIMENSIONS):
+    """The dashboard payload, read from the rollup tables only."""
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    rows = PortfolioRollup.objects.filter(dimension__in=dimensions).values('dimension', 'bucket', *ROLLUP_FIELDS)
+    summary = {
+        'refreshed_at': watermark.refreshed_at if watermark else None,
+        'rebuilt_at': watermark.rebuilt_at if watermark else None,
+        **{dimension: [] for dimension in dimensions},
+    }
+    for row in rows:
+        summary[row.pop('dimension')].append({**row, 'delinquency_ratio': delinquency_ratio(row)})
+    for dimension in dimensions:
+        summary[dimension].sort(key=lambda row: bucket_order(dimension, row['bucket']))
+    return summary
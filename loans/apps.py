@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class LoansConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'loans'
+
+    def ready(self):
+        from celery.signals import task_postrun, task_prerun
+        from django.db.backends.signals import connection_created
+
+        from . import metrics, signals  # noqa: F401
+
+        connection_created.connect(metrics.install_execute_wrapper, weak=False)
+        task_prerun.connect(metrics.task_started, weak=False)
+        task_postrun.connect(metrics.task_finished, weak=False)
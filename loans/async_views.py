@@ -0,0 +1,143 @@
+"""Async versions of the read-heavy API views, for ASGI deployments.
+
+Enabled with the ``ASYNC_READ_VIEWS`` setting. They answer exactly like the
+DRF views in ``loans.views`` (JSON only, no browsable API) but await the ORM
+and the score cache instead of blocking a worker thread per request.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import metrics, renderers, score_cache
+from .listing import InvalidPage, alist_loans
+from .models import Customer, Loan
+from .profiles import aprofile_credit_score
+from .scoring import loan_decision
+from .serializers import loan_data
+from .views import calculate_emi, loan_validators, precondition_response
+
+
+def json_response(data, status=200):
+    # Same bytes as the DRF views' renderer.
+    with metrics.timed('serialize'):
+        content = renderers.dumps(data)
+    return HttpResponse(content, status=status, content_type='application/json')
+
+
+def error_response(message, status):
+    return json_response({'error': message}, status)
+
+
+def request_data(request):
+    """The body as a dict, JSON or form-encoded, or ``None`` if it is not valid JSON."""
+    if request.content_type != 'application/json':
+        return request.POST.dict()
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else {}
+
+
+def parse_error():
+    return json_response({'detail': 'JSON parse error'}, 400)
+
+
+async def acalculate_credit_score(customer):
+    with metrics.timed('scoring'):
+        return await score_cache.acached_credit_score(customer, aprofile_credit_score)
+
+
+async def loan_detail_response(request, loan_id):
+    try:
+        loan = await Loan.objects.select_related('customer').aget(loan_id=loan_id)
+    except Loan.DoesNotExist:
+        return error_response('Loan not found', 404)
+
+    etag, last_modified = loan_validators(loan)
+    response = precondition_response(request, etag, last_modified)
+    if response is None:
+        response = json_response(loan_data(loan))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+async def customer_loans_response(customer_id, params):
+    customer_pk = await Customer.objects.filter(customer_id=customer_id).values_list('pk', flat=True).afirst()
+    if customer_pk is None:
+        return error_response('Customer not found', 404)
+    try:
+        data = await alist_loans(customer_pk, params)
+    except InvalidPage as exc:
+        return error_response(str(exc), 400)
+    if isinstance(data, StreamingHttpResponse):
+        return data
+    return json_response(data)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'POST'])
+async def check_eligibility(request):
+    if request.method != 'POST':
+        return await sync_to_async(render)(request, 'check_eligibility.html')
+    data = request_data(request)
+    if data is None:
+        return parse_error()
+    customer_id = data.get('customer_id')
+    loan_amount = data.get('loan_amount')
+    interest_rate = data.get('interest_rate')
+    tenure = data.get('tenure')
+
+    try:
+        customer = await Customer.objects.aget(customer_id=customer_id)
+    except Customer.DoesNotExist:
+        return error_response('Customer not found', 404)
+
+    score = await acalculate_credit_score(customer)
+    approval, corrected_interest_rate = loan_decision(score, interest_rate)
+    monthly_installment = calculate_emi(loan_amount, corrected_interest_rate, tenure)
+
+    return json_response({
+        'customer_id': customer_id,
+        'approval': approval,
+        'interest_rate': interest_rate,
+        'corrected_interest_rate': corrected_interest_rate,
+        'tenure': tenure,
+        'monthly_installment': monthly_installment,
+    })
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD'])
+async def view_loan(request, loan_id):
+    return await loan_detail_response(request, loan_id)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD'])
+async def view_loans(request, customer_id):
+    return await customer_loans_response(customer_id, request.GET)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'POST'])
+async def track_loans(request):
+    if request.method != 'POST':
+        return await sync_to_async(render)(request, 'track_loans.html')
+    data = request_data(request)
+    if data is None:
+        return parse_error()
+    loan_id = data.get('loan_id')
+    customer_id = data.get('customer_id')
+
+    if loan_id:
+        return await loan_detail_response(request, loan_id)
+    elif customer_id:
+        return await customer_loans_response(customer_id, data)
+    return error_response('Please provide either loan_id or customer_id', 400)
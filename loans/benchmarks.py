@@ -0,0 +1,450 @@
+import asyncio
+import decimal
+import json
+import platform
+import random
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+import numpy as np
+from celery import current_app
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.test import Client, RequestFactory, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from . import amortization, score_cache, startup
+from .models import Customer, Loan, UploadJob
+from .renderers import ORJSONRenderer
+from .serializers import CUSTOMER_FIELDS, LOAN_FIELDS, CustomerSerializer, LoanSerializer, customer_row, loan_row
+from .profiles import profile_credit_score
+from .scoring import aggregate_credit_score
+from .synthetic import generate_portfolio, write_xlsx
+from .tasks import ingest_customer_data, ingest_loan_data
+from .urls import build_urlpatterns
+from .views import calculate_credit_score, calculate_emi
+
+PERCENTILES = (50, 90, 99)
+CONCURRENCY_MODES = ('wsgi', 'asgi+sync-views', 'asgi+async-views')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def eager_celery():
+    previous = current_app.conf.task_always_eager
+    current_app.conf.task_always_eager = True
+    try:
+        yield
+    finally:
+        current_app.conf.task_always_eager = previous
+
+
+def summarize(name, size, timings, queries):
+    timings = np.asarray(timings) * 1000
+    result = {
+        'benchmark': name,
+        'size': size,
+        'runs': len(timings),
+        'mean_ms': round(float(timings.mean()), 4),
+        'min_ms': round(float(timings.min()), 4),
+        'max_ms': round(float(timings.max()), 4),
+        'queries_per_call': round(queries / len(timings), 2) if queries is not None else None,
+    }
+    for q in PERCENTILES:
+        result[f'p{q}_ms'] = round(float(np.percentile(timings, q)), 4)
+    return result
+
+
+def measure(name, size, func, repeat, before=None):
+    """Time ``repeat`` calls of ``func``; ``before`` runs untimed ahead of each."""
+    timings = []
+    counter = QueryCounter()
+    for _ in range(repeat):
+        args = before() if before else ()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - started)
+    return summarize(name, size, timings, counter.count)
+
+
+def reset_database():
+    Loan.objects.all().delete()
+    Customer.objects.all().delete()
+    UploadJob.objects.all().delete()
+    score_cache.invalidate_all()
+
+
+def ingestion_benchmarks(size, distribution, seed, repeat):
+    """Time both ingestion tasks on generated workbooks, leaving the data loaded."""
+    with tempfile.TemporaryDirectory() as directory:
+        customer_path, loan_path = write_xlsx(generate_portfolio(size, distribution, seed), directory)
+        timings = {'ingest_customer_data': [], 'ingest_loan_data': []}
+        counters = {name: QueryCounter() for name in timings}
+        for _ in range(repeat):
+            reset_database()
+            for name, task, path in (
+                ('ingest_customer_data', ingest_customer_data, customer_path),
+                ('ingest_loan_data', ingest_loan_data, loan_path),
+            ):
+                with connection.execute_wrapper(counters[name]):
+                    started = time.perf_counter()
+                    task(file_path=path)
+                    timings[name].append(time.perf_counter() - started)
+    return [summarize(name, size, timings[name], counters[name].count) for name in timings]
+
+
+def view_benchmarks(size, repeat, rng):
+    client = Client()
+    customer_ids = list(Customer.objects.values_list('customer_id', flat=True))
+    loan_ids = list(Loan.objects.exclude(loan_id=None).values_list('loan_id', flat=True))
+    upload = (
+        'customer_id,first_name,last_name,age,phone_number,monthly_salary,approved_limit\n'
+        + ''.join(f'{900000 + n},Up,Load,30,1,50000,1800000\n' for n in range(10))
+    ).encode()
+
+    def application():
+        return {
+            'customer_id': rng.choice(customer_ids),
+            'loan_amount': rng.randrange(50000, 500000, 50000),
+            'interest_rate': round(rng.uniform(6, 20), 2),
+            'tenure': rng.choice([12, 24, 36]),
+        }
+
+    def applicant():
+        return {
+            'first_name': 'Bench', 'last_name': 'Mark', 'age': 30,
+            'monthly_income': rng.randrange(20000, 200000, 1000), 'phone_number': '9000000000',
+        }
+
+    def post(name):
+        return lambda data: client.post(reverse(name), data, content_type='application/json')
+
+    def get(name):
+        return lambda key: client.get(reverse(name, args=[key]))
+
+    def upload_data(file):
+        return client.post(reverse('upload-data'), {'file': file})
+
+    # 20 amounts x 10 tenures x 20 rates, as a slider screen would ask for.
+    offer_grid = {'loan_amount': '50000:1000000:50000', 'tenure': '6:60:6', 'interest_rate': '6:15.5:0.5'}
+
+    def offers(customer_id):
+        return client.get(reverse('offers', args=[customer_id]), offer_grid)
+
+    cases = [
+        ('view:register', post('register'), lambda: [applicant()]),
+        ('view:check-eligibility', post('check-eligibility'), lambda: [application()]),
+        ('view:check-eligibility-batch[100]', post('check-eligibility-batch'), lambda: [[application() for _ in range(100)]]),
+        ('view:create-loan', post('create-loan'), lambda: [application()]),
+        ('view:offers[4000 cells]', offers, lambda: [rng.choice(customer_ids)]),
+        ('view:view-loans', get('view-loans'), lambda: [rng.choice(customer_ids)]),
+        ('view:track-loans[customer]', post('track-loans'), lambda: [{'customer_id': rng.choice(customer_ids)}]),
+        ('view:upload-data[10 rows]', upload_data, lambda: [SimpleUploadedFile('bench.csv', upload)]),
+    ]
+    if loan_ids:
+        cases += [
+            ('view:view-loan', get('view-loan'), lambda: [rng.choice(loan_ids)]),
+            ('view:track-loans[loan]', post('track-loans'), lambda: [{'loan_id': rng.choice(loan_ids)}]),
+        ]
+    with eager_celery(), tempfile.TemporaryDirectory() as spool, override_settings(UPLOAD_SPOOL_DIR=spool):
+        return [measure(name, size, func, repeat, before) for name, func, before in cases]
+
+
+def scoring_benchmarks(size, repeat, rng):
+    customers = list(Customer.objects.all())
+
+    def cold():
+        score_cache.invalidate_all()
+        return [rng.choice(customers)]
+
+    results = [
+        measure('calculate_credit_score[cold]', size, calculate_credit_score, repeat, cold),
+        measure('calculate_credit_score[cached]', size, calculate_credit_score, repeat, lambda: [customers[0]]),
+        measure('profile_credit_score', size, profile_credit_score, repeat, lambda: [rng.choice(customers)]),
+        measure('aggregate_credit_score', size, aggregate_credit_score, repeat, lambda: [rng.choice(customers)]),
+        measure('calculate_emi', size, calculate_emi, repeat, lambda: [rng.randrange(50000, 500000), rng.uniform(6, 20), rng.choice([12, 24, 36])]),
+    ]
+    principal = np.full(size, 250000.0)
+    rate = np.linspace(6, 20, size)
+    tenure = np.full(size, 36)
+    results.append(measure(f'amortization.emi[batch={size}]', size, amortization.emi, repeat, lambda: [principal, rate, tenure]))
+    return results
+
+
+def serializer_payload(count, rng):
+    """``count`` unsaved loans with their customers, and the same data as ``values_list`` rows."""
+    loans = []
+    for number in range(1, count + 1):
+        salary = decimal.Decimal(rng.randrange(20000, 200000, 1000))
+        customer = Customer(
+            customer_id=number, first_name='Bench', last_name=f'Mark {number}', age=rng.randrange(21, 65),
+            monthly_salary=salary, approved_limit=36 * salary, phone_number='9000000000',
+        )
+        loans.append(Loan(
+            customer=customer, loan_id=number, loan_amount=decimal.Decimal(rng.randrange(50000, 900000, 500)),
+            interest_rate=decimal.Decimal(f'{rng.uniform(6, 20):.2f}'), monthly_repayment=decimal.Decimal(f'{rng.uniform(2000, 40000):.2f}'),
+            tenure=rng.choice([12, 24, 36, 60]),
+        ))
+    rows = [tuple(getattr(loan, field) for field in LOAN_FIELDS) + tuple(getattr(loan.customer, field) for field in CUSTOMER_FIELDS) for loan in loans]
+    return loans, rows
+
+
+def serializer_benchmarks(count, repeat, rng):
+    """DRF ModelSerializers and JSONRenderer against the values_list fast path and orjson, on ``count`` objects."""
+    loans, rows = serializer_payload(count, rng)
+    customers = [loan.customer for loan in loans]
+    customer_tuples = [row[len(LOAN_FIELDS):] for row in rows]
+    drf, fast = JSONRenderer(), ORJSONRenderer()
+    cases = [
+        (f'serialize:LoanSerializer[{count}]', lambda: drf.render(LoanSerializer(loans, many=True).data)),
+        (f'serialize:loan_row+orjson[{count}]', lambda: fast.render([loan_row(row) for row in rows])),
+        (f'serialize:CustomerSerializer[{count}]', lambda: drf.render(CustomerSerializer(customers, many=True).data)),
+        (f'serialize:customer_row+orjson[{count}]', lambda: fast.render([customer_row(row) for row in customer_tuples])),
+    ]
+    return [measure(name, count, func, repeat) for name, func in cases]
+
+
+def cold_start_benchmarks(repeat, path='/'):
+    """Fresh interpreters answering one request: ``django.setup()``, the first
+    response to ``path`` (which loads the URLconf and so every view) and the
+    whole process including interpreter start-up."""
+    runs = [startup.first_response(path) for _ in range(repeat)]
+    return [
+        summarize(f'cold-start:{phase}', 0, [run[phase] for run in runs], None)
+        for phase in ('setup', 'first_response', 'process')
+    ]
+
+
+def api_urlconf(async_reads):
+    """A stand-in ROOT_URLCONF serving the API with sync or async read views."""
+    urlconf = types.ModuleType(f'benchmark_urls_{"async" if async_reads else "sync"}')
+    urlconf.urlpatterns = [path('api/', include(build_urlpatterns(async_reads)))]
+    return urlconf
+
+
+def read_requests(rng, customer_ids, loan_ids):
+    """Yield an endless mix of ``(method, path, query, json_body)`` read requests."""
+    while True:
+        choice = rng.random()
+        if choice < 0.4 and loan_ids:
+            yield 'GET', f'/api/view-loan/{rng.choice(loan_ids)}', '', None
+        elif choice < 0.7:
+            yield 'GET', f'/api/view-loans/{rng.choice(customer_ids)}', '', None
+        else:
+            yield 'POST', '/api/check-eligibility', '', {
+                'customer_id': rng.choice(customer_ids),
+                'loan_amount': rng.randrange(50000, 500000, 50000),
+                'interest_rate': round(rng.uniform(6, 20), 2),
+                'tenure': rng.choice([12, 24, 36]),
+            }
+
+
+def _environ(factory, method, url, query, body):
+    if body is None:
+        return factory.generic(method, url, QUERY_STRING=query).environ
+    return factory.generic(method, url, json.dumps(body), 'application/json', QUERY_STRING=query).environ
+
+
+def _wsgi_run(requests, clients, threads):
+    """``clients`` closed-loop clients sharing a server pool of ``threads`` threads."""
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    timings, statuses = [], []
+    lock = threading.Lock()
+
+    def serve(request):
+        status = []
+        response = handler(_environ(factory, *request), lambda line, headers: status.append(int(line[:3])))
+        for _ in response:
+            pass
+        response.close()
+        return status[0]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        def client(batch):
+            for request in batch:
+                started = time.perf_counter()
+                status = pool.submit(serve, request).result()
+                with lock:
+                    timings.append(time.perf_counter() - started)
+                    statuses.append(status)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as client_pool:
+            list(client_pool.map(client, requests))
+        elapsed = time.perf_counter() - started
+    return timings, statuses, elapsed
+
+
+def _asgi_scope(method, url, query, body):
+    headers = [(b'host', b'testserver')]
+    if body is not None:
+        headers.append((b'content-type', b'application/json'))
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': url, 'raw_path': url.encode(),
+        'query_string': query.encode(), 'root_path': '', 'headers': headers,
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+    }
+
+
+async def _asgi_call(app, request):
+    method, url, query, body = request
+    events = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b'', 'more_body': False}]
+    status = []
+
+    async def receive():
+        if events:
+            return events.pop()
+        # The client never disconnects; Django cancels this wait when done.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(_asgi_scope(method, url, query, body), receive, send)
+    return status[0]
+
+
+def _asgi_run(requests):
+    handler = ASGIHandler()
+    timings, statuses = [], []
+
+    async def client(batch):
+        for request in batch:
+            started = time.perf_counter()
+            statuses.append(await _asgi_call(handler, request))
+            timings.append(time.perf_counter() - started)
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(client(batch) for batch in requests))
+        return time.perf_counter() - started
+
+    return timings, statuses, asyncio.run(main())
+
+
+def concurrency_benchmarks(size, clients_list, requests_per_client, rng, wsgi_threads=16):
+    """Throughput of the API under many concurrent clients.
+
+    For the read endpoints, compares a WSGI server with ``wsgi_threads``
+    threads against an ASGI server running the sync views and the async
+    views. Loan creation is measured under WSGI, spread over all customers
+    and contending for one. Requests are handed
+    to the Django handlers in-process, so the numbers exclude the network and
+    any real server's own overhead. The ORM runs on other threads here, so the
+    data must be committed (not inside a test transaction).
+    """
+    customer_ids = list(Customer.objects.values_list('customer_id', flat=True))
+    loan_ids = list(Loan.objects.exclude(loan_id=None).values_list('loan_id', flat=True))
+    results = []
+    for clients in clients_list:
+        mix = read_requests(rng, customer_ids, loan_ids)
+        requests = [[next(mix) for _ in range(requests_per_client)] for _ in range(clients)]
+        for mode in CONCURRENCY_MODES:
+            with override_settings(ROOT_URLCONF=api_urlconf(mode == 'asgi+async-views')):
+                if mode == 'wsgi':
+                    timings, statuses, elapsed = _wsgi_run(requests, clients, wsgi_threads)
+                else:
+                    timings, statuses, elapsed = _asgi_run(requests)
+            results.append(_throughput(f'concurrency:{mode}[clients={clients}]', size, timings, statuses, elapsed))
+
+        # Loan creation serializes on the customer's row lock: compare
+        # applications spread over all customers with all for one customer.
+        for label, pick in (('spread', lambda: rng.choice(customer_ids)), ('hot customer', lambda: customer_ids[0])):
+            requests = [[
+                ('POST', '/api/create-loan', '', {
+                    'customer_id': pick(), 'loan_amount': rng.randrange(10000, 100000, 10000),
+                    'interest_rate': 12, 'tenure': 12,
+                }) for _ in range(requests_per_client)
+            ] for _ in range(clients)]
+            with override_settings(ROOT_URLCONF=api_urlconf(False)):
+                timings, statuses, elapsed = _wsgi_run(requests, clients, min(clients, wsgi_threads))
+            results.append(_throughput(f'concurrency:create-loan {label}[clients={clients}]', size, timings, statuses, elapsed))
+    return results
+
+
+def _throughput(name, size, timings, statuses, elapsed):
+    result = summarize(name, size, timings, None)
+    result['requests_per_second'] = round(len(timings) / elapsed, 1)
+    result['server_errors'] = sum(status >= 500 for status in statuses)
+    return result
+
+
+def run_benchmarks(sizes, repeat=50, distribution='poisson:3', seed=0, ingest_repeat=3, log=None,
+                   clients=(), requests_per_client=20, serializer_count=10000, cold_starts=5):
+    """Benchmark scoring, EMI, every API view and both ingestion tasks.
+
+    For each dataset size (number of customers) the current database is
+    emptied and refilled by the ingestion tasks themselves, so only run this
+    against a scratch database. With ``clients``, the read endpoints are also
+    load-tested at each of those concurrency levels. ``serializer_count``
+    sets the payload size of the serializer microbenchmark and ``cold_starts``
+    the number of fresh interpreters timed to their first response (0 skips
+    either).
+    """
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        if log:
+            log(f'Dataset with {size} customers ({distribution})')
+        results += ingestion_benchmarks(size, distribution, seed, ingest_repeat)
+        results += scoring_benchmarks(size, repeat, rng)
+        results += view_benchmarks(size, repeat, rng)
+        if clients:
+            results += concurrency_benchmarks(size, clients, requests_per_client, rng)
+    if serializer_count:
+        results += serializer_benchmarks(serializer_count, max(1, repeat // 10), rng)
+    if cold_starts:
+        results += cold_start_benchmarks(cold_starts)
+    return {
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'distribution': distribution,
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def save_results(report, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+def compare_results(report, baseline):
+    """Pair each result with the baseline's, as ``(size, name, old_p50, new_p50, ratio)``."""
+    old = {(row['size'], row['benchmark']): row for row in baseline['results']}
+    rows = []
+    for row in report['results']:
+        previous = old.get((row['size'], row['benchmark']))
+        if previous is None:
+            continue
+        ratio = row['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else None
+        rows.append((row['size'], row['benchmark'], previous['p50_ms'], row['p50_ms'], ratio))
+    return rows
@@ -0,0 +1,276 @@
+"""Columnar on-disk snapshot of the Customer and Loan tables.
+
+A snapshot directory holds a ``manifest.json`` and one or more immutable
+segment directories, each with one ``.npy`` file per column:
+
+* ``loan_*`` columns, sorted by customer pk then loan pk. Money is stored as
+  int64 paise, so sums are exact like the ``Decimal`` sums of the ORM path.
+* ``customer_*`` columns, sorted by customer pk.
+* ``index_customer_pk`` and ``index_offsets``: the loans of
+  ``index_customer_pk[i]`` are rows ``index_offsets[i]:index_offsets[i + 1]``.
+
+Readers open the columns with ``mmap_mode='r'``, so every process on a host
+shares the same page-cache pages instead of holding its own copy. Segments
+are never modified; ``compile_snapshot(append=True)`` adds a segment with the
+rows changed since the last compile, and rows in later segments supersede
+earlier ones with the same pk. Deleted rows drop out at the next full compile.
+"""
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Customer, Loan
+from .scoring import current_year_bounds
+
+MANIFEST = 'manifest.json'
+# Rows saved this close to the previous compile are read again by an append,
+# in case their transaction had not committed yet.
+APPEND_OVERLAP = datetime.timedelta(seconds=60)
+
+LOAN_COLUMNS = {
+    'loan_pk': ('pk', np.int64),
+    'loan_customer_pk': ('customer_id', np.int64),
+    'loan_amount': ('loan_amount', np.int64),
+    'loan_monthly_repayment': ('monthly_repayment', np.int64),
+    'loan_interest_rate': ('interest_rate', np.float64),
+    'loan_tenure': ('tenure', np.int32),
+    'loan_emis_paid_on_time': ('emis_paid_on_time', np.int32),
+    'loan_start_date': ('start_date', 'datetime64[D]'),
+    'loan_end_date': ('end_date', 'datetime64[D]'),
+}
+CUSTOMER_COLUMNS = {
+    'customer_pk': ('pk', np.int64),
+    'customer_id': ('customer_id', np.int64),
+    'customer_approved_limit': ('approved_limit', np.int64),
+    'customer_monthly_salary': ('monthly_salary', np.int64),
+}
+MONEY_COLUMNS = {'loan_amount', 'loan_monthly_repayment', 'customer_approved_limit', 'customer_monthly_salary'}
+
+
+def snapshot_dir(directory=None):
+    return Path(directory or settings.LOAN_SNAPSHOT_DIR)
+
+
+def _column(values, name, dtype):
+    if name in MONEY_COLUMNS:
+        return np.array([round(value * 100) for value in values], dtype=np.int64)
+    if name == 'customer_id':
+        return np.array([-1 if value is None else value for value in values], dtype=dtype)
+    return np.array(values, dtype=dtype)
+
+
+def _read_columns(queryset, columns, chunk_size):
+    fields = [field for field, _ in columns.values()]
+    parts = {name: [] for name in columns}
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = [row for _, row in zip(range(chunk_size), rows)]
+        if not chunk:
+            break
+        for (name, (_, dtype)), values in zip(columns.items(), zip(*chunk)):
+            parts[name].append(_column(values, name, dtype))
+    return {
+        name: np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+        for (name, (_, dtype)), chunks in zip(columns.items(), parts.values())
+    }
+
+
+def _write_segment(root, name, loans, customers, chunk_size):
+    columns = _read_columns(loans.order_by('customer_id', 'pk'), LOAN_COLUMNS, chunk_size)
+    columns.update(_read_columns(customers.order_by('pk'), CUSTOMER_COLUMNS, chunk_size))
+    owners = columns['loan_customer_pk']
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if owners.size else np.empty(0, dtype=np.int64)
+    columns['index_customer_pk'] = owners[starts]
+    columns['index_offsets'] = np.append(starts, owners.size).astype(np.int64)
+
+    staging = Path(tempfile.mkdtemp(prefix=f'.{name}-', dir=root))
+    for column, values in columns.items():
+        np.save(staging / f'{column}.npy', values)
+    staging.rename(root / name)
+    return owners.size, columns['customer_pk'].size
+
+
+def read_manifest(directory=None):
+    path = snapshot_dir(directory) / MANIFEST
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def _write_manifest(root, manifest):
+    staging = root / f'.{MANIFEST}.tmp'
+    staging.write_text(json.dumps(manifest, indent=2))
+    os.replace(staging, root / MANIFEST)
+
+
+def compile_snapshot(directory=None, append=False, chunk_size=None):
+    """Compile the tables into a snapshot, or with ``append`` add the rows
+    changed since the last compile as a new segment.
+
+    Returns the new manifest. The manifest is swapped in atomically, so
+    readers see either the old or the new snapshot, never a partial one.
+    """
+    root = snapshot_dir(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    manifest = read_manifest(root)
+    compiled_at = timezone.now()
+    loans, customers = Loan.objects.all(), Customer.objects.all()
+    if append and manifest is not None:
+        since = datetime.datetime.fromisoformat(manifest['compiled_at']) - APPEND_OVERLAP
+        loans, customers = loans.filter(updated_at__gt=since), customers.filter(updated_at__gt=since)
+        segments = manifest['segments']
+    else:
+        segments = []
+
+    name = f'segment-{compiled_at:%Y%m%d%H%M%S%f}'
+    loan_rows, customer_rows = _write_segment(root, name, loans, customers, chunk_size)
+    stale = [] if segments else (manifest or {}).get('segments', [])
+    manifest = {
+        'compiled_at': compiled_at.isoformat(),
+        'segments': [*segments, {'name': name, 'loans': loan_rows, 'customers': customer_rows}],
+    }
+    _write_manifest(root, manifest)
+    for segment in stale:
+        # Processes that still map these files keep reading them until they reopen.
+        shutil.rmtree(root / segment['name'], ignore_errors=True)
+    return manifest
+
+
+class Segment:
+    def __init__(self, path):
+        self.columns = {
+            file.stem: np.load(file, mmap_mode='r', allow_pickle=False) for file in path.glob('*.npy')
+        }
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+
+class Snapshot:
+    """A read-only, memory-mapped view of a compiled snapshot."""
+
+    def __init__(self, directory=None):
+        root = snapshot_dir(directory)
+        self.manifest = read_manifest(root)
+        if self.manifest is None:
+            raise FileNotFoundError(f'No loan snapshot in {root}; run `manage.py compile_snapshot` first')
+        self.segments = [Segment(root / segment['name']) for segment in self.manifest['segments']]
+        self.loan_live = self._live_masks('loan_pk')
+        self.customers = self._merge_customers()
+
+    def _live_masks(self, column):
+        """Per segment, rows not superseded by a later segment (``None`` when all are live)."""
+        masks = [None] * len(self.segments)
+        later = np.empty(0, dtype=np.int64)
+        for number in range(len(self.segments) - 1, -1, -1):
+            pks = self.segments[number][column]
+            if later.size:
+                masks[number] = ~np.isin(pks, later)
+            later = np.union1d(later, pks)
+        return masks
+
+    def _merge_customers(self):
+        if len(self.segments) == 1:
+            return self.segments[0].columns
+        live = self._live_masks('customer_pk')
+        merged = {
+            name: np.concatenate([
+                segment[name] if mask is None else segment[name][mask] for segment, mask in zip(self.segments, live)
+            ])
+            for name in CUSTOMER_COLUMNS
+        }
+        order = np.argsort(merged['customer_pk'], kind='stable')
+        return {name: values[order] for name, values in merged.items()}
+
+    def customer_index(self, customer_pks):
+        """Positions of ``customer_pks`` in ``self.customers``; -1 where unknown."""
+        known = self.customers['customer_pk']
+        positions = np.searchsorted(known, customer_pks)
+        found = positions < known.size
+        found[found] = known[positions[found]] == np.asarray(customer_pks)[found]
+        return np.where(found, positions, -1)
+
+    def loans_for(self, customer_pk):
+        """Every live loan column of one customer, found through the row-range index."""
+        parts = {name: [] for name in LOAN_COLUMNS}
+        for segment, mask in zip(self.segments, self.loan_live):
+            index = segment['index_customer_pk']
+            position = np.searchsorted(index, customer_pk)
+            if position == index.size or index[position] != customer_pk:
+                continue
+            rows = slice(segment['index_offsets'][position], segment['index_offsets'][position + 1])
+            keep = slice(None) if mask is None else mask[rows]
+            for name in LOAN_COLUMNS:
+                parts[name].append(segment[name][rows][keep])
+        return {
+            name: np.concatenate(values) if values else np.empty(0, dtype=LOAN_COLUMNS[name][1])
+            for name, values in parts.items()
+        }
+
+    def components(self, year=None):
+        """The credit score components of every customer, as arrays aligned with ``self.customers``.
+
+        Sums are taken per segment with ``np.add.reduceat`` over the
+        row-range index, without copying the loan columns.
+        """
+        year_start, year_end = (np.datetime64(day) for day in current_year_bounds(year))
+        count = self.customers['customer_pk'].size
+        totals = {
+            name: np.zeros(count, dtype=np.int64)
+            for name in ('loan_count', 'current_loan_sum', 'current_emis_sum', 'total_tenure', 'emis_paid_on_time', 'current_year_loans', 'volume')
+        }
+        for segment, mask in zip(self.segments, self.loan_live):
+            if not segment['loan_pk'].size:
+                continue
+            live = np.ones(segment['loan_pk'].size, dtype=np.int64) if mask is None else mask.astype(np.int64)
+            active = live * (segment['loan_emis_paid_on_time'] < segment['loan_tenure'])
+            start = segment['loan_start_date']
+            this_year = live * ((start >= year_start) & (start < year_end))
+            per_row = {
+                'loan_count': live,
+                'current_loan_sum': active * segment['loan_amount'],
+                'current_emis_sum': active * segment['loan_monthly_repayment'],
+                'total_tenure': live * segment['loan_tenure'],
+                'emis_paid_on_time': live * segment['loan_emis_paid_on_time'],
+                'current_year_loans': this_year,
+                'volume': live * segment['loan_amount'],
+            }
+            positions = self.customer_index(segment['index_customer_pk'])
+            starts = segment['index_offsets'][:-1]
+            known = positions >= 0
+            for name, values in per_row.items():
+                np.add.at(totals[name], positions[known], np.add.reduceat(values, starts)[known])
+        return totals
+
+    def credit_scores(self, year=None):
+        """``(customer_pk, score)`` arrays for every customer.
+
+        The same rules as ``scoring.score_from_components``, in one pass.
+        """
+        totals = self.components(year)
+        approved_limit = self.customers['customer_approved_limit']
+        monthly_salary = self.customers['customer_monthly_salary']
+        total_tenure = totals['total_tenure']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            paid_ratio = np.where(total_tenure > 0, totals['emis_paid_on_time'] / total_tenure, 1.0)
+        score = np.minimum(
+            100,
+            paid_ratio * 40
+            + np.minimum(totals['loan_count'] * 5, 20)
+            + np.minimum(totals['current_year_loans'] * 10, 20)
+            + np.minimum(totals['volume'] / 100 / 100000, 20),
+        )
+        score = np.trunc(score).astype(np.int64)
+        # Both sides are in paise: EMIs over half the salary means 2 * emis > salary.
+        score[totals['current_emis_sum'] * 2 > monthly_salary] = 0
+        score[totals['current_loan_sum'] > approved_limit] = 0
+        score[totals['loan_count'] == 0] = 100
+        return self.customers['customer_pk'], score
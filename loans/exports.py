@@ -0,0 +1,156 @@
+"""Streaming CSV/NDJSON extracts of the Customer and Loan tables.
+
+Rows are read with ``values_list(...).iterator()`` (a server-side cursor on
+PostgreSQL) and encoded one chunk at a time, so memory use does not grow with
+the table. Columns follow the ingestion layout, so an extract can be uploaded
+again through ``/api/upload-data``.
+"""
+import csv
+import io
+import zlib
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef
+from django.utils.dateparse import parse_date
+from rest_framework.utils.encoders import JSONEncoder
+
+from .ingestion import CUSTOMER_COLUMNS, LOAN_COLUMNS
+from .models import Customer, Loan
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class InvalidExport(ValueError):
+    pass
+
+
+def _flag(value):
+    return str(value or '').lower() in ('1', 'true', 'yes')
+
+
+def _date(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    date = parse_date(value)
+    if date is None:
+        raise InvalidExport(f'{name} must be a date (YYYY-MM-DD)')
+    return date
+
+
+def _customer_id(params):
+    value = params.get('customer_id')
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidExport('customer_id must be an integer')
+
+
+def active_loans():
+    return Loan.objects.filter(emis_paid_on_time__lt=F('tenure'))
+
+
+def loan_rows(params):
+    """Loans as ``LOAN_COLUMNS`` tuples.
+
+    ``active`` keeps loans not yet fully repaid; ``since``/``until`` bound the
+    start date (inclusive); ``customer_id`` keeps one customer's loans.
+    """
+    loans = active_loans() if _flag(params.get('active')) else Loan.objects.all()
+    since, until = _date(params, 'since'), _date(params, 'until')
+    if since:
+        loans = loans.filter(start_date__gte=since)
+    if until:
+        loans = loans.filter(start_date__lte=until)
+    customer_id = _customer_id(params)
+    if customer_id is not None:
+        loans = loans.filter(customer__customer_id=customer_id)
+    columns = ['customer__customer_id', *LOAN_COLUMNS[1:]]
+    return loans.order_by('pk').values_list(*columns)
+
+
+def customer_rows(params):
+    """Customers as ``CUSTOMER_COLUMNS`` tuples.
+
+    ``active`` keeps those with an active loan; ``customer_id`` keeps one customer.
+    """
+    customers = Customer.objects.all()
+    if _flag(params.get('active')):
+        customers = customers.filter(Exists(active_loans().filter(customer=OuterRef('pk'))))
+    customer_id = _customer_id(params)
+    if customer_id is not None:
+        customers = customers.filter(customer_id=customer_id)
+    return customers.order_by('pk').values_list(*CUSTOMER_COLUMNS)
+
+
+EXPORTS = {
+    'loans': (LOAN_COLUMNS, loan_rows),
+    'customers': (CUSTOMER_COLUMNS, customer_rows),
+}
+
+
+def _chunked(rows, chunk_size):
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_csv(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_ndjson(columns, chunks):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for chunk in chunks:
+        yield ''.join(encoder.encode(dict(zip(columns, row))) + '\n' for row in chunk)
+
+
+ENCODERS = {'csv': encode_csv, 'ndjson': encode_ndjson}
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(kind, params, chunk_size=None):
+    """``(chunks, content_type, filename)`` for an extract; ``chunks`` are bytes.
+
+    Filters are validated before anything is read, so bad parameters raise
+    ``InvalidExport`` rather than failing mid-stream.
+    """
+    if kind not in EXPORTS:
+        raise InvalidExport(f"Unknown export '{kind}'; expected one of {', '.join(EXPORTS)}")
+    file_format = params.get('format') or 'csv'
+    if file_format not in FORMATS:
+        raise InvalidExport(f"format must be one of {', '.join(FORMATS)}")
+    columns, rows = EXPORTS[kind]
+    rows = rows(params)
+    chunks = _chunked(rows, chunk_size or settings.EXPORT_CHUNK_SIZE)
+    encoded = (text.encode() for text in ENCODERS[file_format](columns, chunks))
+    filename = f'{kind}.{file_format}'
+    if _flag(params.get('gzip')):
+        return gzip_chunks(encoded), 'application/gzip', filename + '.gz'
+    return encoded, FORMATS[file_format], filename
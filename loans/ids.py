@@ -0,0 +1,136 @@
+import contextlib
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+
+from .models import IdBlock
+
+# Sequence name -> (model, field) whose values it hands out.
+SEQUENCES = {'customer': ('loans.Customer', 'customer_id'), 'loan': ('loans.Loan', 'loan_id')}
+
+
+def reserve(name, count):
+    """Reserve ``count`` consecutive ids of sequence ``name`` and return the first.
+
+    The range starts past the highest id already stored, so ids inserted with
+    explicit values (data ingestion) are skipped rather than handed out again.
+    """
+    model_name, field = SEQUENCES[name]
+    model = apps.get_model(model_name)
+    with transaction.atomic():
+        block, _ = IdBlock.objects.select_for_update().get_or_create(name=name)
+        highest = model.objects.aggregate(highest=models.Max(field))['highest'] or 0
+        start = max(block.next_value, highest + 1)
+        IdBlock.objects.filter(pk=name).update(next_value=start + count)
+    return start
+
+
+class _Block:
+    __slots__ = ('next', 'end')
+
+    def __init__(self, start, size):
+        self.next = start
+        self.end = start + size
+
+
+class IdAllocator:
+    """Hand out ids from a block reserved in the database, one reservation per block.
+
+    Each thread keeps its own block, so allocating an id costs no query
+    until the block runs out. A block reserved inside a transaction serves
+    the ``take`` that reserved it, and is kept for later calls only once the
+    transaction commits (an ``on_commit`` hook). If it rolls back, the
+    reservation is undone and the hook never runs, so the block is dropped:
+    another worker may now reserve the same range.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._local = threading.local()
+
+    def _keep(self, block):
+        self._local.block = block
+
+    def take(self, count):
+        """Return a list of ``count`` new ids."""
+        ids = []
+        block = getattr(self._local, 'block', None)
+        while len(ids) < count:
+            if block is None or block.next >= block.end:
+                size = max(settings.ID_BLOCK_SIZE, count - len(ids))
+                block = _Block(reserve(self.name, size), size)
+                if connection.in_atomic_block:
+                    self._local.block = None
+                    transaction.on_commit(lambda block=block: self._keep(block))
+                else:
+                    self._keep(block)
+            n = min(count - len(ids), block.end - block.next)
+            ids.extend(range(block.next, block.next + n))
+            block.next += n
+        return ids
+
+    def next(self):
+        return self.take(1)[0]
+
+    def reset(self):
+        """Forget this thread's block, e.g. after the table was emptied."""
+        self._local.block = None
+
+
+customer_ids = IdAllocator('customer')
+loan_ids = IdAllocator('loan')
+ALLOCATORS = {'customer': customer_ids, 'loan': loan_ids}
+
+
+def _sequence(model):
+    for name, (label, field) in SEQUENCES.items():
+        if model._meta.label == label:
+            return ALLOCATORS[name], field
+    raise ValueError(f'{model._meta.label} has no id sequence')
+
+
+def _savepoint():
+    # Retrying after an IntegrityError inside a transaction needs a savepoint
+    # to roll back to; in autocommit the failed INSERT has already ended.
+    return transaction.atomic() if connection.in_atomic_block else contextlib.nullcontext()
+
+
+def save_new(instance, attempts=3):
+    """Insert ``instance``, drawing a new id if the allocated one was taken meanwhile.
+
+    Ingestion and uploads store explicit ids, which can land inside a block
+    that a worker already holds. On a clash the block is dropped and the id
+    is drawn again from a new block, which starts past the highest stored id.
+    """
+    allocator, field = _sequence(type(instance))
+    for attempt in range(attempts):
+        try:
+            with _savepoint():
+                instance.save(force_insert=True)
+            return instance
+        except IntegrityError:
+            value = getattr(instance, field)
+            if attempt == attempts - 1 or not type(instance).objects.filter(**{field: value}).exists():
+                raise
+            allocator.reset()
+            setattr(instance, field, None)  # the pre_save signal allocates again
+
+
+def bulk_create_new(model, objects, batch_size=None, attempts=3):
+    """``bulk_create`` objects with allocated ids, redrawing the ids that clash like ``save_new``."""
+    allocator, field = _sequence(model)
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return model.objects.bulk_create(objects, batch_size=batch_size)
+        except IntegrityError:
+            values = [getattr(obj, field) for obj in objects]
+            taken = set(model.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+            if attempt == attempts - 1 or not taken:
+                raise
+            allocator.reset()
+            clashing = [obj for obj in objects if getattr(obj, field) in taken]
+            for obj, value in zip(clashing, allocator.take(len(clashing))):
+                setattr(obj, field, value)
@@ -0,0 +1,438 @@
+import csv
+import datetime
+import hashlib
+import itertools
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import Customer, IngestedRow, IngestionSource, Loan, to_money
+from .profiles import rebuild_profiles
+
+CUSTOMER_COLUMNS = ('customer_id', 'first_name', 'last_name', 'age', 'phone_number', 'monthly_salary', 'approved_limit')
+LOAN_COLUMNS = (
+    'customer_id', 'loan_id', 'loan_amount', 'tenure', 'interest_rate',
+    'monthly_repayment', 'emis_paid_on_time', 'start_date', 'end_date',
+)
+CONFLICT_MODES = ('ignore', 'update')
+MAX_REPORTED_ERRORS = 20
+
+
+def iter_xlsx_rows(path, min_row=2, max_row=None):
+    # openpyxl takes a noticeable share of startup, and only ingestion reads
+    # workbooks, so it is imported here rather than by every web process.
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(min_row=min_row, max_row=max_row, values_only=True)
+    finally:
+        wb.close()
+
+
+def xlsx_row_count(path):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        sheet = wb.active
+        if sheet.max_row is None:
+            # No stored dimensions; count the rows instead.
+            sheet.reset_dimensions()
+            return sum(1 for _ in sheet.iter_rows(values_only=True))
+        return sheet.max_row
+    finally:
+        wb.close()
+
+
+def shard_ranges(last_row, shard_size, first_row=2):
+    """Split rows ``first_row..last_row`` into inclusive ``(min_row, max_row)`` ranges."""
+    return [
+        (start, min(start + shard_size - 1, last_row))
+        for start in range(first_row, last_row + 1, shard_size)
+    ]
+
+
+def parse_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+
+
+def parse_customer_row(row):
+    if len(row) < len(CUSTOMER_COLUMNS):
+        raise ValueError(f'expected {len(CUSTOMER_COLUMNS)} columns, got {len(row)}')
+    customer_id, first_name, last_name, age, phone_number, monthly_salary, approved_limit = row[:len(CUSTOMER_COLUMNS)]
+    return {
+        'customer_id': int(customer_id),
+        'first_name': str(first_name),
+        'last_name': str(last_name),
+        'age': int(age),
+        'phone_number': str(phone_number),
+        'monthly_salary': to_money(monthly_salary),
+        'approved_limit': to_money(approved_limit),
+    }
+
+
+def parse_loan_row(row):
+    if len(row) < len(LOAN_COLUMNS):
+        raise ValueError(f'expected {len(LOAN_COLUMNS)} columns, got {len(row)}')
+    customer_id, loan_id, loan_amount, tenure, interest_rate, monthly_repayment, emis_paid_on_time, start_date, end_date = row[:len(LOAN_COLUMNS)]
+    return {
+        'customer_id': int(customer_id),
+        'loan_id': int(loan_id),
+        'loan_amount': to_money(loan_amount),
+        'tenure': int(tenure),
+        'interest_rate': to_money(interest_rate),
+        'monthly_repayment': to_money(monthly_repayment),
+        'emis_paid_on_time': int(emis_paid_on_time),
+        'start_date': parse_date(start_date),
+        'end_date': parse_date(end_date),
+    }
+
+
+def new_summary():
+    return {'rows': 0, 'inserted': 0, 'updated': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+
+
+def _record_error(summary, message):
+    if len(summary['errors']) < MAX_REPORTED_ERRORS:
+        summary['errors'].append(message)
+
+
+def _finish(summary, started):
+    elapsed = time.perf_counter() - started
+    summary['seconds'] = round(elapsed, 4)
+    summary['rows_per_second'] = round(summary['rows'] / elapsed, 1) if elapsed > 0 else None
+    return summary
+
+
+def merge_summaries(summaries):
+    total = new_summary()
+    for summary in summaries:
+        for key in ('rows', 'inserted', 'updated', 'skipped', 'failed'):
+            total[key] += summary[key]
+        for error in summary['errors']:
+            _record_error(total, error)
+    return total
+
+
+def _batches(rows, parse, batch_size, summary, first_row):
+    """Yield ``(batch, last_row)``: parsed rows and the number of the last row read."""
+    batch = []
+    number = first_row - 1
+    for number, row in enumerate(rows, start=first_row):
+        if row is None or all(value is None for value in row):
+            continue
+        summary['rows'] += 1
+        try:
+            batch.append(parse(row))
+        except (TypeError, ValueError, ArithmeticError) as exc:
+            summary['failed'] += 1
+            _record_error(summary, f'row {number}: {exc}')
+            continue
+        if len(batch) >= batch_size:
+            yield batch, number
+            batch = []
+    if batch:
+        yield batch, number
+
+
+class BatchWriter:
+    """Write parsed rows of one model with ``bulk_create``, a batch at a time.
+
+    Rows whose key already exists are skipped (``on_conflict='ignore'``) or
+    overwritten (``on_conflict='update'``). A key repeated within one batch
+    keeps its first occurrence; a repeat in a later batch meets the committed
+    row and is handled like any other existing key. Nothing is kept between
+    batches apart from the counters, so memory does not grow with the input.
+    """
+
+    model = None
+    key = None
+
+    def __init__(self, batch_size=None, on_conflict=None):
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.on_conflict = on_conflict or settings.INGEST_CONFLICT_MODE
+        if self.on_conflict not in CONFLICT_MODES:
+            raise ValueError(f'on_conflict must be one of {", ".join(CONFLICT_MODES)}')
+
+    def prepare(self, batch, summary):
+        return batch
+
+    def missing_reference(self, values):
+        """Why a parsed row cannot be written yet (e.g. its customer is missing), or ``None``."""
+        return None
+
+    def auto_now_fields(self):
+        # Overwritten rows must bump their updated_at like a save() would.
+        return [field.name for field in self.model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+
+    def existing_keys(self, keys):
+        return set(self.model.objects.filter(**{f'{self.key}__in': keys}).values_list(self.key, flat=True))
+
+    def build(self, values):
+        return self.model(**values)
+
+    def after_write(self, objects):
+        pass
+
+    def write(self, batch, summary):
+        rows = []
+        seen = set()
+        for values in self.prepare(batch, summary):
+            if values[self.key] in seen:
+                summary['skipped'] += 1
+                continue
+            seen.add(values[self.key])
+            rows.append(values)
+        if not rows:
+            return
+
+        keys = [values[self.key] for values in rows]
+        existing = self.existing_keys(keys)
+        new = [self.build(values) for values in rows if values[self.key] not in existing]
+        changed = [self.build(values) for values in rows if values[self.key] in existing]
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(new, batch_size=self.batch_size, ignore_conflicts=True)
+                if self.on_conflict == 'update' and changed:
+                    update_fields = [name for name in rows[0] if name != self.key] + self.auto_now_fields()
+                    self.model.objects.bulk_create(
+                        changed, batch_size=self.batch_size,
+                        update_conflicts=True, unique_fields=[self.key], update_fields=update_fields,
+                    )
+                self.after_write(new + (changed if self.on_conflict == 'update' else []))
+        except DatabaseError as exc:
+            summary['failed'] += len(rows)
+            _record_error(summary, f'batch starting at {self.key} {keys[0]}: {exc}')
+            return
+        summary['inserted'] += len(new)
+        if self.on_conflict == 'update':
+            summary['updated'] += len(changed)
+        else:
+            summary['skipped'] += len(changed)
+
+    def run(self, rows, parse, first_row=2, on_batch=None):
+        started = time.perf_counter()
+        summary = new_summary()
+        for batch, _ in _batches(rows, parse, self.batch_size, summary, first_row):
+            self.write(batch, summary)
+            if on_batch is not None:
+                on_batch(summary)
+        return _finish(summary, started)
+
+
+class CustomerWriter(BatchWriter):
+    model = Customer
+    key = 'customer_id'
+
+
+class LoanWriter(BatchWriter):
+    model = Loan
+    key = 'loan_id'
+
+    def __init__(self, batch_size=None, on_conflict=None, refresh_profiles=True):
+        super().__init__(batch_size, on_conflict)
+        self.refresh_profiles = refresh_profiles
+        self.customer_pks = dict(Customer.objects.values_list('customer_id', 'id'))
+
+    def missing_reference(self, values):
+        if values['customer_id'] not in self.customer_pks:
+            return f'customer {values["customer_id"]} does not exist'
+        return None
+
+    def prepare(self, batch, summary):
+        for values in batch:
+            customer_pk = self.customer_pks.get(values['customer_id'])
+            if customer_pk is None:
+                summary['skipped'] += 1
+                continue
+            yield dict(values, customer_id=customer_pk)
+
+    def existing_keys(self, keys):
+        existing = dict(Loan.objects.filter(loan_id__in=keys).values_list('loan_id', 'customer_id'))
+        self.previous_customers = set(existing.values())
+        return set(existing)
+
+    def after_write(self, objects):
+        # bulk_create skips the Loan signals, so refresh the touched profiles
+        # inside the same transaction as the batch. Parallel shards opt out and
+        # leave it to one rebuild at the end, as their batches would otherwise
+        # rebuild the same customers concurrently.
+        if not self.refresh_profiles:
+            return
+        customers = {loan.customer_id for loan in objects}
+        if self.on_conflict == 'update':
+            customers |= self.previous_customers
+        if customers:
+            rebuild_profiles(customers)
+
+
+def ingest_customers(rows, batch_size=None, on_conflict=None, first_row=2, on_batch=None):
+    return CustomerWriter(batch_size, on_conflict).run(rows, parse_customer_row, first_row, on_batch)
+
+
+def ingest_loans(rows, batch_size=None, on_conflict=None, first_row=2, on_batch=None, refresh_profiles=True):
+    writer = LoanWriter(batch_size, on_conflict, refresh_profiles)
+    return writer.run(rows, parse_loan_row, first_row, on_batch)
+
+
+def iter_csv_rows(path):
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        yield from csv.reader(handle)
+
+
+def iter_source_rows(path, min_row=2):
+    if str(path).lower().endswith('.csv'):
+        return itertools.islice(iter_csv_rows(path), min_row - 1, None)
+    return iter_xlsx_rows(path, min_row)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_hash(values, columns):
+    # Hashed after parsing, so "5000" and 5000.0 in a re-saved workbook match.
+    return hashlib.blake2b('\x1f'.join(str(values[name]) for name in columns).encode(), digest_size=16).hexdigest()
+
+
+def needs_sync(path):
+    """Whether ``sync_file`` has anything to apply from ``path``."""
+    source = IngestionSource.objects.filter(name=Path(path).name).first()
+    return source is None or bool(source.pending_hash) or source.file_hash != file_hash(path)
+
+
+SYNC_KINDS = {
+    'customers': (CUSTOMER_COLUMNS, parse_customer_row, CustomerWriter),
+    'loans': (LOAN_COLUMNS, parse_loan_row, LoanWriter),
+}
+
+
+def _sync_batch(source, writer, columns, batch, summary):
+    """Write the rows of ``batch`` that are new or changed since the last sync.
+
+    A row that refers to a missing row (a loan whose customer is not stored
+    yet) counts as failed, so the file stays unsynced and the row is retried
+    on the next sync, once the customer may have arrived.
+    """
+    rows = {}
+    for values in batch:
+        if values[writer.key] in rows:
+            summary['skipped'] += 1
+            continue
+        error = writer.missing_reference(values)
+        if error is not None:
+            summary['failed'] += 1
+            _record_error(summary, f'{writer.key} {values[writer.key]}: {error}')
+            continue
+        rows[values[writer.key]] = values
+    hashes = {key: row_hash(values, columns) for key, values in rows.items()}
+    known = dict(IngestedRow.objects.filter(source=source, key__in=list(rows)).values_list('key', 'row_hash'))
+    unchanged = [key for key, digest in hashes.items() if known.get(key) == digest]
+    changed = [key for key, digest in hashes.items() if known.get(key) != digest]
+    summary['unchanged'] += len(unchanged)
+
+    failed = summary['failed']  # only write failures hold back the batch's IngestedRows
+    writer.write([rows[key] for key in changed], summary)
+    IngestedRow.objects.filter(source=source, key__in=unchanged).update(generation=source.generation)
+    if summary['failed'] == failed:
+        IngestedRow.objects.bulk_create(
+            [IngestedRow(source=source, key=key, row_hash=hashes[key], generation=source.generation) for key in changed],
+            batch_size=writer.batch_size,
+            update_conflicts=True, unique_fields=['source', 'key'], update_fields=['row_hash', 'generation'],
+        )
+
+
+def _delete_missing(source, writer):
+    """Delete the rows an earlier sync applied that this run did not see in the file."""
+    missing = IngestedRow.objects.filter(source=source).exclude(generation=source.generation)
+    keys = list(missing.values_list('key', flat=True))
+    for start in range(0, len(keys), writer.batch_size):
+        # A queryset delete sends the Loan signals, so profiles follow.
+        writer.model.objects.filter(**{f'{writer.key}__in': keys[start:start + writer.batch_size]}).delete()
+    missing.delete()
+    return len(keys)
+
+
+def sync_file(kind, path, batch_size=None, on_batch=None):
+    """Apply a source file's changes since it was last synced.
+
+    A file whose content hash matches the last complete sync is skipped
+    without being read. Otherwise only rows whose hash changed are written
+    (inserted or overwritten), and once the whole file has been read, rows of
+    earlier syncs that are no longer in it are deleted. Each batch commits
+    with its checkpoint, so a run that dies part way resumes after the last
+    committed batch when the file is unchanged. A file with failed rows is
+    left unsynced, deletes nothing, and is read again next time.
+    """
+    columns, parse, writer_class = SYNC_KINDS[kind]
+    started = time.perf_counter()
+    digest = file_hash(path)
+    source, _ = IngestionSource.objects.get_or_create(name=Path(path).name, defaults={'kind': kind})
+    summary = {**new_summary(), 'unchanged': 0, 'deleted': 0, 'resumed_from': None}
+    if source.file_hash == digest and not source.pending_hash:
+        summary['file'] = 'unchanged'
+        return _finish(summary, started)
+
+    if source.pending_hash == digest:
+        summary.update(source.summary, resumed_from=source.checkpoint_row + 1)
+    else:
+        source.generation += 1
+        source.pending_hash = digest
+        source.checkpoint_row = 1  # the header
+        source.started_at = timezone.now()
+        source.summary = summary
+        source.save()
+    summary['file'] = 'changed'
+
+    writer = writer_class(batch_size, on_conflict='update')
+    first_row = source.checkpoint_row + 1
+    for batch, last_row in _batches(iter_source_rows(path, first_row), parse, writer.batch_size, summary, first_row):
+        with transaction.atomic():
+            _sync_batch(source, writer, columns, batch, summary)
+            source.checkpoint_row = last_row
+            source.summary = summary
+            source.save(update_fields=['checkpoint_row', 'summary'])
+        if on_batch is not None:
+            on_batch(summary)
+
+    with transaction.atomic():
+        if not summary['failed']:
+            summary['deleted'] = _delete_missing(source, writer)
+        source.file_hash = '' if summary['failed'] else digest
+        source.pending_hash = ''
+        source.checkpoint_row = 0
+        source.finished_at = timezone.now()
+        source.summary = _finish(summary, started)
+        source.save()
+    return summary
+
+
+def iter_upload_rows(path, file_name):
+    """Stream an uploaded CSV or XLSX file as ``(header, rows)``."""
+    if file_name.lower().endswith('.csv'):
+        rows = iter_csv_rows(path)
+    else:
+        rows = iter_xlsx_rows(path, min_row=1)
+    header = next(rows, None) or ()
+    header = list(header)
+    while header and header[-1] in (None, ''):
+        header.pop()
+    return header, rows
+
+
+UPLOAD_KINDS = {
+    len(CUSTOMER_COLUMNS): ('customers', ingest_customers),
+    len(LOAN_COLUMNS): ('loans', ingest_loans),
+}
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
+from .models import Loan
+from .renderers import dumps
+
+LISTING_FIELDS = ('loan_id', 'loan_amount', 'interest_rate', 'monthly_installment', 'repayments_left')
+STREAM_CHUNK_SIZE = 2000
+
+
+class InvalidPage(ValueError):
+    pass
+
+
+def loan_rows(customer_pk):
+    """A customer's loans as listing dicts, with ``repayments_left`` computed in SQL."""
+    return (
+        Loan.objects.filter(customer_id=customer_pk)
+        .annotate(monthly_installment=F('monthly_repayment'), repayments_left=F('tenure') - F('emis_paid_on_time'))
+        .values(*LISTING_FIELDS)
+    )
+
+
+def _positive_int(value, name):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise InvalidPage(f'{name} must be an integer')
+    if number < 0:
+        raise InvalidPage(f'{name} must not be negative')
+    return number
+
+
+def page_params(params):
+    """Read ``cursor`` and ``limit`` from query params or a request body.
+
+    Returns ``None`` when neither is given, meaning the full legacy list.
+    """
+    cursor = params.get('cursor')
+    limit = params.get('limit')
+    if cursor in (None, '') and limit in (None, ''):
+        return None
+    cursor = None if cursor in (None, '') else _positive_int(cursor, 'cursor')
+    limit = settings.LOAN_LIST_PAGE_SIZE if limit in (None, '') else _positive_int(limit, 'limit')
+    if not 1 <= limit <= settings.LOAN_LIST_MAX_PAGE_SIZE:
+        raise InvalidPage(f'limit must be between 1 and {settings.LOAN_LIST_MAX_PAGE_SIZE}')
+    return cursor, limit
+
+
+def _page_rows(customer_pk, cursor, limit):
+    rows = loan_rows(customer_pk).order_by('loan_id')
+    if cursor is not None:
+        rows = rows.filter(loan_id__gt=cursor)
+    # One row past the page tells whether there is a next one.
+    return rows[:limit + 1]
+
+
+def _page(results, limit):
+    has_more = len(results) > limit
+    results = results[:limit]
+    return {
+        'results': results,
+        'next_cursor': results[-1]['loan_id'] if has_more else None,
+    }
+
+
+def loan_page(customer_pk, cursor, limit):
+    """One keyset page of loans ordered by ``loan_id``, after ``cursor``."""
+    return _page(list(_page_rows(customer_pk, cursor, limit)), limit)
+
+
+async def aloan_page(customer_pk, cursor, limit):
+    return _page([row async for row in _page_rows(customer_pk, cursor, limit)], limit)
+
+
+def _encode(number, row):
+    return (b',' if number else b'') + dumps(row)
+
+
+def stream_loans(customer_pk):
+    """Stream the full list as a JSON array without building it in memory."""
+    def chunks():
+        yield b'['
+        for number, row in enumerate(loan_rows(customer_pk).order_by('id').iterator(chunk_size=STREAM_CHUNK_SIZE)):
+            yield _encode(number, row)
+        yield b']'
+
+    return StreamingHttpResponse(chunks(), content_type='application/json')
+
+
+def astream_loans(customer_pk):
+    async def chunks():
+        yield b'['
+        number = 0
+        async for row in loan_rows(customer_pk).order_by('id').aiterator(chunk_size=STREAM_CHUNK_SIZE):
+            yield _encode(number, row)
+            number += 1
+        yield b']'
+
+    return StreamingHttpResponse(chunks(), content_type='application/json')
+
+
+def wants_stream(params):
+    return str(params.get('stream', '')).lower() in ('1', 'true', 'yes')
+
+
+def list_loans(customer_pk, params):
+    """Dispatch a listing request to the full list, a page, or a stream.
+
+    Without ``cursor`` or ``limit`` the response is the plain list of every
+    loan in creation order, as it has always been.
+
+    Returns either response data for a DRF ``Response`` or a ready
+    ``StreamingHttpResponse``.
+    """
+    if wants_stream(params):
+        return stream_loans(customer_pk)
+    page = page_params(params)
+    if page is None:
+        return list(loan_rows(customer_pk).order_by('id'))
+    return loan_page(customer_pk, *page)
+
+
+async def alist_loans(customer_pk, params):
+    if wants_stream(params):
+        return astream_loans(customer_pk)
+    page = page_params(params)
+    if page is None:
+        return [row async for row in loan_rows(customer_pk).order_by('id')]
+    return await aloan_page(customer_pk, *page)
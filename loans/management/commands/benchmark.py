@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from loans.benchmarks import compare_results, run_benchmarks, save_results
+from loans.synthetic import parse_distribution
+import json
+import os
+import tempfile
+
+
+class Command(BaseCommand):
+    help = 'Benchmark scoring, EMI, the API views and ingestion on synthetic datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated dataset sizes (customers)')
+        parser.add_argument('--repeat', type=int, default=50, help='Calls per benchmark')
+        parser.add_argument('--ingest-repeat', type=int, default=3, help='Ingestion runs per dataset size')
+        parser.add_argument('--loans', default='poisson:3', help='Loans per customer distribution')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--clients', default='',
+            help='Comma-separated concurrent client counts for the WSGI vs ASGI read benchmark, e.g. 1,64,256',
+        )
+        parser.add_argument('--requests-per-client', type=int, default=20, help='Requests each concurrent client sends')
+        parser.add_argument(
+            '--serializer-objects', type=int, default=10000,
+            help='Objects per payload in the serializer microbenchmark (0 to skip)',
+        )
+        parser.add_argument(
+            '--cold-starts', type=int, default=5,
+            help='Fresh interpreters to time from start to first response (0 to skip)',
+        )
+        parser.add_argument('--output', help='Where to save the JSON report (default benchmarks/results-<timestamp>.json)')
+        parser.add_argument('--compare', help='Earlier JSON report to compare median latencies against')
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help='Run against the configured database instead of a throwaway test database. Its data is deleted!',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+            clients = [int(count) for count in options['clients'].split(',') if count]
+            parse_distribution(options['loans'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        setup_test_environment()
+        old_name = None
+        if not options['use_current_db']:
+            old_name = connection.settings_dict['NAME']
+            if connection.vendor == 'sqlite':
+                # An in-memory database fails concurrent writers rather than
+                # queueing them, which the concurrency benchmark relies on.
+                connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'credit_approval_benchmark.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = run_benchmarks(
+                sizes, options['repeat'], options['loans'], options['seed'], options['ingest_repeat'],
+                log=self.stdout.write, clients=clients, requests_per_client=options['requests_per_client'],
+                serializer_count=options['serializer_objects'], cold_starts=options['cold_starts'],
+            )
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for row in report['results']:
+            if row.get('requests_per_second') is not None:
+                extra = f"{row['requests_per_second']:>9} req/s"
+            elif row['queries_per_call'] is not None:
+                extra = f"{row['queries_per_call']:>7} queries"
+            else:
+                extra = ''  # cold starts run in other processes
+            self.stdout.write(
+                f"{row['size']:>8} {row['benchmark']:<40} p50 {row['p50_ms']:>10.3f} ms  "
+                f"p90 {row['p90_ms']:>10.3f} ms  p99 {row['p99_ms']:>10.3f} ms  {extra}"
+            )
+        output = options['output'] or f"benchmarks/results-{timezone.now():%Y%m%d-%H%M%S}.json"
+        self.stdout.write(self.style.SUCCESS(f'Saved {save_results(report, output)}'))
+
+        if baseline is not None:
+            self.stdout.write('\nMedian latency against baseline:')
+            for size, name, old, new, ratio in compare_results(report, baseline):
+                change = f'{ratio:.2f}x' if ratio is not None else 'n/a'
+                self.stdout.write(f'{size:>8} {name:<40} {old:>10.3f} -> {new:>10.3f} ms  {change}')
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from loans.ingestion import needs_sync
+from loans.tasks import SOURCE_FILES, data_file, sync_workflow
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = 'Prepare the database on container start, skipping the steps that are already done'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-ingest', action='store_true', help='Do not queue ingestion of the source workbooks')
+
+    def handle(self, *args, **options):
+        self.step('migrate', self.migrate)
+        self.step('superuser', self.superuser)
+        if not options['skip_ingest']:
+            self.step('ingest', self.ingest)
+
+    def step(self, name, func):
+        started = time.perf_counter()
+        outcome = func()
+        self.stdout.write(f'{name}: {outcome} ({time.perf_counter() - started:.2f}s)')
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            return 'skipped, no unapplied migrations'
+        call_command('migrate', interactive=False, verbosity=0)
+        return f'applied {len(plan)} migrations'
+
+    def superuser(self):
+        username = os.getenv('DJANGO_SUPERUSER_USERNAME')
+        if not username:
+            return 'skipped, DJANGO_SUPERUSER_USERNAME is not set'
+        User = get_user_model()
+        if User.objects.filter(**{User.USERNAME_FIELD: username}).exists():
+            return f'skipped, {username} exists'
+        call_command('createsuperuser', interactive=False, verbosity=0)
+        return f'created {username}'
+
+    def ingest(self):
+        paths = [data_file(name) for name in SOURCE_FILES.values()]
+        missing = [path.name for path in paths if not path.exists()]
+        if missing:
+            return f"skipped, {', '.join(missing)} not found in {settings.BASE_DIR}"
+        changed = [path.name for path in paths if needs_sync(path)]
+        if not changed:
+            return 'skipped, source workbooks unchanged since the last sync'
+        result = sync_workflow().apply_async()
+        return f"queued ({result.id}) for {', '.join(changed)}"
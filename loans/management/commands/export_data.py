@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from loans.exports import EXPORTS, FORMATS, InvalidExport, export_stream
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or NDJSON extract of the loans or customers, in constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+        parser.add_argument('--gzip', action='store_true', help='Compress the extract with gzip')
+        parser.add_argument('--active', action='store_true', help='Only active loans, or customers with one')
+        parser.add_argument('--since', help='Loans starting on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Loans starting on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--customer-id', help="Only this customer, or this customer's loans")
+        parser.add_argument('--chunk-size', type=int, help='Rows per fetch (default EXPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        params = {name: options[name] for name in ('format', 'gzip', 'active', 'since', 'until', 'customer_id')}
+        try:
+            chunks, _, filename = export_stream(options['kind'], params, options['chunk_size'])
+        except InvalidExport as exc:
+            raise CommandError(str(exc))
+
+        if options['output'] is None:
+            if options['gzip']:
+                raise CommandError('--gzip needs --output')
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+
+        size = 0
+        with open(options['output'], 'wb') as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+                size += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {filename} ({size} bytes) to {options['output']}."))
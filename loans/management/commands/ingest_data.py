@@ -1,11 +1,23 @@
 from django.core.management.base import BaseCommand
-from loans.tasks import ingest_customer_data, ingest_loan_data
+from loans.tasks import ingestion_workflow, sync_workflow
 
 
 class Command(BaseCommand):
     help = 'Ingest customer and loan data from Excel files'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sharded', action='store_true',
+            help='Re-ingest every row in parallel shards instead of applying only what changed since the last sync',
+        )
+        parser.add_argument('--shard-size', type=int, help='Rows per parallel shard (default INGEST_SHARD_SIZE); implies --sharded')
+        parser.add_argument('--batch-size', type=int, help='Rows per bulk insert (default INGEST_BATCH_SIZE)')
+        parser.add_argument('--on-conflict', choices=['ignore', 'update'], help='How --sharded treats rows that already exist')
+
     def handle(self, *args, **options):
-        ingest_customer_data.delay()
-        ingest_loan_data.delay()
-        self.stdout.write(self.style.SUCCESS('Data ingestion tasks queued.'))
\ No newline at end of file
+        if options['sharded'] or options['shard_size']:
+            workflow = ingestion_workflow(options['shard_size'], options['batch_size'], options['on_conflict'])
+        else:
+            workflow = sync_workflow(options['batch_size'])
+        result = workflow.apply_async()
+        self.stdout.write(self.style.SUCCESS(f'Data ingestion queued ({result.id}).'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from loans.startup import PROFILED_MODULES, import_profile, import_report
+import json
+
+
+class Command(BaseCommand):
+    help = 'Report the cumulative import cost of credit_approval and loans in a fresh interpreter'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module', action='append', dest='modules',
+            help=f"Module to import after django.setup(); repeatable (default {', '.join(PROFILED_MODULES)})",
+        )
+        parser.add_argument('--top', type=int, default=15, help='Rows per table')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        report = import_report(import_profile(options['modules'] or PROFILED_MODULES), options['top'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"Imports took {report['total_ms']} ms, {report['project_ms']} ms of it in project code.")
+        self.stdout.write('\nProject modules by cumulative import time:')
+        for entry in report['modules']:
+            self.stdout.write(f"{entry['cumulative_ms']:>10.1f} ms {entry['self_ms']:>8.1f} ms self  {entry['module']}")
+        self.stdout.write('\nHeaviest dependencies first imported by project modules:')
+        for entry in report['dependencies']:
+            self.stdout.write(f"{entry['cumulative_ms']:>10.1f} ms  {entry['module']} (from {entry['imported_by']})")
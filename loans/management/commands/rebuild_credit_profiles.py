@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from loans import score_cache
+from loans.profiles import rebuild_profiles, verify_profiles
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the per-customer credit profiles against the Loan table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report profiles that drifted from the Loan table')
+        parser.add_argument('--customer', type=int, action='append', dest='customers', help='Limit to this customer pk (repeatable)')
+
+    def handle(self, *args, **options):
+        customer_ids = options['customers']
+        if options['verify']:
+            mismatches = verify_profiles(customer_ids)
+            for customer_id, field, stored, expected in mismatches:
+                self.stdout.write(f'customer {customer_id}: {field} is {stored}, expected {expected}')
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} credit profile totals out of date.')
+            self.stdout.write(self.style.SUCCESS('Credit profiles match the Loan table.'))
+            return
+
+        count = rebuild_profiles(customer_ids)
+        score_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} credit profiles.'))
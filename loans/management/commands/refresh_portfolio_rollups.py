@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from loans.analytics import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Refresh the portfolio analytics rollups from the last watermark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every rollup from the Loan table')
+
+    def handle(self, *args, **options):
+        summary = refresh_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['mode'].capitalize()} refresh recounted {summary['customers']} customers "
+            f"({summary['loans']} loans) in {summary['seconds']}s."
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from loans.tasks import start_rescore
+
+
+class Command(BaseCommand):
+    help = 'Rescore every customer into credit score snapshots, in parallel chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Customers per task (default RESCORE_CHUNK_SIZE)')
+        parser.add_argument(
+            '--resume', nargs='?', const=True, metavar='RUN_ID',
+            help='Finish an interrupted run (default: the latest unfinished one) instead of starting a new one',
+        )
+
+    def handle(self, *args, **options):
+        result = start_rescore.delay(options['chunk_size'], options['resume'])
+        self.stdout.write(self.style.SUCCESS(f'Rescoring queued ({result.id}).'))
@@ -0,0 +1,283 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import score_cache
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+TASK_PREFIX = 'loans.'
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters for one request, filled in by the SQL wrapper and ``timed``."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.phases = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries += 1
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    # Installed once on every connection; a no-op outside a request.
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+def install_execute_wrapper(sender, connection, **kwargs):
+    """``connection_created`` receiver that hooks SQL timing into a connection.
+
+    The wrapper is permanent rather than pushed per request because async
+    views run their queries on other threads' connections; the request is
+    found through the context variable, which follows the request there.
+    """
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to ``phase`` of the current request.
+
+    Also usable as a decorator. Outside a request (tasks, shell) it only
+    costs the context variable lookup.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(phase, time.perf_counter() - started)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Process-local histograms and counters, keyed by metric name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, labels, value, buckets=SECONDS_BUCKETS):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {
+                key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in self.histograms.items()
+            }
+            return histograms, dict(self.counters)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = Registry()
+
+
+def observe_request(route, method, status_code, duration, metrics):
+    labels = (('route', route), ('method', method))
+    registry.increment('http_requests_total', labels + (('status', str(status_code)),))
+    registry.observe('http_request_duration_seconds', labels, duration)
+    registry.observe('http_request_db_queries', labels, metrics.queries, QUERY_BUCKETS)
+    registry.observe('http_request_db_seconds', labels, metrics.sql)
+    for phase in ('scoring', 'serialize'):
+        registry.observe(f'http_request_{phase}_seconds', labels, metrics.phases.get(phase, 0.0))
+
+
+def server_timing(duration, metrics):
+    entries = [f'db;dur={metrics.sql * 1000:.2f};desc="{metrics.queries} queries"']
+    entries += [f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in metrics.phases.items()]
+    entries.append(f'total;dur={duration * 1000:.2f}')
+    return ', '.join(entries)
+
+
+# Celery workers run in other processes than the web server, so task
+# durations go to a shared cache (the 'metrics' alias) rather than the
+# process-local registry. Each observation is three atomic increments.
+
+def _task_cache():
+    return caches[settings.METRICS_CACHE_ALIAS]
+
+
+def _incr(cache, key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def _task_key(task_name, outcome, part):
+    return f'metrics:task:{task_name}:{outcome}:{part}'
+
+
+def observe_task(task_name, outcome, duration):
+    cache = _task_cache()
+    bucket = bisect.bisect_left(SECONDS_BUCKETS, duration)
+    _incr(cache, _task_key(task_name, outcome, bucket), 1)
+    _incr(cache, _task_key(task_name, outcome, 'count'), 1)
+    _incr(cache, _task_key(task_name, outcome, 'micros'), round(duration * 1e6))
+
+
+def task_histograms(task_names):
+    parts = [*range(len(SECONDS_BUCKETS) + 1), 'count', 'micros']
+    keys = [_task_key(name, outcome, part) for name in task_names for outcome in ('success', 'failure') for part in parts]
+    values = _task_cache().get_many(keys)
+    histograms = {}
+    for name in task_names:
+        for outcome in ('success', 'failure'):
+            count = values.get(_task_key(name, outcome, 'count'), 0)
+            if not count:
+                continue
+            counts = [values.get(_task_key(name, outcome, bucket), 0) for bucket in range(len(SECONDS_BUCKETS) + 1)]
+            micros = values.get(_task_key(name, outcome, 'micros'), 0)
+            labels = (('task', name), ('outcome', outcome))
+            histograms[('celery_task_duration_seconds', labels)] = (SECONDS_BUCKETS, counts, micros / 1e6, count)
+    return histograms
+
+
+_task_starts = {}
+
+
+def task_started(task_id=None, task=None, **kwargs):
+    if task is not None and task.name.startswith(TASK_PREFIX):
+        _task_starts[task_id] = time.perf_counter()
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _task_starts.pop(task_id, None)
+    if started is not None:
+        observe_task(task.name, 'failure' if state == 'FAILURE' else 'success', time.perf_counter() - started)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+HELP = {
+    'http_requests_total': ('counter', 'Requests handled, by route, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Time spent handling a request.'),
+    'http_request_db_queries': ('histogram', 'SQL queries run per request.'),
+    'http_request_db_seconds': ('histogram', 'Time spent in SQL per request.'),
+    'http_request_scoring_seconds': ('histogram', 'Time spent computing credit scores per request.'),
+    'http_request_serialize_seconds': ('histogram', 'Time spent rendering the response body.'),
+    'celery_task_duration_seconds': ('histogram', 'Run time of loans.* Celery tasks, from every worker.'),
+    'credit_score_cache_hits_total': ('counter', 'Credit score cache hits in this process.'),
+    'credit_score_cache_misses_total': ('counter', 'Credit score cache misses in this process.'),
+    'credit_score_cache_invalidations_total': ('counter', 'Per-customer score invalidations in this process.'),
+    'credit_score_cache_bulk_invalidations_total': ('counter', 'Whole-cache score invalidations in this process.'),
+    'credit_score_computations_total': ('counter', 'Credit scores computed after a cache miss in this process.'),
+    'credit_score_coalesced_total': (
+        'counter', 'Cache misses served by a concurrent computation instead of computing again, by what they waited on.',
+    ),
+    'credit_score_single_flight_timeouts_total': (
+        'counter', 'Cache misses that stopped waiting for a concurrent computation and computed the score themselves.',
+    ),
+}
+
+
+def render(task_names=()):
+    """Everything collected so far, in the Prometheus text exposition format."""
+    histograms, counters = registry.snapshot()
+    histograms.update(task_histograms(task_names))
+    cache_stats = score_cache.stats()
+    for name in ('hits', 'misses', 'invalidations', 'bulk_invalidations'):
+        counters[(f'credit_score_cache_{name}_total', ())] = cache_stats[name]
+    flights = cache_stats['single_flight']
+    counters[('credit_score_computations_total', ())] = flights['computations']
+    counters[('credit_score_coalesced_total', (('source', 'thread'),))] = flights['coalesced_thread']
+    counters[('credit_score_coalesced_total', (('source', 'lock'),))] = flights['coalesced_lock']
+    counters[('credit_score_single_flight_timeouts_total', ())] = flights['wait_timeouts']
+
+    series = {}
+    for (name, labels), value in counters.items():
+        series.setdefault(name, []).append(f'{name}{_labels(labels)} {_format(value)}')
+    for (name, labels), (buckets, counts, total, count) in histograms.items():
+        lines = series.setdefault(name, [])
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{_labels(labels, [("le", _format(bound))])} {cumulative}')
+        lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {count}')
+        lines.append(f'{name}_sum{_labels(labels)} {_format(float(total))}')
+        lines.append(f'{name}_count{_labels(labels)} {count}')
+
+    output = []
+    for name in sorted(series):
+        kind, text = HELP.get(name, ('untyped', name))
+        output += [f'# HELP {name} {text}', f'# TYPE {name} {kind}', *series[name]]
+    return '\n'.join(output) + '\n'
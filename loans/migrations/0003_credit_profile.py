@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import ExtractYear
+
+
+def build_profiles(apps, schema_editor):
+    Loan = apps.get_model('loans', 'Loan')
+    CreditProfile = apps.get_model('loans', 'CreditProfile')
+    CreditProfileYear = apps.get_model('loans', 'CreditProfileYear')
+    active = models.Q(emis_paid_on_time__lt=models.F('tenure'))
+    totals = Loan.objects.values('customer_id').annotate(
+        active_exposure=models.Sum('loan_amount', filter=active),
+        active_emi_sum=models.Sum('monthly_repayment', filter=active),
+        total_tenure=models.Sum('tenure'),
+        emis_paid_on_time=models.Sum('emis_paid_on_time'),
+        loan_count=models.Count('id'),
+        volume=models.Sum('loan_amount'),
+    ).order_by()
+    CreditProfile.objects.bulk_create(
+        CreditProfile(
+            customer_id=row['customer_id'],
+            active_exposure=row['active_exposure'] or 0,
+            active_emi_sum=row['active_emi_sum'] or 0,
+            total_tenure=row['total_tenure'],
+            emis_paid_on_time=row['emis_paid_on_time'],
+            loan_count=row['loan_count'],
+            volume=row['volume'],
+        )
+        for row in totals
+    )
+    yearly = Loan.objects.values('customer_id', year=ExtractYear('start_date')).annotate(
+        loan_count=models.Count('id'),
+        volume=models.Sum('loan_amount'),
+    ).order_by()
+    CreditProfileYear.objects.bulk_create(CreditProfileYear(**row) for row in yearly)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_alter_customer_customer_id_alter_loan_loan_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditProfile',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_profile', serialize=False, to='loans.customer')),
+                ('active_exposure', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('active_emi_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_tenure', models.IntegerField(default=0)),
+                ('emis_paid_on_time', models.IntegerField(default=0)),
+                ('loan_count', models.IntegerField(default=0)),
+                ('volume', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CreditProfileYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('loan_count', models.IntegerField(default=0)),
+                ('volume', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_profile_years', to='loans.customer')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('customer', 'year'), name='unique_credit_profile_year')],
+            },
+        ),
+        migrations.RunPython(build_profiles, migrations.RunPython.noop),
+    ]
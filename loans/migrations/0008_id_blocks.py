@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+def backfill_ids(apps, schema_editor):
+    # Give rows saved without an id (CreateLoan never set loan_id) the next
+    # ones, then start each sequence after the highest id in use.
+    IdBlock = apps.get_model('loans', 'IdBlock')
+    for name, model_name, field in (('customer', 'Customer', 'customer_id'), ('loan', 'Loan', 'loan_id')):
+        model = apps.get_model('loans', model_name)
+        next_value = (model.objects.aggregate(highest=models.Max(field))['highest'] or 0) + 1
+        missing = list(model.objects.filter(**{f'{field}__isnull': True}).order_by('pk'))
+        for row in missing:
+            setattr(row, field, next_value)
+            next_value += 1
+        model.objects.bulk_update(missing, [field], batch_size=1000)
+        IdBlock.objects.create(name=name, next_value=next_value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdBlock',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(backfill_ids, migrations.RunPython.noop),
+    ]
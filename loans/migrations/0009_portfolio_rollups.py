@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0008_id_blocks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioLoan',
+            fields=[
+                ('loan_pk', models.IntegerField(primary_key=True, serialize=False)),
+                ('customer_pk', models.IntegerField(db_index=True)),
+                ('score_band', models.CharField(max_length=10)),
+                ('rate_bucket', models.CharField(max_length=10)),
+                ('start_month', models.CharField(max_length=7)),
+                ('active', models.BooleanField()),
+                ('loan_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('monthly_repayment', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tenure', models.IntegerField()),
+                ('emis_paid_on_time', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='creditprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='PortfolioRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('bucket', models.CharField(max_length=10)),
+                ('loan_count', models.IntegerField(default=0)),
+                ('active_count', models.IntegerField(default=0)),
+                ('exposure', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('emi_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('volume', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_tenure', models.BigIntegerField(default=0)),
+                ('emis_paid_on_time', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'bucket'), name='unique_portfolio_rollup_bucket')],
+            },
+        ),
+    ]
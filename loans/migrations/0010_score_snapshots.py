@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:28
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0009_portfolio_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RescoreRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded')], default='running', max_length=20)),
+                ('chunk_size', models.IntegerField()),
+                ('customers', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RescoreChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('after_pk', models.IntegerField()),
+                ('upto_pk', models.IntegerField(blank=True, null=True)),
+                ('done', models.BooleanField(default=False)),
+                ('scored', models.IntegerField(default=0)),
+                ('seconds', models.FloatField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='loans.rescorerun')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('run', 'after_pk'), name='unique_rescore_chunk')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CreditScoreSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.SmallIntegerField()),
+                ('band', models.CharField(max_length=10)),
+                ('scored_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_snapshots', to='loans.customer')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='loans.rescorerun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['customer', 'scored_at'], name='snapshot_customer_scored_idx')],
+                'constraints': [models.UniqueConstraint(fields=('run', 'customer'), name='unique_score_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0010_score_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionSource',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('file_hash', models.CharField(blank=True, max_length=64)),
+                ('pending_hash', models.CharField(blank=True, max_length=64)),
+                ('generation', models.IntegerField(default=0)),
+                ('checkpoint_row', models.IntegerField(default=0)),
+                ('summary', models.JSONField(blank=True, default=dict)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IngestedRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('row_hash', models.CharField(max_length=32)),
+                ('generation', models.IntegerField()),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='loans.ingestionsource')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'key'), name='unique_ingested_row')],
+            },
+        ),
+    ]
@@ -1,6 +1,26 @@
+import decimal
+import uuid
+
 from django.db import models
 
 
+def to_money(value):
+    return decimal.Decimal(str(value)).quantize(decimal.Decimal('0.01'))
+
+
+class IdBlock(models.Model):
+    """Next unreserved value of an application-assigned id sequence.
+
+    Workers reserve ids in blocks (see ``loans.ids``); ``customer_id`` and
+    ``loan_id`` are drawn from the sequences named ``customer`` and ``loan``.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} from {self.next_value}"
+
+
 class Customer(models.Model):
     id = models.AutoField(primary_key=True)
     customer_id = models.IntegerField(unique=True, null=True, default=None)
@@ -11,6 +31,7 @@ class Customer(models.Model):
     monthly_salary = models.DecimalField(max_digits=10, decimal_places=2)
     approved_limit = models.DecimalField(max_digits=10, decimal_places=2)
     current_debt = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -27,6 +48,270 @@ class Loan(models.Model):
     emis_paid_on_time = models.IntegerField()
     start_date = models.DateField()
     end_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Per-customer history in date order, and the current-year range.
+            models.Index(fields=['customer', 'start_date'], name='loan_customer_start_idx'),
+            # Keyset pages of a customer's loans.
+            models.Index(fields=['customer', 'loan_id'], name='loan_customer_loan_id_idx'),
+            # Active (not fully repaid) loans only: current exposure and EMIs.
+            models.Index(
+                fields=['customer'],
+                condition=models.Q(emis_paid_on_time__lt=models.F('tenure')),
+                name='loan_active_customer_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row contributed to the customer's credit profile
+        # so a later save or delete can apply the difference.
+        if all(name in field_names for name in CREDIT_FIELDS):
+            instance._credit_snapshot = instance.credit_contribution()
+        return instance
+
+    def credit_contribution(self):
+        start_date = Loan._meta.get_field('start_date').to_python(self.start_date)
+        return {
+            'customer_id': self.customer_id,
+            'year': start_date.year,
+            'active': int(self.emis_paid_on_time) < int(self.tenure),
+            'loan_amount': to_money(self.loan_amount),
+            'monthly_repayment': to_money(self.monthly_repayment),
+            'tenure': int(self.tenure),
+            'emis_paid_on_time': int(self.emis_paid_on_time),
+        }
 
     def __str__(self):
         return f"Loan {self.loan_id} for {self.customer}"
+
+
+CREDIT_FIELDS = ('customer_id', 'loan_amount', 'tenure', 'monthly_repayment', 'emis_paid_on_time', 'start_date')
+
+
+class CreditProfile(models.Model):
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_profile')
+    active_exposure = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    active_emi_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_tenure = models.IntegerField(default=0)
+    emis_paid_on_time = models.IntegerField(default=0)
+    loan_count = models.IntegerField(default=0)
+    volume = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Credit profile for {self.customer_id}"
+
+
+class CreditProfileYear(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='credit_profile_years')
+    year = models.IntegerField()
+    loan_count = models.IntegerField(default=0)
+    volume = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'year'], name='unique_credit_profile_year'),
+        ]
+
+    def __str__(self):
+        return f"Credit profile for {self.customer_id} in {self.year}"
+
+
+class IngestionSource(models.Model):
+    """Sync state of one source file for ``loans.ingestion.sync_file``.
+
+    ``file_hash`` is the content hash last applied in full. While a run is in
+    progress, ``pending_hash`` is the hash being applied, ``checkpoint_row``
+    the last row committed and ``summary`` the counts so far, so a crashed run
+    resumes from there.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    kind = models.CharField(max_length=20)
+    file_hash = models.CharField(max_length=64, blank=True)
+    pending_hash = models.CharField(max_length=64, blank=True)
+    generation = models.IntegerField(default=0)
+    checkpoint_row = models.IntegerField(default=0)
+    summary = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.file_hash[:12] or 'never synced'})"
+
+
+class IngestedRow(models.Model):
+    """Hash of the last applied version of one row of a source, by its customer_id/loan_id.
+
+    ``generation`` is the run that last saw the row in the file; rows a
+    complete run did not see were deleted from it.
+    """
+    source = models.ForeignKey(IngestionSource, on_delete=models.CASCADE, related_name='rows')
+    key = models.BigIntegerField()
+    row_hash = models.CharField(max_length=32)
+    generation = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'key'], name='unique_ingested_row'),
+        ]
+
+    def __str__(self):
+        return f"{self.source_id} row {self.key}"
+
+
+class UploadJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=255)
+    spool_path = models.CharField(max_length=500)
+    kind = models.CharField(max_length=20, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    rows_processed = models.IntegerField(default=0)
+    inserted = models.IntegerField(default=0)
+    updated = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def rows_per_second(self, now=None):
+        if self.started_at is None:
+            return None
+        elapsed = ((self.finished_at or now) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else None
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.status})"
+
+
+class PortfolioLoan(models.Model):
+    """A loan as last counted into the portfolio rollups.
+
+    Kept so an incremental refresh can take a customer's old contribution back
+    out of ``PortfolioRollup`` before adding the new one. Deliberately not a
+    foreign key: the row must outlive its loan until the next refresh.
+    """
+    loan_pk = models.IntegerField(primary_key=True)
+    customer_pk = models.IntegerField(db_index=True)
+    score_band = models.CharField(max_length=10)
+    rate_bucket = models.CharField(max_length=10)
+    start_month = models.CharField(max_length=7)
+    active = models.BooleanField()
+    loan_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    monthly_repayment = models.DecimalField(max_digits=10, decimal_places=2)
+    tenure = models.IntegerField()
+    emis_paid_on_time = models.IntegerField()
+
+    def __str__(self):
+        return f"Portfolio entry for loan {self.loan_pk}"
+
+
+class PortfolioRollup(models.Model):
+    """Loan totals for one bucket of one dashboard dimension."""
+    dimension = models.CharField(max_length=20)
+    bucket = models.CharField(max_length=10)
+    loan_count = models.IntegerField(default=0)
+    active_count = models.IntegerField(default=0)
+    exposure = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    emi_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    volume = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_tenure = models.BigIntegerField(default=0)
+    emis_paid_on_time = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'bucket'], name='unique_portfolio_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.bucket}"
+
+
+class RollupWatermark(models.Model):
+    """How far the rollups named ``name`` have been refreshed.
+
+    ``value`` is the start of the last refresh: rows updated after it are
+    picked up by the next incremental run.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} up to {self.value}"
+
+
+class RescoreRun(models.Model):
+    """One pass of the nightly rescoring over every customer."""
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    STATUS_CHOICES = [(RUNNING, 'Running'), (SUCCEEDED, 'Succeeded')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    chunk_size = models.IntegerField()
+    customers = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def customers_per_second(self, now=None):
+        elapsed = ((self.finished_at or now) - self.started_at).total_seconds()
+        return round(self.customers / elapsed, 1) if elapsed > 0 else None
+
+    def __str__(self):
+        return f"Rescore {self.id} ({self.status})"
+
+
+class RescoreChunk(models.Model):
+    """A keyset range of customers, ``after_pk < pk <= upto_pk``, and whether it is scored.
+
+    The last chunk has no upper bound. Chunks marked ``done`` are the run's
+    checkpoint: a resumed run only dispatches the others.
+    """
+    run = models.ForeignKey(RescoreRun, on_delete=models.CASCADE, related_name='chunks')
+    after_pk = models.IntegerField()
+    upto_pk = models.IntegerField(null=True, blank=True)
+    done = models.BooleanField(default=False)
+    scored = models.IntegerField(default=0)
+    seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'after_pk'], name='unique_rescore_chunk'),
+        ]
+
+    def __str__(self):
+        return f"Customers {self.after_pk}-{self.upto_pk} of rescore {self.run_id}"
+
+
+class CreditScoreSnapshot(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='score_snapshots')
+    run = models.ForeignKey(RescoreRun, on_delete=models.CASCADE, related_name='snapshots')
+    score = models.SmallIntegerField()
+    band = models.CharField(max_length=10)
+    scored_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # A re-run chunk never scores a customer twice in one run.
+            models.UniqueConstraint(fields=['run', 'customer'], name='unique_score_snapshot'),
+        ]
+        indexes = [
+            models.Index(fields=['customer', 'scored_at'], name='snapshot_customer_scored_idx'),
+        ]
+
+    def __str__(self):
+        return f"Score {self.score} for {self.customer_id} at {self.scored_at}"
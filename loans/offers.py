@@ -0,0 +1,91 @@
+"""What-if offer grids: many loan candidates for one customer in one NumPy pass."""
+import math
+
+import numpy as np
+from django.conf import settings
+
+from . import amortization
+from .scoring import loan_decision
+
+
+class InvalidGrid(ValueError):
+    pass
+
+
+def _numbers(parts, name):
+    try:
+        return [float(part) for part in parts]
+    except ValueError:
+        raise InvalidGrid(f'{name} must be numbers separated by commas, or start:stop:step')
+
+
+def parse_axis(value, name, integer=False):
+    """Candidate values from ``a,b,c`` or an inclusive ``start:stop:step`` range."""
+    if value in (None, ''):
+        raise InvalidGrid(f'{name} is required')
+    parts = str(value).split(':')
+    if len(parts) == 3:
+        start, stop, step = _numbers(parts, name)
+        if not all(math.isfinite(number) for number in (start, stop, step)):
+            raise InvalidGrid(f'{name} must be finite')
+        if step <= 0 or stop < start:
+            raise InvalidGrid(f'{name} range must be start:stop:step with start <= stop and step > 0')
+        count = math.floor((stop - start) / step + 1e-9) + 1
+        if count > settings.OFFER_GRID_MAX_CELLS:
+            raise InvalidGrid(f'{name} has more than {settings.OFFER_GRID_MAX_CELLS} values')
+        values = start + step * np.arange(count)
+    elif len(parts) == 1:
+        values = np.array(_numbers(parts[0].split(','), name))
+    else:
+        raise InvalidGrid(f'{name} range must be start:stop:step')
+    if not np.isfinite(values).all():
+        raise InvalidGrid(f'{name} must be finite')
+    if integer:
+        if (values != np.round(values)).any():
+            raise InvalidGrid(f'{name} must be whole numbers')
+        values = values.astype(np.int64)
+    return values
+
+
+def grid_axes(params):
+    axes = (
+        parse_axis(params.get('loan_amount'), 'loan_amount'),
+        parse_axis(params.get('tenure'), 'tenure', integer=True),
+        parse_axis(params.get('interest_rate'), 'interest_rate'),
+    )
+    loan_amount, tenure, interest_rate = axes
+    if (loan_amount <= 0).any() or (tenure <= 0).any():
+        raise InvalidGrid('loan_amount and tenure must be positive')
+    if (interest_rate < 0).any():
+        raise InvalidGrid('interest_rate must not be negative')
+    cells = loan_amount.size * tenure.size * interest_rate.size
+    if cells > settings.OFFER_GRID_MAX_CELLS:
+        raise InvalidGrid(f'At most {settings.OFFER_GRID_MAX_CELLS} candidates per grid, got {cells}')
+    return axes
+
+
+def offer_grid(score, loan_amount, tenure, interest_rate, active_exposure, active_emi_sum, approved_limit, monthly_salary):
+    """Decide every (loan_amount, tenure, interest_rate) candidate.
+
+    Arrays are indexed ``[amount, tenure, rate]``. Approval and the corrected
+    rate follow ``loan_decision``: approval depends on the score alone, and
+    the correction raises each rate to the score band's floor, which is what
+    ``loan_decision`` returns for a 0% request. ``within_limits`` applies the
+    exposure checks of ``create-loan`` on top. ``monthly_installment`` is left
+    unrounded, as ``check-eligibility`` returns it.
+    """
+    approval, rate_floor = loan_decision(score, 0)
+    corrected = np.maximum(interest_rate, rate_floor)
+    amounts = loan_amount[:, None, None]
+    instalments = amortization.emi(amounts, corrected[None, None, :], tenure[None, :, None])
+    shape = instalments.shape
+    within_limits = (
+        (float(active_exposure) + amounts <= float(approved_limit))
+        & (float(active_emi_sum) + instalments <= float(monthly_salary) / 2)
+    )
+    return {
+        'approval': np.full(shape, approval),
+        'corrected_interest_rate': np.broadcast_to(corrected[None, None, :], shape),
+        'monthly_installment': instalments,
+        'within_limits': within_limits & approval,
+    }
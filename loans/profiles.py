@@ -0,0 +1,180 @@
+import decimal
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, ExtractYear
+from django.utils import timezone
+
+from .models import CreditProfile, CreditProfileYear, Loan
+from .scoring import aaggregate_credit_score, aggregate_credit_score, score_from_components
+
+PROFILE_FIELDS = ('active_exposure', 'active_emi_sum', 'total_tenure', 'emis_paid_on_time', 'loan_count', 'volume')
+
+
+def contribution_deltas(contribution, sign):
+    active = contribution['active']
+    return {
+        'active_exposure': sign * contribution['loan_amount'] if active else 0,
+        'active_emi_sum': sign * contribution['monthly_repayment'] if active else 0,
+        'total_tenure': sign * contribution['tenure'],
+        'emis_paid_on_time': sign * contribution['emis_paid_on_time'],
+        'loan_count': sign,
+        'volume': sign * contribution['loan_amount'],
+    }
+
+
+def _apply(model, lookup, deltas, create):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if create:
+        model.objects.get_or_create(**lookup)
+    updates = {field: models.F(field) + delta for field, delta in deltas.items()}
+    if model is CreditProfile:
+        # update() skips auto_now; the portfolio rollups watch this column.
+        updates['updated_at'] = timezone.now()
+    model.objects.filter(**lookup).update(**updates)
+
+
+def apply_loan_change(old, new):
+    """Move the running totals from a loan's ``old`` contribution to ``new``.
+
+    Either side may be ``None`` for a created or deleted loan. Rows are only
+    created when something is being added, so a cascading customer delete
+    never resurrects its profile.
+    """
+    profiles = {}
+    years = {}
+    for contribution, sign in ((old, -1), (new, 1)):
+        if contribution is None:
+            continue
+        customer_id = contribution['customer_id']
+        totals = profiles.setdefault(customer_id, dict.fromkeys(PROFILE_FIELDS, 0))
+        for field, delta in contribution_deltas(contribution, sign).items():
+            totals[field] += delta
+        year_totals = years.setdefault((customer_id, contribution['year']), {'loan_count': 0, 'volume': 0})
+        year_totals['loan_count'] += sign
+        year_totals['volume'] += sign * contribution['loan_amount']
+
+    with transaction.atomic():
+        for customer_id, deltas in profiles.items():
+            create = new is not None and new['customer_id'] == customer_id
+            _apply(CreditProfile, {'customer_id': customer_id}, deltas, create)
+        for (customer_id, year), deltas in years.items():
+            create = new is not None and (new['customer_id'], new['year']) == (customer_id, year)
+            _apply(CreditProfileYear, {'customer_id': customer_id, 'year': year}, deltas, create)
+
+
+def computed_profiles(customer_ids=None):
+    loans = Loan.objects.all()
+    if customer_ids is not None:
+        loans = loans.filter(customer_id__in=customer_ids)
+    active = models.Q(emis_paid_on_time__lt=models.F('tenure'))
+    zero = models.Value(decimal.Decimal('0'))
+    totals = loans.values('customer_id').annotate(
+        active_exposure=Coalesce(models.Sum('loan_amount', filter=active), zero),
+        active_emi_sum=Coalesce(models.Sum('monthly_repayment', filter=active), zero),
+        total_tenure=models.Sum('tenure'),
+        emis_paid_on_time=models.Sum('emis_paid_on_time'),
+        loan_count=models.Count('id'),
+        volume=models.Sum('loan_amount'),
+    ).order_by()
+    yearly = loans.values('customer_id', year=ExtractYear('start_date')).annotate(
+        loan_count=models.Count('id'),
+        volume=models.Sum('loan_amount'),
+    ).order_by()
+    profiles = {row.pop('customer_id'): row for row in totals}
+    years = {(row['customer_id'], row['year']): row for row in yearly}
+    return profiles, years
+
+
+def rebuild_profiles(customer_ids=None):
+    profiles, years = computed_profiles(customer_ids)
+    with transaction.atomic():
+        existing = CreditProfile.objects.all()
+        existing_years = CreditProfileYear.objects.all()
+        if customer_ids is not None:
+            existing = existing.filter(customer_id__in=customer_ids)
+            existing_years = existing_years.filter(customer_id__in=customer_ids)
+        existing.delete()
+        existing_years.delete()
+        CreditProfile.objects.bulk_create(
+            CreditProfile(customer_id=customer_id, **totals) for customer_id, totals in profiles.items()
+        )
+        CreditProfileYear.objects.bulk_create(
+            CreditProfileYear(customer_id=row['customer_id'], year=row['year'], loan_count=row['loan_count'], volume=row['volume'])
+            for row in years.values()
+        )
+    return len(profiles)
+
+
+def verify_profiles(customer_ids=None):
+    """Return ``(customer_id, field, stored, expected)`` for every drifted total."""
+    profiles, years = computed_profiles(customer_ids)
+    stored = CreditProfile.objects.all()
+    stored_years = CreditProfileYear.objects.all()
+    if customer_ids is not None:
+        stored = stored.filter(customer_id__in=customer_ids)
+        stored_years = stored_years.filter(customer_id__in=customer_ids)
+
+    empty = dict.fromkeys(PROFILE_FIELDS, 0)
+    mismatches = []
+    stored_profiles = {row.pop('customer_id'): row for row in stored.values('customer_id', *PROFILE_FIELDS)}
+    for customer_id in stored_profiles.keys() | profiles.keys():
+        have = stored_profiles.get(customer_id, empty)
+        want = profiles.get(customer_id, empty)
+        for field in PROFILE_FIELDS:
+            if have[field] != want[field]:
+                mismatches.append((customer_id, field, have[field], want[field]))
+
+    empty_year = {'loan_count': 0, 'volume': 0}
+    stored_years = {(row['customer_id'], row['year']): row for row in stored_years.values('customer_id', 'year', 'loan_count', 'volume')}
+    for key in stored_years.keys() | years.keys():
+        have = stored_years.get(key, empty_year)
+        want = years.get(key, empty_year)
+        for field in ('loan_count', 'volume'):
+            if have[field] != want[field]:
+                mismatches.append((key[0], f'{field}[{key[1]}]', have[field], want[field]))
+    return mismatches
+
+
+def exposure(customer_pk):
+    """``(active_exposure, active_emi_sum)`` from the customer's profile counters."""
+    row = CreditProfile.objects.filter(pk=customer_pk).values_list('active_exposure', 'active_emi_sum').first()
+    return row or (decimal.Decimal(0), decimal.Decimal(0))
+
+
+def _profile_row(customer):
+    current_year = CreditProfileYear.objects.filter(
+        customer=models.OuterRef('pk'), year=timezone.now().year,
+    ).values('loan_count')[:1]
+    return CreditProfile.objects.filter(pk=customer.pk).annotate(
+        current_year_loans=Coalesce(models.Subquery(current_year), 0),
+    ).values(*PROFILE_FIELDS, 'current_year_loans')
+
+
+def _profile_score(profile, customer):
+    components = {
+        'loan_count': profile['loan_count'],
+        'current_loan_sum': profile['active_exposure'],
+        'current_emis_sum': profile['active_emi_sum'],
+        'total_tenure': profile['total_tenure'],
+        'emis_paid_on_time': profile['emis_paid_on_time'],
+        'current_year_loans': profile['current_year_loans'],
+        'volume': profile['volume'],
+    }
+    return score_from_components(components, customer.approved_limit, customer.monthly_salary)
+
+
+def profile_credit_score(customer):
+    profile = _profile_row(customer).first()
+    if profile is None:
+        # Customers without loans have no profile row yet.
+        return aggregate_credit_score(customer)
+    return _profile_score(profile, customer)
+
+
+async def aprofile_credit_score(customer):
+    profile = await _profile_row(customer).afirst()
+    if profile is None:
+        return await aaggregate_credit_score(customer)
+    return _profile_score(profile, customer)
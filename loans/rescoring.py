@@ -0,0 +1,116 @@
+"""Nightly rescoring of every customer into ``CreditScoreSnapshot``.
+
+A run is planned as keyset ranges of customer pks (``RescoreChunk``), each
+scored by its own task with one grouped query and one bulk insert. A chunk is
+marked done in the same transaction as its snapshots, so a run interrupted by
+a dead worker resumes from the chunks that never committed.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from .analytics import score_band
+from .models import CreditScoreSnapshot, Customer, RescoreChunk, RescoreRun
+from .scoring import score_customers
+
+
+def plan_run(chunk_size=None):
+    chunk_size = chunk_size or settings.RESCORE_CHUNK_SIZE
+    with transaction.atomic():
+        run = RescoreRun.objects.create(chunk_size=chunk_size)
+        chunks = []
+        after = 0
+        while True:
+            remaining = Customer.objects.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)
+            upto = remaining[chunk_size - 1:chunk_size].first()
+            if upto is None:
+                # Whatever is left is less than a chunk; leave it unbounded.
+                if remaining.exists():
+                    chunks.append(RescoreChunk(run=run, after_pk=after))
+                break
+            chunks.append(RescoreChunk(run=run, after_pk=after, upto_pk=upto))
+            after = upto
+        RescoreChunk.objects.bulk_create(chunks)
+    return run
+
+
+def unfinished_run():
+    return RescoreRun.objects.filter(status=RescoreRun.RUNNING).order_by('-started_at').first()
+
+
+def pending_chunks(run):
+    return list(run.chunks.filter(done=False).order_by('after_pk').values_list('pk', flat=True))
+
+
+def score_chunk(chunk_id):
+    """Score one chunk, unless an earlier attempt already committed it."""
+    started = time.perf_counter()
+    with transaction.atomic():
+        chunk = RescoreChunk.objects.select_for_update().get(pk=chunk_id)
+        if chunk.done:
+            return chunk.scored
+        customers = Customer.objects.filter(pk__gt=chunk.after_pk)
+        if chunk.upto_pk is not None:
+            customers = customers.filter(pk__lte=chunk.upto_pk)
+        scores = score_customers(customers, key='pk')
+        scored_at = timezone.now()
+        CreditScoreSnapshot.objects.bulk_create(
+            [
+                CreditScoreSnapshot(
+                    customer_id=customer_pk, run_id=chunk.run_id, score=score, band=score_band(score), scored_at=scored_at,
+                )
+                for customer_pk, score in scores.items()
+            ],
+            batch_size=settings.INGEST_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        chunk.done = True
+        chunk.scored = len(scores)
+        chunk.seconds = time.perf_counter() - started
+        chunk.save(update_fields=['done', 'scored', 'seconds'])
+    return chunk.scored
+
+
+def finish_run(run_id):
+    run = RescoreRun.objects.get(pk=run_id)
+    totals = run.chunks.aggregate(customers=models.Sum('scored', default=0), pending=models.Count('pk', filter=models.Q(done=False)))
+    run.customers = totals['customers']
+    if not totals['pending']:
+        run.status = RescoreRun.SUCCEEDED
+        run.finished_at = timezone.now()
+    run.save(update_fields=['customers', 'status', 'finished_at'])
+    return run
+
+
+def band_changes(run):
+    """Snapshots of ``run`` whose band differs from the customer's previous snapshot."""
+    previous = CreditScoreSnapshot.objects.filter(
+        customer=models.OuterRef('customer'), scored_at__lt=models.OuterRef('scored_at'),
+    ).order_by('-scored_at').values('band')[:1]
+    return (
+        CreditScoreSnapshot.objects.filter(run=run)
+        .annotate(previous_band=models.Subquery(previous))
+        .exclude(previous_band=None)
+        .exclude(previous_band=models.F('band'))
+    )
+
+
+def score_history(customer_pk, since=None):
+    """A customer's snapshots, oldest first, with the points where the band changed.
+
+    ``since`` is a date, read as midnight in the current time zone.
+    """
+    snapshots = CreditScoreSnapshot.objects.filter(customer_id=customer_pk).order_by('scored_at')
+    if since is not None:
+        since = timezone.make_aware(datetime.datetime.combine(since, datetime.time.min))
+        snapshots = snapshots.filter(scored_at__gte=since)
+    history = list(snapshots.values('scored_at', 'score', 'band', 'run_id'))
+    changes = [
+        {'scored_at': current['scored_at'], 'from': previous['band'], 'to': current['band']}
+        for previous, current in zip(history, history[1:])
+        if previous['band'] != current['band']
+    ]
+    return history, changes
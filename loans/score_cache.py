@@ -0,0 +1,113 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from . import singleflight
+
+GENERATION_KEY = 'credit-score:generation'
+
+_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0, 'invalidations': 0, 'bulk_invalidations': 0}
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def get_cache():
+    return caches[settings.SCORE_CACHE_ALIAS]
+
+
+def _version_key(customer_pk):
+    return f'credit-score:version:{customer_pk}'
+
+
+def _key(generation, version, customer_pk):
+    return f'credit-score:{generation}:{customer_pk}:{version}'
+
+
+# Entries are keyed on two tokens: the generation, which bulk invalidation
+# swaps instead of clearing the backend (which may be shared), and a version
+# per customer, which ``invalidate`` swaps. A computation reads both before it
+# starts, so one that overlaps an invalidation stores its result under the old
+# key, where nothing reads it. Tokens are random rather than counters so that
+# an evicted token key never revives older entries.
+
+def _tokens(cache, customer_pk):
+    names = (GENERATION_KEY, _version_key(customer_pk))
+    tokens = cache.get_many(names)
+    for name in names:
+        if name not in tokens:
+            cache.add(name, uuid.uuid4().hex, timeout=None if name == GENERATION_KEY else DEFAULT_TIMEOUT)
+            tokens[name] = cache.get(name)
+    return [tokens[name] for name in names]
+
+
+async def _atokens(cache, customer_pk):
+    names = (GENERATION_KEY, _version_key(customer_pk))
+    tokens = await cache.aget_many(names)
+    for name in names:
+        if name not in tokens:
+            await cache.aadd(name, uuid.uuid4().hex, timeout=None if name == GENERATION_KEY else DEFAULT_TIMEOUT)
+            tokens[name] = await cache.aget(name)
+    return [tokens[name] for name in names]
+
+
+def score_key(cache, customer_pk):
+    """The cache key of the customer's score under the current tokens."""
+    generation, version = _tokens(cache, customer_pk)
+    return _key(generation, version, customer_pk)
+
+
+def cached_credit_score(customer, compute):
+    cache = get_cache()
+    key = score_key(cache, customer.pk)
+    score = cache.get(key)
+    if score is not None:
+        _count('hits')
+        return score
+    _count('misses')
+    return singleflight.run(cache, key, lambda: compute(customer))
+
+
+async def acached_credit_score(customer, compute):
+    """``cached_credit_score`` for async views; ``compute`` is a coroutine function."""
+    cache = get_cache()
+    generation, version = await _atokens(cache, customer.pk)
+    key = _key(generation, version, customer.pk)
+    score = await cache.aget(key)
+    if score is not None:
+        _count('hits')
+        return score
+    _count('misses')
+    return await singleflight.arun(cache, key, lambda: compute(customer))
+
+
+def invalidate(customer_pk):
+    get_cache().set(_version_key(customer_pk), uuid.uuid4().hex)
+    _count('invalidations')
+
+
+def invalidate_all():
+    get_cache().set(GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+    _count('bulk_invalidations')
+
+
+def stats():
+    with _lock:
+        counters = dict(_counters)
+    lookups = counters['hits'] + counters['misses']
+    counters['hit_ratio'] = counters['hits'] / lookups if lookups else 0.0
+    counters['single_flight'] = singleflight.stats()
+    return counters
+
+
+def reset_stats():
+    with _lock:
+        for name in _counters:
+            _counters[name] = 0
+    singleflight.reset_stats()
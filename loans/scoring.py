@@ -0,0 +1,97 @@
+import datetime
+import decimal
+
+from django.db import models
+from django.utils import timezone
+
+from .models import Customer, Loan
+
+
+def current_year_bounds(year=None):
+    if year is None:
+        year = timezone.now().year
+    return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+
+
+def loan_aggregates(prefix='', year=None):
+    """Aggregate expressions for every credit score component.
+
+    ``prefix`` lets the same expressions be used from a query on ``Customer``
+    (``prefix='loan__'``) as well as directly on ``Loan``.
+    """
+    year_start, year_end = current_year_bounds(year)
+    active = models.Q(**{f'{prefix}emis_paid_on_time__lt': models.F(f'{prefix}tenure')})
+    this_year = models.Q(**{f'{prefix}start_date__gte': year_start, f'{prefix}start_date__lt': year_end})
+    return {
+        'loan_count': models.Count(f'{prefix}id'),
+        'current_loan_sum': models.Sum(f'{prefix}loan_amount', filter=active),
+        'current_emis_sum': models.Sum(f'{prefix}monthly_repayment', filter=active),
+        'total_tenure': models.Sum(f'{prefix}tenure'),
+        'emis_paid_on_time': models.Sum(f'{prefix}emis_paid_on_time'),
+        'current_year_loans': models.Count(f'{prefix}id', filter=this_year),
+        'volume': models.Sum(f'{prefix}loan_amount'),
+    }
+
+
+def score_from_components(components, approved_limit, monthly_salary):
+    if not components.get('loan_count'):
+        return 100
+
+    current_loan_sum = components.get('current_loan_sum') or 0
+    if current_loan_sum > approved_limit:
+        return 0
+
+    current_emis_sum = components.get('current_emis_sum') or 0
+    if current_emis_sum > decimal.Decimal('0.5') * decimal.Decimal(monthly_salary):
+        return 0
+
+    total_emis = components.get('total_tenure') or 0
+    paid_on_time = components.get('emis_paid_on_time') or 0
+    paid_ratio = paid_on_time / total_emis if total_emis > 0 else 1
+
+    no_loans = components['loan_count']
+    current_year_loans = components.get('current_year_loans') or 0
+    volume = float(components.get('volume') or 0)
+
+    score = min(100, (paid_ratio * 40) + min(no_loans * 5, 20) + min(current_year_loans * 10, 20) + min(volume / 100000, 20))
+    return int(score)
+
+
+def credit_score_components(customer):
+    return Loan.objects.filter(customer=customer).aggregate(**loan_aggregates())
+
+
+def aggregate_credit_score(customer):
+    components = credit_score_components(customer)
+    return score_from_components(components, customer.approved_limit, customer.monthly_salary)
+
+
+async def aaggregate_credit_score(customer):
+    components = await Loan.objects.filter(customer=customer).aaggregate(**loan_aggregates())
+    return score_from_components(components, customer.approved_limit, customer.monthly_salary)
+
+
+def loan_decision(score, interest_rate):
+    """Return ``(approval, corrected_interest_rate)`` for a credit score."""
+    if score > 50:
+        return True, interest_rate
+    elif 30 < score <= 50:
+        return True, max(interest_rate, 12)
+    elif 10 < score <= 30:
+        return True, max(interest_rate, 16)
+    return False, interest_rate
+
+
+def score_customers(customers, key='customer_id'):
+    """Score every customer of a ``Customer`` queryset with one grouped query, keyed by ``key``."""
+    aggregates = loan_aggregates(prefix='loan__')
+    rows = customers.annotate(**aggregates).values(key, 'approved_limit', 'monthly_salary', *aggregates)
+    return {
+        row[key]: score_from_components(row, row['approved_limit'], row['monthly_salary'])
+        for row in rows
+    }
+
+
+def batch_credit_scores(customer_ids):
+    """Score many customers with one grouped query, keyed by ``customer_id``."""
+    return score_customers(Customer.objects.filter(customer_id__in=customer_ids))
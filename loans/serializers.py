@@ -1,4 +1,9 @@
+import decimal
+import operator
+
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+
 from .models import Customer, Loan
 
 
@@ -33,4 +38,79 @@ class LoanListSerializer(serializers.ModelSerializer):
 
     def get_repayments_left(self, obj):
         # Assuming tenure is total months, emis_paid_on_time is paid
-        return obj.tenure - obj.emis_paid_on_time
\ No newline at end of file
+        return obj.tenure - obj.emis_paid_on_time
+
+
+# Fast path for hot and list endpoints: the same output as the serializers
+# above, built straight from ``values_list`` tuples (or instance attributes)
+# by functions compiled once per field layout, without DRF's field machinery.
+
+def decimal_formatter(max_digits, decimal_places):
+    """Format like a DRF ``DecimalField(max_digits, decimal_places)``."""
+    quantum = decimal.Decimal('.1') ** decimal_places
+    context = decimal.getcontext().copy()
+    context.prec = max_digits
+    coerce_to_string = api_settings.COERCE_DECIMAL_TO_STRING
+
+    def format_decimal(value):
+        if value is None:
+            return None
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        quantized = value.quantize(quantum, context=context)
+        return f'{quantized:f}' if coerce_to_string else quantized
+
+    return format_decimal
+
+
+def _integer(value):
+    return None if value is None else int(value)
+
+
+def _string(value):
+    return None if value is None else str(value)
+
+
+money = decimal_formatter(10, 2)
+rate = decimal_formatter(5, 2)
+
+CUSTOMER_FIELDS = ('customer_id', 'first_name', 'last_name', 'age', 'monthly_salary', 'approved_limit', 'phone_number')
+LOAN_FIELDS = ('loan_id', 'loan_amount', 'interest_rate', 'monthly_repayment', 'tenure')
+
+
+def customer_row(row):
+    """``CustomerSerializer`` output for a ``CUSTOMER_FIELDS`` tuple."""
+    customer_id, first_name, last_name, age, monthly_salary, approved_limit, phone_number = row
+    return {
+        'customer_id': _integer(customer_id),
+        'name': f'{first_name} {last_name}',
+        'age': _integer(age),
+        'monthly_income': _integer(monthly_salary),
+        'approved_limit': money(approved_limit),
+        'phone_number': _string(phone_number),
+    }
+
+
+def loan_row(row):
+    """``LoanSerializer`` output for a ``LOAN_FIELDS`` tuple followed by the customer's ``CUSTOMER_FIELDS``."""
+    loan_id, loan_amount, interest_rate, monthly_repayment, tenure = row[:len(LOAN_FIELDS)]
+    return {
+        'loan_id': _integer(loan_id),
+        'customer': customer_row(row[len(LOAN_FIELDS):]),
+        'loan_amount': money(loan_amount),
+        'interest_rate': rate(interest_rate),
+        'monthly_installment': money(monthly_repayment),
+        'tenure': _integer(tenure),
+    }
+
+
+_customer_attributes = operator.attrgetter(*CUSTOMER_FIELDS)
+_loan_attributes = operator.attrgetter(*LOAN_FIELDS)
+
+
+def customer_data(customer):
+    return customer_row(_customer_attributes(customer))
+
+
+def loan_data(loan):
+    return loan_row(_loan_attributes(loan) + _customer_attributes(loan.customer))
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import analytics, ids, score_cache
+from .models import Customer, Loan
+from .profiles import apply_loan_change, rebuild_profiles
+
+
+@receiver(pre_save, sender=Customer)
+def assign_customer_id(sender, instance, raw=False, **kwargs):
+    if instance.customer_id is None and not raw:
+        instance.customer_id = ids.customer_ids.next()
+
+
+@receiver(pre_save, sender=Loan)
+def assign_loan_id(sender, instance, raw=False, **kwargs):
+    if instance.loan_id is None and not raw:
+        instance.loan_id = ids.loan_ids.next()
+
+
+@receiver(post_save, sender=Loan)
+def update_credit_profile(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = instance.credit_contribution()
+    if created:
+        apply_loan_change(None, new)
+    elif hasattr(instance, '_credit_snapshot'):
+        apply_loan_change(instance._credit_snapshot, new)
+    else:
+        # Saved through an instance we never loaded, so the old totals are unknown.
+        rebuild_profiles([instance.customer_id])
+    instance._credit_snapshot = new
+
+
+@receiver(post_delete, sender=Loan)
+def remove_from_credit_profile(sender, instance, **kwargs):
+    snapshot = getattr(instance, '_credit_snapshot', None)
+    if snapshot is not None:
+        apply_loan_change(snapshot, None)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def invalidate_credit_score(sender, instance, **kwargs):
+    customer_pk = instance.pk if sender is Customer else instance.customer_id
+    score_cache.invalidate(customer_pk)
+    # Drop anything cached by a concurrent request that read the old rows
+    # before this transaction committed.
+    transaction.on_commit(lambda: score_cache.invalidate(customer_pk))
+
+
+@receiver(post_delete, sender=Customer)
+def remove_from_portfolio(sender, instance, **kwargs):
+    analytics.forget_customer(instance.pk)
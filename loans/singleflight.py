@@ -0,0 +1,172 @@
+"""Single-flight computation of cache misses.
+
+When several callers miss the same cache key at once, the first one computes
+the value and the others wait for it instead of repeating the work.
+
+* Within a process, waiters block on the leading thread's event and share its
+  result, or compute for themselves if it failed.
+* Across processes, the leader holds a lock in the same cache, taken with
+  ``cache.add``: ``SET NX`` on Redis, and an atomic check-and-set on the
+  local-memory backend, which stands in for Redis in tests. Callers that find
+  the lock taken poll the cache for the value the leader stores.
+
+Flights and locks are keyed on the cache key itself, so callers must version
+their keys (as ``score_cache`` does): a request made after an invalidation
+then has a new key and never joins a flight that started before it.
+
+A caller that waits longer than ``SCORE_SINGLE_FLIGHT_WAIT`` seconds stops
+waiting and computes the value itself, so a stuck or dead leader only costs
+that wait.
+"""
+import asyncio
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+FIRST_POLL = 0.005
+MAX_POLL = 0.1
+
+_lock = threading.Lock()
+_flights = {}
+_counters = {'computations': 0, 'coalesced_thread': 0, 'coalesced_lock': 0, 'wait_timeouts': 0}
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _polls(deadline):
+    """Pauses between lock attempts, backing off until ``deadline``; always at least one attempt."""
+    delay = FIRST_POLL
+    while True:
+        remaining = deadline - time.monotonic()
+        yield max(0, min(delay, remaining))
+        if remaining <= 0:
+            return
+        delay = min(delay * 2, MAX_POLL)
+
+
+def _compute(cache, key, compute):
+    _count('computations')
+    value = compute()
+    cache.set(key, value)
+    return value
+
+
+async def _acompute(cache, key, compute):
+    _count('computations')
+    value = await compute()
+    await cache.aset(key, value)
+    return value
+
+
+def _release(cache, lock_key, token):
+    # Only delete our own lock; it may have expired and been taken since.
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _across_processes(cache, key, compute):
+    lock_key, token = _lock_key(key), uuid.uuid4().hex
+    deadline = time.monotonic() + settings.SCORE_SINGLE_FLIGHT_WAIT
+    for delay in _polls(deadline):
+        if cache.add(lock_key, token, timeout=settings.SCORE_SINGLE_FLIGHT_LOCK_TIMEOUT):
+            try:
+                # The previous leader may have stored the value after our miss.
+                value = cache.get(key)
+                if value is not None:
+                    _count('coalesced_lock')
+                    return value
+                return _compute(cache, key, compute)
+            finally:
+                _release(cache, lock_key, token)
+        value = cache.get(key)
+        if value is not None:
+            _count('coalesced_lock')
+            return value
+        time.sleep(delay)
+    _count('wait_timeouts')
+    return _compute(cache, key, compute)
+
+
+def run(cache, key, compute):
+    """The value of ``key``: computed by ``compute()`` and stored in ``cache``,
+    unless another caller is already doing so."""
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+    if not leader:
+        if not flight.done.wait(settings.SCORE_SINGLE_FLIGHT_WAIT):
+            _count('wait_timeouts')
+            return _compute(cache, key, compute)
+        if not flight.failed:
+            _count('coalesced_thread')
+            return flight.value
+        return _across_processes(cache, key, compute)
+    try:
+        flight.value = _across_processes(cache, key, compute)
+        return flight.value
+    except BaseException:
+        flight.failed = True
+        raise
+    finally:
+        with _lock:
+            del _flights[key]
+        flight.done.set()
+
+
+async def arun(cache, key, compute):
+    """``run`` for coroutines; ``compute`` is a coroutine function.
+
+    Coroutines coalesce through the cache lock alone, which also covers
+    several coroutines of one process.
+    """
+    lock_key, token = _lock_key(key), uuid.uuid4().hex
+    deadline = time.monotonic() + settings.SCORE_SINGLE_FLIGHT_WAIT
+    for delay in _polls(deadline):
+        if await cache.aadd(lock_key, token, timeout=settings.SCORE_SINGLE_FLIGHT_LOCK_TIMEOUT):
+            try:
+                value = await cache.aget(key)
+                if value is not None:
+                    _count('coalesced_lock')
+                    return value
+                return await _acompute(cache, key, compute)
+            finally:
+                if await cache.aget(lock_key) == token:
+                    await cache.adelete(lock_key)
+        value = await cache.aget(key)
+        if value is not None:
+            _count('coalesced_lock')
+            return value
+        await asyncio.sleep(delay)
+    _count('wait_timeouts')
+    return await _acompute(cache, key, compute)
+
+
+def stats():
+    with _lock:
+        counters = dict(_counters)
+    counters['saved'] = counters['coalesced_thread'] + counters['coalesced_lock']
+    return counters
+
+
+def reset_stats():
+    with _lock:
+        for name in _counters:
+            _counters[name] = 0
@@ -0,0 +1,107 @@
+"""Cold-start tooling: import-time profiles and time to first response.
+
+Profiles and cold starts are measured in a fresh interpreter, since every
+module is already imported in the process asking for them.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+PROJECT_PACKAGES = ('credit_approval', 'loans')
+# What a web process imports before it can answer: the URLconf pulls in
+# every view, and the views pull in the tasks.
+PROFILED_MODULES = ('credit_approval.wsgi', 'credit_approval.urls', 'loans.urls')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+FIRST_RESPONSE = '''
+import io, json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.handlers.wsgi import WSGIHandler
+handler = WSGIHandler()
+ready = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+}
+statuses = []
+response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+b''.join(response)
+answered = time.perf_counter()
+print(json.dumps({'status': statuses[0], 'setup': ready - started, 'first_response': answered - started}))
+'''
+
+
+def _python(*args):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'credit_approval.settings')}
+    return subprocess.run(
+        [sys.executable, *args], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def parse_importtime(output):
+    """``-X importtime`` lines as dicts, each with the name of the module that imported it."""
+    entries = []
+    pending = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        entry = {
+            'module': module,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+            'depth': len(indent) // 2,
+            'imported_by': None,
+        }
+        # A module is listed after everything it imported, one level deeper.
+        while pending and pending[-1]['depth'] > entry['depth']:
+            pending.pop()['imported_by'] = module
+        pending.append(entry)
+        entries.append(entry)
+    return entries
+
+
+def import_profile(modules=PROFILED_MODULES):
+    code = 'import django\ndjango.setup()\n' + ''.join(f'import {module}\n' for module in modules)
+    return parse_importtime(_python('-X', 'importtime', '-c', code).stderr)
+
+
+def is_project(module):
+    return module.split('.')[0] in PROJECT_PACKAGES
+
+
+def import_report(entries, top=15):
+    """Total import time, the project's modules by cumulative cost, and the
+    heaviest third-party imports each project module pulled in first."""
+    project = [entry for entry in entries if is_project(entry['module'])]
+    dependencies = [
+        entry for entry in entries
+        if not is_project(entry['module']) and entry['imported_by'] and is_project(entry['imported_by'])
+    ]
+    return {
+        'total_ms': round(sum(entry['self_ms'] for entry in entries), 1),
+        'project_ms': round(sum(entry['self_ms'] for entry in project), 1),
+        'modules': sorted(project, key=lambda entry: -entry['cumulative_ms'])[:top],
+        'dependencies': sorted(dependencies, key=lambda entry: -entry['cumulative_ms'])[:top],
+    }
+
+
+def first_response(path='/'):
+    """Start a fresh interpreter and time its first WSGI response to ``path``.
+
+    Returns ``{'status', 'setup', 'first_response', 'process'}`` in seconds:
+    ``setup`` and ``first_response`` are counted from the child's first line,
+    ``process`` from launching the interpreter to its exit.
+    """
+    started = time.perf_counter()
+    result = json.loads(_python('-c', FIRST_RESPONSE, path).stdout.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - started
+    return result
@@ -0,0 +1,147 @@
+import csv
+import datetime
+from pathlib import Path
+
+import numpy as np
+
+from . import amortization
+from .ingestion import CUSTOMER_COLUMNS, LOAN_COLUMNS, ingest_customers, ingest_loans
+
+FIRST_NAMES = ['Aarav', 'Aditi', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Nikhil', 'Priya', 'Rohan', 'Sara', 'Vikram']
+LAST_NAMES = ['Agarwal', 'Bose', 'Chopra', 'Das', 'Gupta', 'Iyer', 'Joshi', 'Khan', 'Mehta', 'Nair', 'Rao', 'Singh']
+TENURES = np.array([6, 12, 18, 24, 36, 48, 60, 84, 120, 180])
+CUSTOMER_HEADER = ['Customer ID', 'First Name', 'Last Name', 'Age', 'Phone Number', 'Monthly Salary', 'Approved Limit']
+LOAN_HEADER = [
+    'Customer ID', 'Loan ID', 'Loan Amount', 'Tenure', 'Interest Rate',
+    'Monthly payment', 'EMIs paid on Time', 'Date of Approval', 'End Date',
+]
+EPOCH = datetime.date(2000, 1, 1)
+
+
+def parse_distribution(spec):
+    """Parse a loans-per-customer spec into ``(kind, params)``.
+
+    Accepted forms: ``fixed:N``, ``uniform:LOW-HIGH``, ``poisson:MEAN``
+    and ``geometric:MEAN``.
+    """
+    kind, _, value = spec.partition(':')
+    try:
+        if kind == 'fixed':
+            params = (int(value),)
+        elif kind == 'uniform':
+            low, high = value.split('-')
+            params = (int(low), int(high))
+        elif kind in ('poisson', 'geometric'):
+            params = (float(value),)
+        else:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f'Invalid loans-per-customer distribution {spec!r}; use fixed:N, uniform:A-B, poisson:MEAN or geometric:MEAN')
+    if any(param < 0 for param in params):
+        raise ValueError(f'Distribution parameters must not be negative: {spec!r}')
+    return kind, params
+
+
+def loan_counts(rng, size, distribution):
+    kind, params = parse_distribution(distribution)
+    if kind == 'fixed':
+        return np.full(size, params[0])
+    if kind == 'uniform':
+        return rng.integers(params[0], params[1] + 1, size)
+    if kind == 'poisson':
+        return rng.poisson(params[0], size)
+    # Geometric with the given mean, starting at zero loans.
+    return rng.geometric(1 / (params[0] + 1), size) - 1
+
+
+def generate_portfolio(customers, distribution='poisson:3', seed=0, chunk_size=10000, today=None):
+    """Yield ``(customer_rows, loan_rows)`` chunks in workbook column order.
+
+    The same arguments always produce the same rows. Customer and loan ids are
+    numbered from 1, and work is done ``chunk_size`` customers at a time.
+    """
+    rng = np.random.default_rng(seed)
+    today = today or datetime.date(2025, 1, 1)
+    horizon = (today - EPOCH).days
+    next_loan_id = 1
+    for start in range(0, customers, chunk_size):
+        size = min(chunk_size, customers - start)
+        ids = np.arange(start + 1, start + size + 1)
+        salary = rng.integers(20, 200, size) * 1000
+        limit = np.round(36 * salary / 100000) * 100000
+        ages = rng.integers(21, 66, size)
+        phones = rng.integers(7000000000, 9999999999, size)
+        first = rng.integers(0, len(FIRST_NAMES), size)
+        last = rng.integers(0, len(LAST_NAMES), size)
+        customer_rows = [
+            (int(ids[i]), FIRST_NAMES[first[i]], LAST_NAMES[last[i]], int(ages[i]), str(phones[i]), int(salary[i]), int(limit[i]))
+            for i in range(size)
+        ]
+
+        counts = loan_counts(rng, size, distribution)
+        owners = np.repeat(ids, counts)
+        n = len(owners)
+        amount = rng.integers(1, 40, n) * 50000
+        tenure = rng.choice(TENURES, n)
+        rate = np.round(rng.uniform(6, 20, n), 2)
+        emi = np.round(amortization.emi(amount, rate, tenure), 2)
+        paid = np.floor(rng.uniform(0, 1, n) * (tenure + 1)).astype(int)
+        start_days = rng.integers(horizon - 3650, horizon, n)
+        loan_rows = []
+        for i in range(n):
+            start_date = EPOCH + datetime.timedelta(days=int(start_days[i]))
+            end_date = start_date + datetime.timedelta(days=int(tenure[i]) * 30)
+            loan_rows.append((
+                int(owners[i]), next_loan_id + i, int(amount[i]), int(tenure[i]), float(rate[i]),
+                float(emi[i]), int(paid[i]), start_date, end_date,
+            ))
+        next_loan_id += n
+        yield customer_rows, loan_rows
+
+
+def write_xlsx(chunks, output_dir):
+    import openpyxl
+
+    output_dir = Path(output_dir)
+    customer_book = openpyxl.Workbook(write_only=True)
+    loan_book = openpyxl.Workbook(write_only=True)
+    customer_sheet = customer_book.create_sheet()
+    loan_sheet = loan_book.create_sheet()
+    customer_sheet.append(CUSTOMER_HEADER)
+    loan_sheet.append(LOAN_HEADER)
+    for customer_rows, loan_rows in chunks:
+        for row in customer_rows:
+            customer_sheet.append(row)
+        for row in loan_rows:
+            loan_sheet.append(row)
+    paths = output_dir / 'customer_data.xlsx', output_dir / 'loan_data.xlsx'
+    customer_book.save(paths[0])
+    loan_book.save(paths[1])
+    return paths
+
+
+def write_csv(chunks, output_dir):
+    output_dir = Path(output_dir)
+    paths = output_dir / 'customer_data.csv', output_dir / 'loan_data.csv'
+    with open(paths[0], 'w', newline='') as customer_file, open(paths[1], 'w', newline='') as loan_file:
+        customers = csv.writer(customer_file)
+        loans = csv.writer(loan_file)
+        customers.writerow(CUSTOMER_COLUMNS)
+        loans.writerow(LOAN_COLUMNS)
+        for customer_rows, loan_rows in chunks:
+            customers.writerows(customer_rows)
+            loans.writerows(loan_rows)
+    return paths
+
+
+def write_database(customers, distribution='poisson:3', seed=0, batch_size=None):
+    """Insert a generated portfolio through the ingestion pipeline.
+
+    The generator is deterministic, so it is run twice: once for customers
+    and once for loans, which need every customer to exist first.
+    """
+    customer_rows = (row for chunk, _ in generate_portfolio(customers, distribution, seed) for row in chunk)
+    customer_summary = ingest_customers(customer_rows, batch_size)
+    loan_rows = (row for _, chunk in generate_portfolio(customers, distribution, seed) for row in chunk)
+    loan_summary = ingest_loans(loan_rows, batch_size)
+    return customer_summary, loan_summary
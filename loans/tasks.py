@@ -1,52 +1,183 @@
-import openpyxl
-from celery import shared_task
+from celery import chain, chord, shared_task
 from django.conf import settings
-from .models import Customer, Loan
+from django.utils import timezone
+from . import analytics, rescoring, score_cache
+from .ingestion import (
+    UPLOAD_KINDS, ingest_customers, ingest_loans, iter_upload_rows, iter_xlsx_rows,
+    merge_summaries, shard_ranges, sync_file, xlsx_row_count,
+)
+from .models import RescoreRun, UploadJob
+from .profiles import rebuild_profiles
 from pathlib import Path
 
+CUSTOMER_FILE = 'customer_data.xlsx'
+LOAN_FILE = 'loan_data.xlsx'
+SOURCE_FILES = {'customers': CUSTOMER_FILE, 'loans': LOAN_FILE}
+
+
+def data_file(name):
+    return Path(settings.BASE_DIR) / name
+
 
 @shared_task
-def ingest_customer_data():
-    file_path = Path(settings.BASE_DIR) / 'customer_data.xlsx'
-    wb = openpyxl.load_workbook(file_path)
-    sheet = wb.active
-    for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip header
-        customer_id, first_name, last_name, phone_number, monthly_salary, approved_limit, current_debt = row
-        Customer.objects.get_or_create(
-            customer_id=customer_id,
-            defaults={
-                'first_name': first_name,
-                'last_name': last_name,
-                'phone_number': phone_number,
-                'monthly_salary': monthly_salary,
-                'approved_limit': approved_limit,
-                'current_debt': current_debt,
-                'age': 0,  # Placeholder, will be updated on register
-            }
-        )
+def ingest_customer_data(batch_size=None, on_conflict=None, file_path=None):
+    file_path = file_path or data_file(CUSTOMER_FILE)
+    summary = ingest_customers(iter_xlsx_rows(file_path), batch_size, on_conflict)
+    score_cache.invalidate_all()
+    return summary
+
+
+@shared_task
+def ingest_loan_data(batch_size=None, on_conflict=None, file_path=None):
+    file_path = file_path or data_file(LOAN_FILE)
+    summary = ingest_loans(iter_xlsx_rows(file_path), batch_size, on_conflict)
+    score_cache.invalidate_all()
+    return summary
+
+
+@shared_task
+def ingest_customer_shard(min_row, max_row, batch_size=None, on_conflict=None):
+    rows = iter_xlsx_rows(data_file(CUSTOMER_FILE), min_row, max_row)
+    return ingest_customers(rows, batch_size, on_conflict, first_row=min_row)
+
+
+@shared_task
+def ingest_loan_shard(min_row, max_row, batch_size=None, on_conflict=None):
+    rows = iter_xlsx_rows(data_file(LOAN_FILE), min_row, max_row)
+    return ingest_loans(rows, batch_size, on_conflict, first_row=min_row, refresh_profiles=False)
+
+
+@shared_task(bind=True)
+def start_loan_shards(self, customer_summaries, shard_size=None, batch_size=None, on_conflict=None):
+    # Runs as the customer chord's callback, so every customer row is in
+    # before the first loan shard resolves its customer ids.
+    shard_size = shard_size or settings.INGEST_SHARD_SIZE
+    shards = shard_ranges(xlsx_row_count(data_file(LOAN_FILE)), shard_size)
+    customers = merge_summaries(customer_summaries)
+    if not shards:
+        return finalize_ingestion([], customers)
+    header = [ingest_loan_shard.s(min_row, max_row, batch_size, on_conflict) for min_row, max_row in shards]
+    return self.replace(chord(header, finalize_ingestion.s(customers)))
 
 
 @shared_task
-def ingest_loan_data():
-    file_path = Path(settings.BASE_DIR) / 'loan_data.xlsx'
-    wb = openpyxl.load_workbook(file_path)
-    sheet = wb.active
-    for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip header
-        customer_id, loan_id, loan_amount, tenure, interest_rate, monthly_repayment, emis_paid_on_time, start_date, end_date = row
-        try:
-            customer = Customer.objects.get(customer_id=customer_id)
-            Loan.objects.get_or_create(
-                loan_id=loan_id,
-                defaults={
-                    'customer': customer,
-                    'loan_amount': loan_amount,
-                    'tenure': tenure,
-                    'interest_rate': interest_rate,
-                    'monthly_repayment': monthly_repayment,
-                    'emis_paid_on_time': emis_paid_on_time,
-                    'start_date': start_date,
-                    'end_date': end_date,
-                }
-            )
-        except Customer.DoesNotExist:
-            pass  # Skip if customer not found
\ No newline at end of file
+def finalize_ingestion(loan_summaries, customers):
+    loans = merge_summaries(loan_summaries)
+    rebuild_profiles()
+    score_cache.invalidate_all()
+    return {'customers': customers, 'loans': loans}
+
+
+def ingestion_workflow(shard_size=None, batch_size=None, on_conflict=None):
+    """Canvas that ingests both workbooks in parallel row-range shards.
+
+    Customer shards form one chord whose callback fans out the loan shards,
+    and a final callback merges the loan shard statistics with the customer
+    totals.
+    """
+    shard_size = shard_size or settings.INGEST_SHARD_SIZE
+    shards = shard_ranges(xlsx_row_count(data_file(CUSTOMER_FILE)), shard_size)
+    header = [ingest_customer_shard.s(min_row, max_row, batch_size, on_conflict) for min_row, max_row in shards]
+    return chord(header, start_loan_shards.s(shard_size, batch_size, on_conflict))
+
+
+@shared_task
+def sync_source(kind, file_path=None, batch_size=None):
+    file_path = file_path or data_file(SOURCE_FILES[kind])
+    summary = sync_file(kind, file_path, batch_size)
+    if summary['file'] == 'changed':
+        score_cache.invalidate_all()
+    return summary
+
+
+def sync_workflow(batch_size=None):
+    """Canvas that applies the changes in both workbooks since the last sync.
+
+    Customers go first so that new loan rows can resolve their customers.
+    """
+    return chain(sync_source.si('customers', None, batch_size), sync_source.si('loans', None, batch_size))
+
+
+@shared_task
+def refresh_portfolio_rollups(full=False):
+    return analytics.refresh_rollups(full)
+
+
+# acks_late with reject_on_worker_lost hands a chunk whose worker died back to
+# the broker; the chunk's checkpoint makes the retry a no-op if it committed.
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def rescore_chunk(chunk_id):
+    return rescoring.score_chunk(chunk_id)
+
+
+@shared_task
+def finish_rescore(chunk_results, run_id):
+    run = rescoring.finish_run(run_id)
+    return {
+        'run_id': str(run.pk),
+        'status': run.status,
+        'customers': run.customers,
+        'customers_per_second': run.customers_per_second(timezone.now()),
+    }
+
+
+@shared_task
+def start_rescore(chunk_size=None, resume=None):
+    """Plan a new run and fan its chunks out to the workers.
+
+    With ``resume`` (a run id, or ``True`` for the latest unfinished run) no
+    new run is planned; only the chunks that never committed are dispatched.
+    """
+    if resume:
+        run = rescoring.unfinished_run() if resume is True else RescoreRun.objects.get(pk=resume)
+        if run is None:
+            return None
+    else:
+        run = rescoring.plan_run(chunk_size)
+    chunks = rescoring.pending_chunks(run)
+    if chunks:
+        chord([rescore_chunk.s(chunk_id) for chunk_id in chunks], finish_rescore.s(str(run.pk))).apply_async()
+    else:
+        finish_rescore([], str(run.pk))
+    return {'run_id': str(run.pk), 'chunks': len(chunks)}
+
+
+@shared_task
+def process_upload(job_id):
+    job = UploadJob.objects.get(pk=job_id)
+    job.status = UploadJob.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    def record_progress(summary, **extra):
+        UploadJob.objects.filter(pk=job.pk).update(
+            rows_processed=summary['rows'],
+            inserted=summary['inserted'],
+            updated=summary['updated'],
+            skipped=summary['skipped'],
+            failed=summary['failed'],
+            errors=summary['errors'],
+            **extra,
+        )
+
+    try:
+        header, rows = iter_upload_rows(job.spool_path, job.file_name)
+        if len(header) not in UPLOAD_KINDS:
+            raise ValueError(f'Unrecognised header with {len(header)} columns; expected customer (7) or loan (9) data.')
+        kind, ingest = UPLOAD_KINDS[len(header)]
+        UploadJob.objects.filter(pk=job.pk).update(kind=kind)
+        summary = ingest(rows, on_batch=record_progress)
+    except Exception as exc:
+        UploadJob.objects.filter(pk=job.pk).update(status=UploadJob.FAILED, message=str(exc), finished_at=timezone.now())
+        raise
+    finally:
+        Path(job.spool_path).unlink(missing_ok=True)
+
+    score_cache.invalidate_all()
+    record_progress(
+        summary,
+        status=UploadJob.SUCCEEDED,
+        finished_at=timezone.now(),
+        message=f"{summary['inserted']} {kind} imported, {summary['updated']} updated, {summary['skipped']} skipped, {summary['failed']} failed.",
+    )
+    return summary
@@ -1,6 +1,50 @@
-from rest_framework.test import APITestCase
+import asyncio
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, models, transaction
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Customer, Loan
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from . import amortization, analytics, columnar, exports, ids, ingestion, metrics, renderers, rescoring, score_cache, startup
+from .benchmarks import api_urlconf, compare_results, concurrency_benchmarks, run_benchmarks, serializer_benchmarks
+from .ingestion import ingest_customers, ingest_loans, shard_ranges
+from .models import CreditProfile, CreditScoreSnapshot, Customer, Loan, PortfolioRollup, RescoreRun, UploadJob, to_money
+from .profiles import rebuild_profiles, verify_profiles
+from .scoring import aggregate_credit_score
+from .serializers import CUSTOMER_FIELDS, LOAN_FIELDS, CustomerSerializer, LoanSerializer, customer_row, loan_row
+from .synthetic import generate_portfolio, loan_counts, parse_distribution
+from .tasks import (
+    ingest_customer_data, ingest_loan_data, ingestion_workflow, refresh_portfolio_rollups, start_rescore, sync_workflow,
+)
+from .views import calculate_credit_score, calculate_emi
 
 
 class LoanAPITestCase(APITestCase):
@@ -39,3 +83,1440 @@ class LoanAPITestCase(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, 200)
         self.assertIn('approval', response.data)
+
+
+class LoanFixtureMixin:
+    def setUp(self):
+        score_cache.get_cache().clear()
+        self.customer = Customer.objects.create(
+            customer_id=1,
+            first_name='Jane',
+            last_name='Doe',
+            age=25,
+            monthly_salary=100000,
+            approved_limit=3600000,
+            phone_number='0987654321'
+        )
+
+    def add_loan(self, loan_id, **kwargs):
+        values = {
+            'customer': self.customer,
+            'loan_id': loan_id,
+            'loan_amount': 500000,
+            'tenure': 12,
+            'interest_rate': 10,
+            'monthly_repayment': 10000,
+            'emis_paid_on_time': 12,
+            'start_date': datetime.date(2019, 1, 1),
+            'end_date': datetime.date(2020, 1, 1),
+        }
+        values.update(kwargs)
+        return Loan.objects.create(**values)
+
+
+class CreditScoreTestCase(LoanFixtureMixin, TestCase):
+    def test_no_loans_scores_100(self):
+        self.assertEqual(calculate_credit_score(self.customer), 100)
+
+    def test_score_components(self):
+        today = timezone.now().date()
+        self.add_loan(1, emis_paid_on_time=6)
+        self.add_loan(2, loan_amount=300000, emis_paid_on_time=12, start_date=today)
+        # paid 18/24 -> 30, two loans -> 10, one this year -> 10, volume 8 lakh -> 8
+        self.assertEqual(calculate_credit_score(self.customer), 58)
+
+    def test_current_loans_over_limit_scores_zero(self):
+        self.add_loan(1, loan_amount=4000000, emis_paid_on_time=0)
+        self.assertEqual(calculate_credit_score(self.customer), 0)
+
+    def test_current_emis_over_half_salary_scores_zero(self):
+        self.add_loan(1, monthly_repayment=60000, emis_paid_on_time=0)
+        self.assertEqual(calculate_credit_score(self.customer), 0)
+
+    def test_single_query(self):
+        self.add_loan(1)
+        self.add_loan(2, emis_paid_on_time=3)
+        with self.assertNumQueries(1):
+            calculate_credit_score(self.customer)
+
+
+class CreditProfileTestCase(LoanFixtureMixin, TestCase):
+    def assertProfileMatchesLoans(self):
+        self.assertEqual(verify_profiles(), [])
+        self.assertEqual(calculate_credit_score(self.customer), aggregate_credit_score(self.customer))
+
+    def test_profile_follows_loan_changes(self):
+        loan = self.add_loan(1, emis_paid_on_time=3, start_date=timezone.now().date())
+        self.add_loan(2, loan_amount=250000)
+        profile = CreditProfile.objects.get(pk=self.customer.pk)
+        self.assertEqual(profile.loan_count, 2)
+        self.assertEqual(profile.active_exposure, 500000)
+        self.assertProfileMatchesLoans()
+
+        loan = Loan.objects.get(pk=loan.pk)
+        loan.emis_paid_on_time = 12
+        loan.start_date = datetime.date(2019, 1, 1)
+        loan.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.active_exposure, 0)
+        self.assertProfileMatchesLoans()
+
+        loan.delete()
+        profile.refresh_from_db()
+        self.assertEqual(profile.loan_count, 1)
+        self.assertProfileMatchesLoans()
+
+    def test_score_is_single_profile_read(self):
+        self.add_loan(1, emis_paid_on_time=3)
+        with self.assertNumQueries(1):
+            calculate_credit_score(self.customer)
+
+    def test_rebuild_command_repairs_drift(self):
+        self.add_loan(1)
+        Loan.objects.update(loan_amount=700000)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_credit_profiles', '--verify', stdout=io.StringIO())
+        call_command('rebuild_credit_profiles', stdout=io.StringIO())
+        call_command('rebuild_credit_profiles', '--verify', stdout=io.StringIO())
+        self.assertProfileMatchesLoans()
+
+
+class CheckEligibilityBatchTestCase(LoanFixtureMixin, APITestCase):
+    def test_batch_matches_single_checks(self):
+        self.add_loan(1, emis_paid_on_time=6)
+        other = Customer.objects.create(
+            customer_id=2, first_name='Low', last_name='Score', age=40,
+            monthly_salary=10000, approved_limit=100000, phone_number='1'
+        )
+        Loan.objects.create(
+            customer=other, loan_id=2, loan_amount=90000, tenure=12, interest_rate=10,
+            monthly_repayment=8000, emis_paid_on_time=0,
+            start_date=datetime.date(2019, 1, 1), end_date=datetime.date(2020, 1, 1)
+        )
+        items = [
+            {'customer_id': 1, 'loan_amount': 100000, 'interest_rate': 8, 'tenure': 12},
+            {'customer_id': 2, 'loan_amount': 50000, 'interest_rate': 8, 'tenure': 24},
+            {'customer_id': 1, 'loan_amount': 100000, 'interest_rate': 0, 'tenure': 10},
+        ]
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('check-eligibility-batch'), items, format='json')
+        self.assertEqual(response.status_code, 200)
+        for item, result in zip(items, response.data['results']):
+            single = self.client.post(reverse('check-eligibility'), item, format='json')
+            self.assertEqual(result, single.data)
+
+    def test_batch_reports_item_errors(self):
+        items = [
+            {'customer_id': 99, 'loan_amount': 100000, 'interest_rate': 8, 'tenure': 12},
+            {'customer_id': 1, 'loan_amount': 'lots', 'interest_rate': 8, 'tenure': 12},
+        ]
+        response = self.client.post(reverse('check-eligibility-batch'), {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0], {'customer_id': 99, 'error': 'Customer not found'})
+        self.assertIn('error', response.data['results'][1])
+
+    @override_settings(ELIGIBILITY_BATCH_MAX_ITEMS=1)
+    def test_batch_size_limit(self):
+        items = [{'customer_id': 1, 'loan_amount': 1, 'interest_rate': 8, 'tenure': 12}] * 2
+        response = self.client.post(reverse('check-eligibility-batch'), items, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+def reference_emi(loan_amount, interest_rate, tenure):
+    if interest_rate == 0:
+        return loan_amount / tenure
+    r = interest_rate / 12 / 100
+    return (loan_amount * r * (1 + r) ** tenure) / ((1 + r) ** tenure - 1)
+
+
+class LoanListingTestCase(LoanFixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        for loan_id in (5, 3, 9, 1, 7):
+            self.add_loan(loan_id, emis_paid_on_time=loan_id, monthly_repayment=1000 + loan_id)
+        self.url = reverse('view-loans', args=[1])
+
+    def test_unpaginated_shape_unchanged(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual([row['loan_id'] for row in response.json()], [5, 3, 9, 1, 7])
+        self.assertEqual(response.json()[0], {
+            'loan_id': 5, 'loan_amount': 500000.0, 'interest_rate': 10.0,
+            'monthly_installment': 1005.0, 'repayments_left': 7,
+        })
+
+    def test_cursor_pagination(self):
+        pages = []
+        params = {'limit': 2}
+        while True:
+            with self.assertNumQueries(2):
+                data = self.client.get(self.url, params).json()
+            pages.append([row['loan_id'] for row in data['results']])
+            if data['next_cursor'] is None:
+                break
+            params = {'limit': 2, 'cursor': data['next_cursor']}
+        self.assertEqual(pages, [[1, 3], [5, 7], [9]])
+
+    def test_track_loans_pagination(self):
+        response = self.client.post(reverse('track-loans'), {'customer_id': 1, 'cursor': 5}, format='json')
+        self.assertEqual([row['loan_id'] for row in response.data['results']], [7, 9])
+        self.assertIsNone(response.data['next_cursor'])
+        self.assertEqual(self.client.post(reverse('track-loans'), {'customer_id': 1}, format='json').data,
+                         self.client.get(self.url).data)
+
+    def test_stream_matches_full_list(self):
+        response = self.client.get(self.url, {'stream': 1})
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), self.client.get(self.url).json())
+
+    def test_invalid_page_params(self):
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('view-loans', args=[99]), {'limit': 2}).status_code, 404)
+
+
+class ConditionalLoanTestCase(LoanFixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.loan = self.add_loan(1)
+        self.url = reverse('view-loan', args=[1])
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['customer']['customer_id'], 1)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_if_none_match_skips_serialization(self):
+        etag = self.client.get(self.url)['ETag']
+        with mock.patch('loans.views.loan_data') as serializer, self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        serializer.assert_not_called()
+        self.assertNotIn('serialize', response['Server-Timing'])
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200)
+
+    def test_loan_or_customer_change_refreshes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.loan.emis_paid_on_time = 3
+        self.loan.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        self.customer.first_name = 'Janet'
+        self.customer.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['customer']['name'], 'Janet Doe')
+
+    def test_track_loans_by_loan_id(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.post(reverse('track-loans'), {'loan_id': 1}, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['loan_id'], 1)
+        response = self.client.post(reverse('track-loans'), {'loan_id': 1}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('track-loans'), {'loan_id': 1}, format='json', HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, 412)
+
+
+class AsyncReadViewsTestCase(LoanFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for loan_id in (4, 2, 6):
+            self.add_loan(loan_id, emis_paid_on_time=loan_id)
+        self.sync_urls = api_urlconf(False)
+        self.async_urls = api_urlconf(True)
+
+    def assertSameResponses(self, requests):
+        """Each ``(method, name, args, data)`` answers alike from the sync and async views."""
+        with override_settings(ROOT_URLCONF=self.sync_urls):
+            expected = [self.call(Client(), *request) for request in requests]
+        with override_settings(ROOT_URLCONF=self.async_urls):
+            actual = [async_to_sync(self.acall)(*request) for request in requests]
+        self.assertEqual(actual, expected)
+
+    def call(self, client, method, name, args, data):
+        response = getattr(client, method)(reverse(name, args=args), data, content_type='application/json')
+        return response.status_code, json.loads(response.content)
+
+    async def acall(self, method, name, args, data):
+        response = await getattr(AsyncClient(), method)(reverse(name, args=args), data, content_type='application/json')
+        return response.status_code, json.loads(response.content)
+
+    def test_same_responses(self):
+        application = {'customer_id': 1, 'loan_amount': 100000, 'interest_rate': 8, 'tenure': 12}
+        self.assertSameResponses([
+            ('get', 'view-loan', [4], None),
+            ('get', 'view-loan', [99], None),
+            ('get', 'view-loans', [1], None),
+            ('get', 'view-loans', [1], {'limit': 2}),
+            ('get', 'view-loans', [1], {'limit': 2, 'cursor': 2}),
+            ('get', 'view-loans', [1], {'limit': 0}),
+            ('get', 'view-loans', [7], None),
+            ('post', 'track-loans', [], {'loan_id': 6}),
+            ('post', 'track-loans', [], {'customer_id': 1, 'limit': 1}),
+            ('post', 'track-loans', [], {}),
+            ('post', 'check-eligibility', [], application),
+            ('post', 'check-eligibility', [], dict(application, customer_id=5)),
+        ])
+
+    @override_settings(ROOT_URLCONF=api_urlconf(True))
+    async def test_conditional_get_and_stream(self):
+        client = AsyncClient()
+        response = await client.get(reverse('view-loan', args=[4]))
+        response = await client.get(reverse('view-loan', args=[4]), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        response = await client.get(reverse('view-loans', args=[1]), {'stream': 1})
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([row['loan_id'] for row in json.loads(body)], [4, 2, 6])
+
+
+class ConcurrencyBenchmarkTestCase(TransactionTestCase):
+    def test_modes_serve_without_errors(self):
+        call_command('generate_portfolio', '--customers', '20', '--loans', 'fixed:2', stdout=io.StringIO())
+        results = concurrency_benchmarks(20, [4], 3, random.Random(0), wsgi_threads=2)
+        self.assertEqual([row['benchmark'] for row in results], [
+            *(f'concurrency:{mode}[clients=4]' for mode in ('wsgi', 'asgi+sync-views', 'asgi+async-views')),
+            'concurrency:create-loan spread[clients=4]', 'concurrency:create-loan hot customer[clients=4]',
+        ])
+        for row in results:
+            self.assertEqual((row['runs'], row['server_errors']), (12, 0))
+            self.assertGreater(row['requests_per_second'], 0)
+
+
+class OfferGridTestCase(LoanFixtureMixin, APITestCase):
+    grid = {'loan_amount': '100000,3500000', 'tenure': '12:36:12', 'interest_rate': '10,17.5'}
+
+    def test_cells_match_check_eligibility(self):
+        self.add_loan(1, emis_paid_on_time=6)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('offers', args=[1]), self.grid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tenure'], [12, 24, 36])
+        for a, loan_amount in enumerate(response.data['loan_amount']):
+            for t, tenure in enumerate(response.data['tenure']):
+                for r, interest_rate in enumerate(response.data['interest_rate']):
+                    expected = self.client.post(reverse('check-eligibility'), {
+                        'customer_id': 1, 'loan_amount': loan_amount, 'tenure': tenure, 'interest_rate': interest_rate,
+                    }, format='json').data
+                    self.assertEqual(response.data['approval'][a][t][r], expected['approval'])
+                    self.assertEqual(response.data['corrected_interest_rate'][a][t][r], expected['corrected_interest_rate'])
+                    self.assertEqual(response.data['monthly_installment'][a][t][r], expected['monthly_installment'])
+        # Score 30 floors every rate at 16%.
+        self.assertEqual(response.data['corrected_interest_rate'][0][0], [16.0, 17.5])
+        # The active 5 lakh loan leaves room for 1 lakh but not 35 lakh.
+        self.assertEqual(response.data['within_limits'][0][0], [True, True])
+        self.assertEqual(response.data['within_limits'][1][0], [False, False])
+
+    def test_rejected_grid(self):
+        self.add_loan(1, loan_amount=4000000, emis_paid_on_time=0)
+        response = self.client.get(reverse('offers', args=[1]), self.grid)
+        self.assertEqual(response.data['credit_score'], 0)
+        self.assertFalse(any(flag for plane in response.data['approval'] for row in plane for flag in row))
+        self.assertEqual(response.data['corrected_interest_rate'][0][0], [10.0, 17.5])
+
+    def test_invalid_grids(self):
+        url = reverse('offers', args=[1])
+        for params in (
+            {'loan_amount': '1000', 'tenure': '12'},
+            {**self.grid, 'tenure': '12.5'},
+            {**self.grid, 'loan_amount': '1:5:0'},
+            {**self.grid, 'interest_rate': 'ten'},
+            {'loan_amount': '1:10000:1', 'tenure': '1:2:1', 'interest_rate': '10'},
+        ):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+        self.assertEqual(self.client.get(reverse('offers', args=[99]), self.grid).status_code, 404)
+
+
+class CreateLoanTestCase(LoanFixtureMixin, APITestCase):
+    def apply(self, **kwargs):
+        data = {'customer_id': 1, 'loan_amount': 500000, 'interest_rate': 10, 'tenure': 12}
+        data.update(kwargs)
+        return self.client.post(reverse('create-loan'), data, format='json')
+
+    def test_counters_updated(self):
+        response = self.apply()
+        self.assertTrue(response.data['loan_approved'])
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_debt, 500000)
+        self.assertEqual(self.customer.credit_profile.active_exposure, 500000)
+        self.assertEqual(self.customer.credit_profile.active_emi_sum, to_money(response.data['monthly_installment']))
+
+    def test_limits_include_new_loan(self):
+        self.add_loan(1, loan_amount=3000000, monthly_repayment=10000, emis_paid_on_time=0, tenure=120)
+        response = self.apply(loan_amount=700000)
+        self.assertFalse(response.data['loan_approved'])
+        self.assertEqual(response.data['message'], 'Loan amount exceeds approved limit')
+
+        response = self.apply(loan_amount=600000, tenure=1)
+        self.assertFalse(response.data['loan_approved'])
+        self.assertEqual(response.data['message'], 'Monthly installments would exceed 50% of monthly salary')
+        self.assertEqual(Loan.objects.count(), 1)
+
+
+class CreateLoanConcurrencyTestCase(TransactionTestCase):
+    def test_parallel_applications_do_not_overallocate(self):
+        customer = Customer.objects.create(
+            customer_id=1, first_name='Jane', last_name='Doe', age=30, phone_number='1',
+            monthly_salary=1000000, approved_limit=1000000,
+        )
+        workers = 8
+        requests = 40
+        barrier = threading.Barrier(workers)
+
+        def apply(count):
+            client = APIClient()
+            barrier.wait()
+            return [
+                client.post(reverse('create-loan'), {
+                    'customer_id': 1, 'loan_amount': 100000, 'interest_rate': 10, 'tenure': 12,
+                }, format='json').data
+                for _ in range(count)
+            ]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            responses = [data for batch in pool.map(apply, [requests // workers] * workers) for data in batch]
+
+        approved = [data for data in responses if data['loan_approved']]
+        self.assertEqual(len(approved), 10)
+        self.assertEqual(Loan.objects.count(), 10)
+        customer.refresh_from_db()
+        self.assertEqual(customer.current_debt, 1000000)
+        self.assertEqual(customer.credit_profile.active_exposure, 1000000)
+        self.assertEqual(verify_profiles(), [])
+
+
+class IdAllocationTestCase(LoanFixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        ids.customer_ids.reset()
+        ids.loan_ids.reset()
+
+    def register(self, phone_number):
+        return self.client.post(reverse('register'), {
+            'first_name': 'A', 'last_name': 'B', 'age': 30, 'monthly_income': 50000, 'phone_number': phone_number,
+        }, format='json')
+
+    def test_register_is_a_single_insert(self):
+        # The block is kept once the reserving transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.register('1')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.register('2')
+        # Inside the test transaction the insert runs in a savepoint.
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT INTO "loans_customer"'))
+        self.assertEqual(response.data['customer_id'], 3)
+
+    def test_block_is_kept_only_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            first = ids.loan_ids.next()
+            self.assertNotEqual(ids.loan_ids.next(), first + 1)
+        self.assertTrue(callbacks)
+
+    def test_explicit_id_inside_held_block_is_skipped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.register('1')
+        # An ingested row takes the id the next registration would get.
+        Customer.objects.create(
+            customer_id=3, first_name='X', last_name='Y', age=40, monthly_salary=1, approved_limit=0, phone_number='9',
+        )
+        response = self.register('2')
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(response.data['customer_id'], 3)
+
+    def test_bulk_register_redraws_clashing_ids(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.register('1')
+        Customer.objects.create(
+            customer_id=4, first_name='X', last_name='Y', age=40, monthly_salary=1, approved_limit=0, phone_number='9',
+        )
+        applicant = {'first_name': 'A', 'last_name': 'B', 'age': 30, 'monthly_income': 50000, 'phone_number': '3'}
+        response = self.client.post(reverse('register-bulk'), [applicant] * 3, format='json')
+        self.assertEqual(response.data['created'], 3)
+        created = [result['customer_id'] for result in response.data['results']]
+        self.assertNotIn(4, created)
+        self.assertEqual(len(set(created)), 3)
+
+    def test_created_loan_skips_explicit_id_inside_held_block(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_loan(None)
+        self.add_loan(ids.loan_ids.take(1)[0] + 1)
+        response = self.client.post(reverse('create-loan'), {
+            'customer_id': 1, 'loan_amount': 100000, 'interest_rate': 10, 'tenure': 12,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Loan.objects.filter(loan_id=response.data['loan_id']).count(), 1)
+
+    def test_created_loans_get_a_loan_id(self):
+        response = self.client.post(reverse('create-loan'), {
+            'customer_id': 1, 'loan_amount': 100000, 'interest_rate': 10, 'tenure': 12,
+        }, format='json')
+        self.assertEqual(response.data['loan_id'], 1)
+        self.assertEqual(self.client.get(reverse('view-loan', args=[1])).data['loan_id'], 1)
+
+    def test_skips_explicit_ids(self):
+        self.add_loan(500)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.add_loan(None).loan_id, 501)
+        self.assertEqual(self.add_loan(None).loan_id, 502)
+
+    def test_rolled_back_block_is_dropped(self):
+        with transaction.atomic():
+            first = ids.loan_ids.next()
+            transaction.set_rollback(True)
+        other_worker = ids.IdAllocator('loan')
+        self.assertEqual(other_worker.next(), first)
+        self.assertNotEqual(ids.loan_ids.next(), first)
+
+
+class RegisterBulkTestCase(APITestCase):
+    applicants = [
+        {'first_name': 'A', 'last_name': 'One', 'age': 30, 'monthly_income': 50000, 'phone_number': '1'},
+        {'first_name': 'B', 'last_name': 'Two', 'age': 17, 'monthly_income': 50000, 'phone_number': '2'},
+        {'first_name': 'C', 'last_name': 'Three', 'age': 45, 'monthly_income': 123456, 'phone_number': '3'},
+    ]
+
+    def test_json_array(self):
+        response = self.client.post(reverse('register-bulk'), self.applicants, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        first, error, third = response.data['results']
+        self.assertEqual(error, {'index': 1, 'error': 'Age must be at least 18'})
+        self.assertEqual(first['name'], 'A One')
+        self.assertEqual(third['approved_limit'], '4400000.00')
+        self.assertEqual(
+            sorted(Customer.objects.values_list('customer_id', flat=True)),
+            sorted([first['customer_id'], third['customer_id']]),
+        )
+
+    def test_ndjson(self):
+        body = '\n'.join(json.dumps(applicant) for applicant in self.applicants * 20) + '\n'
+        # Reserving the id block takes three statements (lock the block row,
+        # find the highest stored id, move the block on) and one INSERT stores
+        # all 40 rows; each step runs in its own savepoint.
+        with self.assertNumQueries(8):
+            response = self.client.post(reverse('register-bulk'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.data['created'], 40)
+        self.assertEqual(Customer.objects.count(), 40)
+
+    def test_rejects_bad_input(self):
+        response = self.client.post(reverse('register-bulk'), '{"first_name": "A"}\nnot json', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', str(response.data))
+        response = self.client.post(reverse('register-bulk'), [self.applicants[1]], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Customer.objects.count(), 0)
+
+
+@override_settings(PORTFOLIO_WATERMARK_LAG=0)
+class PortfolioRollupTestCase(LoanFixtureMixin, APITestCase):
+    def rollups(self):
+        return {
+            (row.pop('dimension'), row.pop('bucket')): row
+            for row in PortfolioRollup.objects.values('dimension', 'bucket', *analytics.ROLLUP_FIELDS)
+        }
+
+    def test_full_rebuild_and_endpoint(self):
+        self.add_loan(1, emis_paid_on_time=6, interest_rate=9.5)
+        self.add_loan(2, loan_amount=300000, interest_rate=14, start_date=datetime.date(2019, 3, 5))
+        self.assertEqual(analytics.refresh_rollups()['mode'], 'full')
+
+        response = self.client.get(reverse('analytics-portfolio'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['bucket'] for row in response.data['rate_bucket']], ['8-10', '14-16'])
+        self.assertEqual([row['bucket'] for row in response.data['start_month']], ['2019-01', '2019-03'])
+        band, = response.data['score_band']
+        self.assertEqual(band['bucket'], '31-50')
+        self.assertEqual((band['loan_count'], band['active_count']), (2, 1))
+        self.assertEqual((band['exposure'], band['volume']), (decimal.Decimal('500000'), decimal.Decimal('800000')))
+        # 18 of 24 EMIs paid on time.
+        self.assertEqual(band['delinquency_ratio'], 0.25)
+        self.assertIsNotNone(response.data['refreshed_at'])
+
+        response = self.client.get(reverse('analytics-portfolio'), {'dimension': 'rate_bucket'})
+        self.assertEqual(set(response.data), {'refreshed_at', 'rebuilt_at', 'rate_bucket'})
+        response = self.client.get(reverse('analytics-portfolio'), {'dimension': 'age'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_incremental_refresh_matches_full_rebuild(self):
+        first = self.add_loan(1, emis_paid_on_time=6)
+        second = self.add_loan(2, interest_rate=17)
+        other = Customer.objects.create(
+            first_name='John', last_name='Roe', age=40, monthly_salary=50000, approved_limit=1800000, phone_number='1',
+        )
+        self.add_loan(3, customer=other, start_date=datetime.date(2021, 7, 1))
+        analytics.refresh_rollups()
+        self.assertEqual(analytics.refresh_rollups()['customers'], 0)
+
+        first.emis_paid_on_time = 12
+        first.save()
+        second.delete()
+        self.add_loan(4, interest_rate=21, start_date=datetime.date(2022, 2, 1))
+        other.delete()
+        summary = analytics.refresh_rollups()
+        self.assertEqual((summary['mode'], summary['customers']), ('incremental', 1))
+        incremental = self.rollups()
+        analytics.refresh_rollups(full=True)
+        self.assertEqual(incremental, self.rollups())
+        self.assertNotIn(('start_month', '2021-07'), incremental)
+
+    def test_refresh_task_and_command(self):
+        self.add_loan(1)
+        self.assertEqual(refresh_portfolio_rollups.delay(full=True).get()['loans'], 1)
+        output = io.StringIO()
+        call_command('refresh_portfolio_rollups', stdout=output)
+        self.assertIn('Incremental refresh recounted 0 customers', output.getvalue())
+        self.assertIn('loans.tasks.refresh_portfolio_rollups', [entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()])
+
+
+class RescoreTestCase(LoanFixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(2, 6):
+            Customer.objects.create(
+                customer_id=number, first_name='C', last_name=str(number), age=30,
+                monthly_salary=50000, approved_limit=1800000, phone_number=str(number),
+            )
+
+    def test_chunked_run(self):
+        self.add_loan(1, emis_paid_on_time=6)
+        result = start_rescore.delay(chunk_size=2).get()
+        run = RescoreRun.objects.get(pk=result['run_id'])
+        self.assertEqual((run.status, run.customers, result['chunks']), (RescoreRun.SUCCEEDED, 5, 3))
+        self.assertIsNotNone(run.customers_per_second())
+        self.assertEqual(
+            list(run.chunks.order_by('after_pk').values_list('scored', 'done')),
+            [(2, True), (2, True), (1, True)],
+        )
+        self.assertEqual(CreditScoreSnapshot.objects.filter(run=run).count(), 5)
+        self.assertEqual(CreditScoreSnapshot.objects.get(customer=self.customer).score, calculate_credit_score(self.customer))
+
+        response = self.client.get(reverse('rescore-run', args=[run.pk]))
+        self.assertEqual((response.data['chunks'], response.data['chunks_done']), (3, 3))
+        self.assertEqual(response.data['customers'], 5)
+
+    def test_resume_skips_committed_chunks(self):
+        run = rescoring.plan_run(chunk_size=2)
+        first_chunk = rescoring.pending_chunks(run)[0]
+        rescoring.score_chunk(first_chunk)
+        # A loan that would change the first chunk's scores if it ran again.
+        self.add_loan(1, emis_paid_on_time=0)
+        result = start_rescore.delay(resume=True).get()
+        self.assertEqual((result['run_id'], result['chunks']), (str(run.pk), 2))
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.customers), (RescoreRun.SUCCEEDED, 5))
+        self.assertEqual(CreditScoreSnapshot.objects.get(customer=self.customer).score, 100)
+        self.assertEqual(rescoring.score_chunk(first_chunk), 2)
+        self.assertIsNone(start_rescore.delay(resume=True).get())
+
+    def test_score_history(self):
+        start_rescore.delay().get()
+        self.add_loan(1, emis_paid_on_time=6)
+        run = RescoreRun.objects.get(pk=start_rescore.delay().get()['run_id'])
+        self.assertEqual(rescoring.band_changes(run).count(), 1)
+
+        response = self.client.get(reverse('score-history', args=[1]))
+        self.assertEqual([point['score'] for point in response.data['history']], [100, 30])
+        change, = response.data['band_changes']
+        self.assertEqual((change['from'], change['to']), ('51-100', '11-30'))
+        self.assertEqual(self.client.get(reverse('score-history', args=[99])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('score-history', args=[1]), {'since': 'soon'}).status_code, 400)
+
+    def test_score_history_since_is_timezone_aware(self):
+        start_rescore.delay().get()
+        today = timezone.localdate()
+        with warnings.catch_warnings():
+            # A naive bound would make Django warn about the timezone.
+            warnings.simplefilter('error', RuntimeWarning)
+            history, _ = rescoring.score_history(1, today)
+            self.assertEqual(len(history), 1)
+            history, _ = rescoring.score_history(1, today + datetime.timedelta(days=1))
+            self.assertEqual(history, [])
+
+
+class ExportTestCase(LoanFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_loan(1)
+        self.add_loan(2, emis_paid_on_time=3, start_date=datetime.date(2021, 6, 1))
+        self.add_loan(3, emis_paid_on_time=0, start_date=datetime.date(2023, 2, 1))
+
+    def export(self, kind, **params):
+        response = self.client.get(reverse('export', args=[kind]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_loans_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export('loans').decode())))
+        self.assertEqual(tuple(rows[0]), ingestion.LOAN_COLUMNS)
+        self.assertEqual(rows[1], ['1', '1', '500000.00', '12', '10.00', '10000.00', '12', '2019-01-01', '2020-01-01'])
+        self.assertEqual([row[1] for row in rows[1:]], ['1', '2', '3'])
+
+        rows = list(csv.reader(io.StringIO(self.export('loans', active=1, since='2022-01-01').decode())))
+        self.assertEqual([row[1] for row in rows[1:]], ['3'])
+        rows = list(csv.reader(io.StringIO(self.export('loans', until='2021-06-01').decode())))
+        self.assertEqual([row[1] for row in rows[1:]], ['1', '2'])
+
+    def test_ndjson_and_gzip(self):
+        lines = self.export('customers', format='ndjson').decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['approved_limit'], 3600000.0)
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(gzip.decompress(self.export('loans', format='ndjson', gzip=1)), self.export('loans', format='ndjson'))
+        response = self.client.get(reverse('export', args=['loans']), {'gzip': 1})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="loans.csv.gz"')
+
+    def test_customer_id_filter(self):
+        Customer.objects.create(
+            customer_id=2, first_name='B', last_name='C', age=40, monthly_salary=1, approved_limit=0, phone_number='9',
+        )
+        rows = list(csv.reader(io.StringIO(self.export('customers', customer_id=2).decode())))
+        self.assertEqual([row[0] for row in rows[1:]], ['2'])
+        rows = list(csv.reader(io.StringIO(self.export('loans', customer_id=2).decode())))
+        self.assertEqual(rows[1:], [])
+
+    def test_streams_in_chunks_from_one_query(self):
+        chunks, _, _ = exports.export_stream('loans', {}, chunk_size=2)
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(chunks)
+        self.assertEqual(len(queries), 1)
+        # Header and first two rows, then the last row.
+        self.assertEqual(len([chunk for chunk in chunks if chunk]), 2)
+
+    def test_invalid_requests(self):
+        for kind, params in (
+            ('payments', {}), ('loans', {'since': 'yesterday'}), ('loans', {'format': 'xml'}),
+            ('customers', {'customer_id': 'one'}),
+        ):
+            response = self.client.get(reverse('export', args=[kind]), params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'loans.csv.gz'
+            call_command('export_data', 'loans', '--active', '--gzip', '--output', str(path), stderr=io.StringIO())
+            rows = gzip.decompress(path.read_bytes()).decode().splitlines()
+        self.assertEqual(len(rows), 3)
+        output = io.StringIO()
+        call_command('export_data', 'customers', stdout=output)
+        self.assertEqual(output.getvalue().splitlines()[0], ','.join(ingestion.CUSTOMER_COLUMNS))
+
+
+class ColumnarSnapshotTestCase(LoanFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        today = timezone.now().date()
+        self.add_loan(1, emis_paid_on_time=6)
+        self.add_loan(2, loan_amount=300000, start_date=today)
+        for number, salary in ((2, 20000), (3, 80000)):
+            customer = Customer.objects.create(
+                customer_id=number, first_name='C', last_name=str(number), age=30,
+                monthly_salary=salary, approved_limit=36 * salary, phone_number=str(number),
+            )
+            self.add_loan(10 + number, customer=customer, monthly_repayment=15000, emis_paid_on_time=2)
+
+    def assertScoresMatch(self, snapshot):
+        customer_pks, scores = snapshot.credit_scores()
+        expected = {customer.pk: aggregate_credit_score(customer) for customer in Customer.objects.all()}
+        self.assertEqual(dict(zip(customer_pks.tolist(), scores.tolist())), expected)
+
+    def test_scores_match_the_database(self):
+        columnar.compile_snapshot(self.directory)
+        snapshot = columnar.Snapshot(self.directory)
+        self.assertScoresMatch(snapshot)
+        # Over half the salary in EMIs scores 0.
+        self.assertIn(0, snapshot.credit_scores()[1].tolist())
+        self.assertIsInstance(snapshot.segments[0]['loan_amount'], np.memmap)
+        self.assertFalse(snapshot.segments[0]['loan_amount'].flags.writeable)
+        loans = snapshot.loans_for(self.customer.pk)
+        self.assertEqual(loans['loan_amount'].tolist(), [50000000, 30000000])
+
+    def test_append_supersedes_changed_rows(self):
+        columnar.compile_snapshot(self.directory)
+        loan = Loan.objects.get(loan_id=1)
+        loan.emis_paid_on_time = 12
+        loan.save()
+        newcomer = Customer.objects.create(
+            customer_id=9, first_name='N', last_name='New', age=30, monthly_salary=50000, approved_limit=1800000, phone_number='9',
+        )
+        self.add_loan(20, customer=newcomer)
+        manifest = columnar.compile_snapshot(self.directory, append=True)
+        self.assertEqual(len(manifest['segments']), 2)
+        snapshot = columnar.Snapshot(self.directory)
+        self.assertScoresMatch(snapshot)
+        self.assertEqual(snapshot.loans_for(self.customer.pk)['loan_emis_paid_on_time'].tolist(), [12, 12])
+
+        manifest = columnar.compile_snapshot(self.directory)
+        self.assertEqual(len(manifest['segments']), 1)
+        self.assertEqual(len(list(Path(self.directory).iterdir())), 2)
+
+    def test_command(self):
+        output = io.StringIO()
+        call_command('compile_snapshot', '--dir', self.directory, '--scores', stdout=output)
+        self.assertIn('3 customers', output.getvalue())
+        self.assertIn('Scored 3 customers', output.getvalue())
+
+
+class FastSerializationTestCase(LoanFixtureMixin, TestCase):
+    def test_rows_match_model_serializers_byte_for_byte(self):
+        other = Customer.objects.create(
+            customer_id=2, first_name='Zoë\u2028', last_name='Ünal', age=40,
+            monthly_salary=decimal.Decimal('12345.67'), approved_limit=decimal.Decimal('400000'), phone_number='1',
+        )
+        self.add_loan(1, interest_rate=decimal.Decimal('9.5'), monthly_repayment=decimal.Decimal('1234.5'))
+        self.add_loan(2, customer=other, loan_amount=decimal.Decimal('99999999.99'))
+        loans = Loan.objects.select_related('customer').order_by('pk')
+        customers = Customer.objects.order_by('pk')
+        loan_tuples = loans.values_list(*LOAN_FIELDS, *(f'customer__{field}' for field in CUSTOMER_FIELDS))
+        customer_tuples = customers.values_list(*CUSTOMER_FIELDS)
+        drf = JSONRenderer()
+        self.assertEqual(
+            renderers.dumps([loan_row(row) for row in loan_tuples]), drf.render(LoanSerializer(loans, many=True).data),
+        )
+        self.assertEqual(
+            renderers.dumps([customer_row(row) for row in customer_tuples]),
+            drf.render(CustomerSerializer(customers, many=True).data),
+        )
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'when': timezone.now(), 'day': datetime.date(2024, 2, 29), 'id': uuid.uuid4(),
+            'amount': decimal.Decimal('12.30'), 'ratio': 0.1, 'text': 'line\u2029break é', 'nested': [{'n': None, 'ok': True}],
+        }
+        fast = renderers.ORJSONRenderer()
+        self.assertEqual(fast.render(data), JSONRenderer().render(data))
+        self.assertEqual(fast.render(data, 'application/json; indent=2'), JSONRenderer().render(data, 'application/json; indent=2'))
+        self.assertEqual(fast.render(None), b'')
+
+    def test_views_use_the_fast_path(self):
+        loan = self.add_loan(1)
+        response = self.client.get(reverse('view-loan', args=[loan.loan_id]))
+        self.assertEqual(response.content, JSONRenderer().render(LoanSerializer(loan).data))
+
+    def test_microbenchmark(self):
+        rows = serializer_benchmarks(50, 1, random.Random(0))
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(row['size'] == 50 for row in rows))
+
+
+class AmortizationTestCase(TestCase):
+    cases = [(100000, 10, 12), (900000, 8.2, 129), (50000, 0, 10), (1, 24, 1), (250000, 16, 60)]
+
+    def test_scalar_parity(self):
+        for loan_amount, interest_rate, tenure in self.cases:
+            self.assertAlmostEqual(
+                calculate_emi(loan_amount, interest_rate, tenure),
+                reference_emi(loan_amount, interest_rate, tenure),
+                places=6,
+            )
+
+    def test_decimal_and_float_inputs_mix(self):
+        self.assertAlmostEqual(
+            calculate_emi(decimal.Decimal('100000.00'), 10.5, 12),
+            reference_emi(100000, 10.5, 12),
+            places=6,
+        )
+
+    def test_vectorized_emi_and_interest(self):
+        principal, rate, tenure = (np.array(column, dtype=float) for column in zip(*self.cases))
+        expected = np.array([reference_emi(*case) for case in self.cases])
+        np.testing.assert_allclose(amortization.emi(principal, rate, tenure), expected)
+        np.testing.assert_allclose(amortization.total_interest(principal, rate, tenure), expected * tenure - principal)
+
+    def test_schedule(self):
+        principal, rate, tenure = (np.array(column, dtype=float) for column in zip(*self.cases))
+        plan = amortization.schedule(principal, rate, tenure)
+        self.assertEqual(plan['payment'].shape, (len(self.cases), 129))
+        np.testing.assert_allclose(plan['principal'].sum(axis=1), principal)
+        np.testing.assert_allclose(plan['interest'].sum(axis=1), amortization.total_interest(principal, rate, tenure), atol=1e-6)
+        np.testing.assert_allclose(plan['balance'][:, 0], principal - plan['principal'][:, 0], atol=1e-6)
+        self.assertTrue((plan['balance'][np.arange(len(self.cases)), tenure.astype(int) - 1] == 0).all())
+        self.assertTrue((plan['payment'][2, 10:] == 0).all())
+
+
+class ScoreCacheTestCase(LoanFixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        score_cache.reset_stats()
+
+    def test_repeat_lookups_hit_cache(self):
+        self.add_loan(1, emis_paid_on_time=6)
+        score = calculate_credit_score(self.customer)
+        with self.assertNumQueries(0):
+            self.assertEqual(calculate_credit_score(self.customer), score)
+        self.assertEqual(score_cache.stats()['hits'], 1)
+        self.assertEqual(score_cache.stats()['misses'], 1)
+
+    def test_loan_and_customer_changes_invalidate(self):
+        self.assertEqual(calculate_credit_score(self.customer), 100)
+        loan = self.add_loan(1, loan_amount=4000000, emis_paid_on_time=0)
+        self.assertEqual(calculate_credit_score(self.customer), 0)
+
+        self.customer.approved_limit = 5000000
+        self.customer.save()
+        self.assertNotEqual(calculate_credit_score(self.customer), 0)
+
+        loan.delete()
+        self.assertEqual(calculate_credit_score(self.customer), 100)
+
+    def test_invalidate_all(self):
+        self.add_loan(1)
+        calculate_credit_score(self.customer)
+        score_cache.invalidate_all()
+        with self.assertNumQueries(1):
+            calculate_credit_score(self.customer)
+
+    def test_invalidation_during_computation_is_not_overwritten(self):
+        self.assertEqual(calculate_credit_score(self.customer), 100)
+        score_cache.invalidate(self.customer.pk)
+
+        def stale_score(customer):
+            # A loan write commits, and invalidates, while this computation
+            # still holds the score it read before the write.
+            score_cache.invalidate(customer.pk)
+            return 5
+
+        self.assertEqual(score_cache.cached_credit_score(self.customer, stale_score), 5)
+        misses = score_cache.stats()['misses']
+        self.assertEqual(calculate_credit_score(self.customer), 100)
+        self.assertEqual(score_cache.stats()['misses'], misses + 1)
+
+    def test_stats_endpoint(self):
+        calculate_credit_score(self.customer)
+        response = self.client.get(reverse('score-cache-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['misses'], 1)
+
+
+class SingleFlightTestCase(TestCase):
+    def setUp(self):
+        score_cache.reset_stats()
+        score_cache.invalidate_all()
+        self.customer = Customer(pk=4242)
+        self.computed = 0
+
+    def slow_score(self, customer):
+        with self.lock:
+            self.computed += 1
+        time.sleep(0.2)
+        return 77
+
+    def test_concurrent_misses_compute_once(self):
+        self.lock = threading.Lock()
+        with ThreadPoolExecutor(8) as pool:
+            scores = list(pool.map(lambda _: score_cache.cached_credit_score(self.customer, self.slow_score), range(8)))
+        self.assertEqual(scores, [77] * 8)
+        self.assertEqual(self.computed, 1)
+        flights = score_cache.stats()['single_flight']
+        self.assertEqual((flights['computations'], flights['saved']), (1, 7))
+
+    def test_request_after_invalidation_does_not_join_older_flight(self):
+        started, release = threading.Event(), threading.Event()
+
+        def old_score(customer):
+            started.set()
+            release.wait(5)
+            return 10
+
+        with ThreadPoolExecutor(1) as pool:
+            leader = pool.submit(score_cache.cached_credit_score, self.customer, old_score)
+            self.assertTrue(started.wait(5))
+            score_cache.invalidate(self.customer.pk)
+            # Neither the thread's flight nor its cache lock is shared with
+            # a request made after the invalidation.
+            self.assertEqual(score_cache.cached_credit_score(self.customer, lambda customer: 90), 90)
+            release.set()
+            self.assertEqual(leader.result(), 10)
+        self.assertEqual(score_cache.cached_credit_score(self.customer, lambda customer: self.fail('not cached')), 90)
+        flights = score_cache.stats()['single_flight']
+        self.assertEqual((flights['computations'], flights['saved'], flights['wait_timeouts']), (2, 0, 0))
+
+    def test_waits_for_lock_held_by_another_process(self):
+        cache = score_cache.get_cache()
+        key = score_cache.score_key(cache, self.customer.pk)
+        cache.add(f'{key}:lock', 'other-process', timeout=5)
+
+        def other_process_finishes():
+            time.sleep(0.1)
+            cache.set(key, 55)
+            cache.delete(f'{key}:lock')
+
+        threading.Thread(target=other_process_finishes).start()
+        score = score_cache.cached_credit_score(self.customer, lambda customer: self.fail('computed twice'))
+        self.assertEqual(score, 55)
+        self.assertEqual(score_cache.stats()['single_flight']['coalesced_lock'], 1)
+        self.assertIn('credit_score_coalesced_total{source="lock"} 1', metrics.render())
+
+    @override_settings(SCORE_SINGLE_FLIGHT_WAIT=0.05)
+    def test_stuck_lock_times_out(self):
+        cache = score_cache.get_cache()
+        key = score_cache.score_key(cache, self.customer.pk)
+        cache.add(f'{key}:lock', 'dead-process', timeout=5)
+        self.assertEqual(score_cache.cached_credit_score(self.customer, lambda customer: 12), 12)
+        self.assertEqual(score_cache.stats()['single_flight']['wait_timeouts'], 1)
+
+    def test_async_misses_compute_once(self):
+        async def score(customer):
+            self.computed += 1
+            await asyncio.sleep(0.1)
+            return 64
+
+        async def main():
+            return await asyncio.gather(*(score_cache.acached_credit_score(self.customer, score) for _ in range(5)))
+
+        self.assertEqual(async_to_sync(main)(), [64] * 5)
+        self.assertEqual(self.computed, 1)
+        self.assertEqual(score_cache.stats()['single_flight']['saved'], 4)
+
+
+class RequestMetricsTestCase(LoanFixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        caches[settings.METRICS_CACHE_ALIAS].clear()
+
+    def server_timing(self, response):
+        return dict(re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing']))
+
+    def test_server_timing_header(self):
+        self.add_loan(1)
+        response = self.client.post(reverse('check-eligibility'), {
+            'customer_id': 1, 'loan_amount': 100000, 'interest_rate': 10, 'tenure': 12,
+        }, format='json')
+        timings = self.server_timing(response)
+        self.assertEqual(set(timings), {'db', 'scoring', 'serialize', 'total'})
+        self.assertGreaterEqual(float(timings['total']), float(timings['scoring']))
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    def test_metrics_endpoint_reports_routes(self):
+        self.client.get(reverse('view-loans', args=[1]))
+        self.client.get(reverse('view-loans', args=[1]))
+        self.client.get(reverse('view-loans', args=[2]))
+        body = self.client.get(reverse('metrics')).content.decode()
+        route = 'route="api/view-loans/<int:customer_id>",method="GET"'
+        self.assertIn(f'http_request_duration_seconds_count{{{route}}} 3', body)
+        self.assertIn(f'http_requests_total{{{route},status="404"}} 1', body)
+        self.assertIn(f'http_request_db_queries_bucket{{{route},le="+Inf"}} 3', body)
+        self.assertIn('# TYPE http_request_scoring_seconds histogram', body)
+        self.assertIn('credit_score_cache_misses_total', body)
+
+    def test_task_durations_reported(self):
+        ingest_customer_data(file_path=Path(settings.BASE_DIR) / 'customer_data.xlsx')
+        ingest_customer_data.delay(file_path=str(Path(settings.BASE_DIR) / 'customer_data.xlsx'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('celery_task_duration_seconds_count{task="loans.tasks.ingest_customer_data",outcome="success"} 1', body)
+
+
+class IngestionTestCase(TestCase):
+    def test_ingest_sample_workbooks(self):
+        customers = ingest_customer_data()
+        self.assertEqual(customers['inserted'], 300)
+        self.assertEqual(customers['failed'], 0)
+        self.assertEqual(Customer.objects.get(customer_id=1).age, 63)
+
+        with CaptureQueriesContext(connection) as queries:
+            loans = ingest_loan_data(batch_size=500)
+        self.assertEqual(loans['rows'], 782)
+        self.assertEqual(loans['inserted'], Loan.objects.count())
+        self.assertEqual(loans['inserted'] + loans['skipped'], 782)
+        self.assertLess(len(queries), 100)
+        self.assertEqual(verify_profiles(), [])
+
+        again = ingest_loan_data()
+        self.assertEqual(again['inserted'], 0)
+        self.assertEqual(again['skipped'], 782)
+
+    def test_conflict_modes(self):
+        rows = [(1, 'Ann', 'Lee', 30, '555', 50000, 1800000), (1, 'Dup', 'Row', 30, '555', 1, 1), ('x', 'Bad', 'Row')]
+        summary = ingest_customers(rows)
+        self.assertEqual((summary['inserted'], summary['skipped'], summary['failed']), (1, 1, 1))
+
+        loan = (1, 7, 100000, 12, 10, 8792, 0, '2024-01-01', '2025-01-01')
+        ingest_loans([loan, (2, 8) + loan[2:]])
+        self.assertEqual(CreditProfile.objects.get(customer__customer_id=1).active_exposure, 100000)
+
+        summary = ingest_loans([loan[:6] + (12,) + loan[7:]], on_conflict='update')
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual(Loan.objects.get(loan_id=7).emis_paid_on_time, 12)
+        self.assertEqual(verify_profiles(), [])
+
+        summary = ingest_customers([(1, 'Ann', 'Lee', 31, '555', 60000, 2200000)], on_conflict='update')
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual(Customer.objects.get(customer_id=1).age, 31)
+
+
+@override_settings(UPLOAD_SPOOL_DIR=tempfile.gettempdir())
+class UploadDataTestCase(APITestCase):
+    def upload(self, name, content):
+        upload = SimpleUploadedFile(name, content)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('upload-data'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        return self.client.get(response.data['status_url']).data
+
+    def test_csv_upload_runs_in_background_job(self):
+        customers = (
+            b'customer_id,first_name,last_name,age,phone_number,monthly_salary,approved_limit\n'
+            b'1,Ann,Lee,30,555,50000,1800000\n'
+            b'2,Bob,Ray,41,556,60000,2200000\n'
+            b'3,Bad,Row\n'
+        )
+        job = self.upload('customers.csv', customers)
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['kind'], 'customers')
+        self.assertEqual((job['rows_processed'], job['inserted'], job['failed']), (3, 2, 1))
+        self.assertEqual(Customer.objects.count(), 2)
+
+        loans = (
+            b'customer_id,loan_id,loan_amount,tenure,interest_rate,monthly_repayment,emis_paid_on_time,start_date,end_date\n'
+            b'1,10,100000,12,10,8792,3,2024-01-01,2025-01-01\n'
+            b'9,11,100000,12,10,8792,3,2024-01-01,2025-01-01\n'
+        )
+        job = self.upload('loans.csv', loans)
+        self.assertEqual(job['kind'], 'loans')
+        self.assertEqual((job['inserted'], job['skipped']), (1, 1))
+        self.assertEqual(verify_profiles(), [])
+        self.assertEqual(os.listdir(tempfile.gettempdir()).count(f"{job['job_id']}.csv"), 0)
+
+    def test_xlsx_upload(self):
+        with open(Path(settings.BASE_DIR) / 'customer_data.xlsx', 'rb') as workbook:
+            job = self.upload('customer_data.xlsx', workbook.read())
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['inserted'], 300)
+
+    def test_unrecognised_file_fails_job(self):
+        with self.assertRaises(ValueError):
+            self.upload('other.csv', b'a,b\n1,2\n')
+        job = UploadJob.objects.get()
+        self.assertEqual(job.status, UploadJob.FAILED)
+        response = self.client.get(reverse('upload-status', args=[job.id]))
+        self.assertEqual(response.data['status'], 'failed')
+
+    def test_unknown_job(self):
+        response = self.client.get(reverse('upload-status', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ShardedIngestionTestCase(TestCase):
+    def test_workflow_runs_customers_before_loans(self):
+        result = ingestion_workflow(shard_size=100, batch_size=40).apply_async()
+        summary = result.get()
+        self.assertEqual(summary['customers']['inserted'], 300)
+        self.assertEqual(summary['loans']['rows'], 782)
+        self.assertEqual(summary['loans']['inserted'], Loan.objects.count())
+        self.assertEqual(summary['loans']['failed'], 0)
+        self.assertEqual(verify_profiles(), [])
+
+        # Same outcome as a single sequential pass over each workbook.
+        sequential = ingest_loan_data()
+        self.assertEqual(sequential['inserted'], 0)
+        self.assertEqual(sequential['skipped'], 782)
+
+    def test_shard_ranges(self):
+        self.assertEqual(shard_ranges(2, 10), [(2, 2)])
+        self.assertEqual(shard_ranges(1, 10), [])
+        self.assertEqual(shard_ranges(25, 10), [(2, 11), (12, 21), (22, 25)])
+
+    def test_command_queues_workflow(self):
+        out = io.StringIO()
+        call_command('ingest_data', '--shard-size', '150', stdout=out)
+        self.assertIn('Data ingestion queued', out.getvalue())
+        self.assertEqual(Customer.objects.count(), 300)
+        self.assertGreater(Loan.objects.count(), 0)
+
+
+class IncrementalSyncTestCase(TestCase):
+    def write_csv(self, name, columns, rows):
+        path = Path(self.directory.name) / name
+        with open(path, 'w', newline='') as handle:
+            csv.writer(handle).writerows([columns, *rows])
+        return path
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_unchanged_workbooks_are_skipped(self):
+        out = io.StringIO()
+        call_command('ingest_data', stdout=out)
+        self.assertEqual(Customer.objects.count(), 300)
+        self.assertEqual(verify_profiles(), [])
+        loans = Loan.objects.count()
+
+        with CaptureQueriesContext(connection) as queries:
+            summary = sync_workflow().apply_async().get()
+        self.assertEqual(summary['file'], 'unchanged')
+        self.assertEqual(summary['rows'], 0)
+        self.assertLess(len(queries), 10)
+        self.assertEqual(Loan.objects.count(), loans)
+
+    def test_applies_only_changed_rows(self):
+        customers = [(1, 'Ann', 'Lee', 30, '555', 50000, 1800000), (2, 'Bob', 'Ray', 41, '556', 60000, 2200000), (3, 'Cy', 'Orr', 52, '557', 40000, 1400000)]
+        path = self.write_csv('customers.csv', ingestion.CUSTOMER_COLUMNS, customers)
+        summary = ingestion.sync_file('customers', path)
+        self.assertEqual((summary['inserted'], summary['unchanged']), (3, 0))
+
+        loan = (1, 7, 100000, 12, 10, 8792, 0, '2024-01-01', '2025-01-01')
+        loans = self.write_csv('loans.csv', ingestion.LOAN_COLUMNS, [loan, (3, 8) + loan[2:]])
+        ingestion.sync_file('loans', loans)
+        self.assertEqual(CreditProfile.objects.get(customer__customer_id=3).loan_count, 1)
+
+        self.write_csv('customers.csv', ingestion.CUSTOMER_COLUMNS, [customers[0], (2, 'Bob', 'Ray', 42, '556', 60000, 2200000), (4, 'Di', 'Ng', 25, '558', 30000, 1100000)])
+        summary = ingestion.sync_file('customers', path)
+        self.assertEqual(
+            (summary['inserted'], summary['updated'], summary['unchanged'], summary['deleted']), (1, 1, 1, 1),
+        )
+        self.assertEqual(Customer.objects.get(customer_id=2).age, 42)
+        self.assertFalse(Customer.objects.filter(customer_id=3).exists())
+        self.assertFalse(Loan.objects.filter(loan_id=8).exists())
+
+        self.write_csv('loans.csv', ingestion.LOAN_COLUMNS, [loan[:6] + (12,) + loan[7:]])
+        summary = ingestion.sync_file('loans', loans)
+        self.assertEqual((summary['updated'], summary['deleted']), (1, 1))
+        self.assertEqual(Loan.objects.get(loan_id=7).emis_paid_on_time, 12)
+        self.assertEqual(verify_profiles(), [])
+
+    def test_crashed_run_resumes_from_checkpoint(self):
+        rows = [(number, 'First', 'Last', 30, '555', 50000, 1800000) for number in range(1, 26)]
+        path = self.write_csv('customers.csv', ingestion.CUSTOMER_COLUMNS, rows)
+
+        def crash(summary):
+            if summary['inserted'] == 20:
+                raise RuntimeError('worker lost')
+
+        with self.assertRaises(RuntimeError):
+            ingestion.sync_file('customers', path, batch_size=10, on_batch=crash)
+        self.assertEqual(Customer.objects.count(), 20)
+
+        with mock.patch.object(ingestion.CustomerWriter, 'write', autospec=True, side_effect=ingestion.CustomerWriter.write) as write:
+            summary = ingestion.sync_file('customers', path, batch_size=10)
+        self.assertEqual(summary['resumed_from'], 22)
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual((summary['rows'], summary['inserted'], summary['deleted']), (25, 25, 0))
+        self.assertEqual(Customer.objects.count(), 25)
+        self.assertEqual(ingestion.sync_file('customers', path)['file'], 'unchanged')
+
+    def test_failed_rows_keep_file_unsynced(self):
+        path = self.write_csv('customers.csv', ingestion.CUSTOMER_COLUMNS, [(1, 'Ann', 'Lee', 30, '555', 50000, 1800000), ('x', 'Bad')])
+        summary = ingestion.sync_file('customers', path)
+        self.assertEqual((summary['inserted'], summary['failed']), (1, 1))
+        again = ingestion.sync_file('customers', path)
+        self.assertEqual((again['file'], again['unchanged'], again['inserted']), ('changed', 1, 0))
+
+    def test_loan_waits_for_its_customer(self):
+        ann = (1, 'Ann', 'Lee', 30, '555', 50000, 1800000)
+        customers = self.write_csv('customers.csv', ingestion.CUSTOMER_COLUMNS, [ann])
+        ingestion.sync_file('customers', customers)
+        loan = (1, 7, 100000, 12, 10, 8792, 0, '2024-01-01', '2025-01-01')
+        loans = self.write_csv('loans.csv', ingestion.LOAN_COLUMNS, [loan, (2, 8) + loan[2:]])
+        summary = ingestion.sync_file('loans', loans)
+        self.assertEqual((summary['inserted'], summary['failed']), (1, 1))
+        self.assertEqual(summary['errors'], ['loan_id 8: customer 2 does not exist'])
+        self.assertTrue(ingestion.needs_sync(loans))
+
+        self.write_csv('customers.csv', ingestion.CUSTOMER_COLUMNS, [ann, (2, 'Bob', 'Ray', 41, '556', 60000, 2200000)])
+        ingestion.sync_file('customers', customers)
+        summary = ingestion.sync_file('loans', loans)
+        self.assertEqual((summary['inserted'], summary['unchanged'], summary['failed']), (1, 1, 0))
+        self.assertEqual(Loan.objects.get(loan_id=8).customer.customer_id, 2)
+        self.assertFalse(ingestion.needs_sync(loans))
+        self.assertEqual(verify_profiles(), [])
+
+
+class StartupTestCase(TestCase):
+    def test_parse_importtime(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       300 |        300 |     openpyxl.cell\n'
+            'import time:       200 |        500 |   openpyxl\n'
+            'import time:       100 |        700 | loans.ingestion\n'
+        )
+        entries = startup.parse_importtime(output)
+        self.assertEqual([entry['imported_by'] for entry in entries], ['openpyxl', 'loans.ingestion', None])
+        report = startup.import_report(entries)
+        self.assertEqual((report['total_ms'], report['project_ms']), (0.6, 0.1))
+        self.assertEqual([entry['module'] for entry in report['dependencies']], ['openpyxl'])
+
+    def test_web_imports_defer_openpyxl(self):
+        out = io.StringIO()
+        call_command('profile_imports', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        modules = {entry['module'] for entry in report['modules']}
+        self.assertIn('loans.views', modules)
+        self.assertNotIn('openpyxl', {entry['module'] for entry in report['dependencies']})
+
+    @mock.patch.dict(os.environ, {'DJANGO_SUPERUSER_USERNAME': 'admin', 'DJANGO_SUPERUSER_PASSWORD': 'secret', 'DJANGO_SUPERUSER_EMAIL': 'admin@example.com'})
+    def test_boot_skips_finished_steps(self):
+        out = io.StringIO()
+        call_command('boot', stdout=out)
+        self.assertIn('migrate: skipped', out.getvalue())
+        self.assertIn('superuser: created admin', out.getvalue())
+        self.assertIn('ingest: queued', out.getvalue())
+        self.assertEqual(Customer.objects.count(), 300)
+
+        out = io.StringIO()
+        call_command('boot', stdout=out)
+        self.assertIn('superuser: skipped', out.getvalue())
+        self.assertIn('ingest: skipped', out.getvalue())
+
+
+class QueryPlanTestCase(APITestCase):
+    """EXPLAIN every read query behind the hot endpoints on a seeded dataset
+    and fail if one of them falls back to a full scan of a loans table."""
+
+    customers = 200
+    loans_per_customer = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        Customer.objects.bulk_create(
+            Customer(
+                customer_id=number, first_name='Seed', last_name=str(number), age=30,
+                monthly_salary=50000, approved_limit=1800000, phone_number='1'
+            )
+            for number in range(1, cls.customers + 1)
+        )
+        customer_pks = list(Customer.objects.values_list('id', flat=True))
+        Loan.objects.bulk_create(
+            Loan(
+                customer_id=customer_pk, loan_id=customer_pk * 100 + number,
+                loan_amount=100000, tenure=24, interest_rate=10, monthly_repayment=4614,
+                emis_paid_on_time=number * 3, start_date=datetime.date(2015 + number, 1, 1),
+                end_date=datetime.date(2017 + number, 1, 1)
+            )
+            for customer_pk in customer_pks
+            for number in range(cls.loans_per_customer)
+        )
+        rebuild_profiles()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        score_cache.get_cache().clear()
+
+    def explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def full_scans(self, plan):
+        if connection.vendor == 'sqlite':
+            pattern = r'\bSCAN (loans_\w+)(?! USING (?:COVERING )?INDEX \w+ \()'
+        else:
+            pattern = r'Seq Scan on (loans_\w+)'
+        return re.findall(pattern, plan)
+
+    def assertIndexedPlans(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertLess(response.status_code, 300)
+        selects = [query['sql'] for query in queries if query['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            plan = self.explain(sql)
+            self.assertEqual(self.full_scans(plan), [], f'{sql}\n{plan}')
+
+    def test_check_eligibility(self):
+        data = {'customer_id': 7, 'loan_amount': 100000, 'interest_rate': 10, 'tenure': 12}
+        self.assertIndexedPlans(lambda: self.client.post(reverse('check-eligibility'), data, format='json'))
+
+    def test_check_eligibility_batch(self):
+        items = [{'customer_id': number, 'loan_amount': 100000, 'interest_rate': 10, 'tenure': 12} for number in (3, 50, 120)]
+        self.assertIndexedPlans(lambda: self.client.post(reverse('check-eligibility-batch'), items, format='json'))
+
+    def test_aggregate_score(self):
+        customer = Customer.objects.get(customer_id=9)
+        CreditProfile.objects.filter(pk=customer.pk).delete()
+        self.assertIndexedPlans(lambda: self.client.post(
+            reverse('check-eligibility'),
+            {'customer_id': 9, 'loan_amount': 1000, 'interest_rate': 10, 'tenure': 12}, format='json'
+        ))
+
+    def test_view_loan(self):
+        loan_id = Loan.objects.values_list('loan_id', flat=True)[5]
+        self.assertIndexedPlans(lambda: self.client.get(reverse('view-loan', args=[loan_id])))
+
+    def test_view_loans(self):
+        self.assertIndexedPlans(lambda: self.client.get(reverse('view-loans', args=[42])))
+
+    def test_track_loans(self):
+        self.assertIndexedPlans(lambda: self.client.post(reverse('track-loans'), {'customer_id': 42}, format='json'))
+
+    def test_view_loans_page(self):
+        self.assertIndexedPlans(lambda: self.client.get(reverse('view-loans', args=[42]), {'limit': 2, 'cursor': 1}))
+
+    def test_active_loans_use_partial_index(self):
+        active = Loan.objects.filter(customer_id=3, emis_paid_on_time__lt=models.F('tenure'))
+        plan = self.explain(str(active.values('loan_amount').query))
+        self.assertEqual(self.full_scans(plan), [], plan)
+        if connection.vendor == 'sqlite':
+            self.assertIn('loan_active_customer_idx', plan)
+
+
+class SyntheticPortfolioTestCase(TestCase):
+    def test_generation_is_reproducible(self):
+        first = list(generate_portfolio(50, 'uniform:0-4', seed=7, chunk_size=20))
+        second = list(generate_portfolio(50, 'uniform:0-4', seed=7, chunk_size=20))
+        self.assertEqual(first, second)
+        customers = [row for chunk, _ in first for row in chunk]
+        loans = [row for _, chunk in first for row in chunk]
+        self.assertEqual([row[0] for row in customers], list(range(1, 51)))
+        self.assertEqual([row[1] for row in loans], list(range(1, len(loans) + 1)))
+        self.assertNotEqual(first, list(generate_portfolio(50, 'uniform:0-4', seed=8, chunk_size=20)))
+
+    def test_distributions(self):
+        rng = np.random.default_rng(0)
+        self.assertTrue((loan_counts(rng, 10, 'fixed:2') == 2).all())
+        self.assertTrue(set(loan_counts(rng, 500, 'uniform:1-3')) <= {1, 2, 3})
+        self.assertAlmostEqual(loan_counts(rng, 20000, 'geometric:3').mean(), 3, delta=0.2)
+        with self.assertRaises(ValueError):
+            parse_distribution('normal:3')
+
+    def test_files_round_trip_through_ingestion(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format in ('xlsx', 'csv'):
+                call_command(
+                    'generate_portfolio', '--customers', '30', '--loans', 'fixed:2',
+                    '--format', file_format, '--output', directory, stdout=io.StringIO(),
+                )
+            customers = ingest_customer_data(file_path=Path(directory) / 'customer_data.xlsx')
+            loans = ingest_loan_data(file_path=Path(directory) / 'loan_data.xlsx')
+            self.assertEqual((customers['inserted'], loans['inserted']), (30, 60))
+            with open(Path(directory) / 'loan_data.csv') as handle:
+                self.assertEqual(len(handle.readlines()), 61)
+
+    def test_generate_into_database(self):
+        call_command('generate_portfolio', '--customers', '25', '--loans', 'fixed:3', stdout=io.StringIO())
+        self.assertEqual(Customer.objects.count(), 25)
+        self.assertEqual(Loan.objects.count(), 75)
+        self.assertEqual(verify_profiles(), [])
+
+    def test_benchmark_report(self):
+        with override_settings(UPLOAD_SPOOL_DIR=tempfile.gettempdir()):
+            report = run_benchmarks([10], repeat=2, ingest_repeat=1, serializer_count=100, cold_starts=1)
+        names = {row['benchmark'] for row in report['results']}
+        self.assertIn('cold-start:first_response', names)
+        self.assertIn('ingest_loan_data', names)
+        self.assertIn('calculate_credit_score[cold]', names)
+        self.assertIn('view:check-eligibility', names)
+        self.assertIn('serialize:loan_row+orjson[100]', names)
+        for row in report['results']:
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        comparison = compare_results(report, report)
+        self.assertTrue(all(ratio in (1.0, None) for *_, ratio in comparison))
@@ -1,19 +1,46 @@
+from django.conf import settings
 from django.urls import path
 from django.shortcuts import render
-from .views import RegisterCustomer, CheckEligibility, CreateLoan, ViewLoan, ViewLoans, ViewLoanForm, ViewLoansForm, UploadData, TrackLoans
+from . import async_views
+from .views import RegisterCustomer, RegisterCustomerBulk, CheckEligibility, CheckEligibilityBatch, OfferGrid, CreateLoan, ViewLoan, ViewLoans, ViewLoanForm, ViewLoansForm, UploadData, UploadStatus, TrackLoans, ScoreCacheStats, export_data, PortfolioAnalytics, ScoreHistory, RescoreRunStatus
 
 def api_home(request):
     return render(request, 'api.html')
 
-urlpatterns = [
-    path('', api_home, name='api_home'),
-    path('register', RegisterCustomer.as_view(), name='register'),
-    path('check-eligibility', CheckEligibility.as_view(), name='check-eligibility'),
-    path('create-loan', CreateLoan.as_view(), name='create-loan'),
-    path('view-loan', ViewLoanForm.as_view(), name='view-loan-form'),
-    path('view-loan/<int:loan_id>', ViewLoan.as_view(), name='view-loan'),
-    path('view-loans', ViewLoansForm.as_view(), name='view-loans-form'),
-    path('view-loans/<int:customer_id>', ViewLoans.as_view(), name='view-loans'),
-    path('track-loans', TrackLoans.as_view(), name='track-loans'),
-    path('upload-data', UploadData.as_view(), name='upload-data'),
-]
\ No newline at end of file
+def build_urlpatterns(async_reads=False):
+    """The API routes, with the read endpoints served by ``async_views`` if ``async_reads``."""
+    if async_reads:
+        check_eligibility = async_views.check_eligibility
+        view_loan = async_views.view_loan
+        view_loans = async_views.view_loans
+        track_loans = async_views.track_loans
+    else:
+        check_eligibility = CheckEligibility.as_view()
+        view_loan = ViewLoan.as_view()
+        view_loans = ViewLoans.as_view()
+        track_loans = TrackLoans.as_view()
+
+    return [
+        path('', api_home, name='api_home'),
+        path('register', RegisterCustomer.as_view(), name='register'),
+        path('register/bulk', RegisterCustomerBulk.as_view(), name='register-bulk'),
+        path('check-eligibility', check_eligibility, name='check-eligibility'),
+        path('check-eligibility/batch', CheckEligibilityBatch.as_view(), name='check-eligibility-batch'),
+        path('offers/<int:customer_id>', OfferGrid.as_view(), name='offers'),
+        path('create-loan', CreateLoan.as_view(), name='create-loan'),
+        path('view-loan', ViewLoanForm.as_view(), name='view-loan-form'),
+        path('view-loan/<int:loan_id>', view_loan, name='view-loan'),
+        path('view-loans', ViewLoansForm.as_view(), name='view-loans-form'),
+        path('view-loans/<int:customer_id>', view_loans, name='view-loans'),
+        path('track-loans', track_loans, name='track-loans'),
+        path('upload-data', UploadData.as_view(), name='upload-data'),
+        path('upload-data/<uuid:job_id>', UploadStatus.as_view(), name='upload-status'),
+        path('score-cache/stats', ScoreCacheStats.as_view(), name='score-cache-stats'),
+        path('score-history/<int:customer_id>', ScoreHistory.as_view(), name='score-history'),
+        path('rescore-runs/<uuid:run_id>', RescoreRunStatus.as_view(), name='rescore-run'),
+        path('export/<slug:kind>', export_data, name='export'),
+        path('analytics/portfolio', PortfolioAnalytics.as_view(), name='analytics-portfolio'),
+    ]
+
+
+urlpatterns = build_urlpatterns(settings.ASYNC_READ_VIEWS)
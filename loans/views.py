@@ -1,52 +1,93 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import models
+from rest_framework.parsers import JSONParser
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 from django.shortcuts import render
-from .models import Customer, Loan
-from .serializers import CustomerSerializer, LoanSerializer, LoanListSerializer
+from django.views.decorators.http import require_GET
+from . import amortization, analytics, exports, metrics, offers, rescoring, score_cache
+from .ids import bulk_create_new, customer_ids, save_new
+from .listing import InvalidPage, list_loans
+from .models import Customer, Loan, RescoreRun, UploadJob, to_money
+from .parsers import NDJSONParser
+from .serializers import customer_data, loan_data
+from .profiles import exposure, profile_credit_score
+from .scoring import batch_credit_scores, loan_decision
+from .tasks import process_upload
+from pathlib import Path
+import hashlib
 import math
-import openpyxl
-import csv
-import io
-import decimal
-import datetime
+import uuid
 
 
+@metrics.timed('scoring')
 def calculate_credit_score(customer):
-    loans = Loan.objects.filter(customer=customer)
-    if not loans.exists():
-        return 100
-
-    current_loans = loans.filter(emis_paid_on_time__lt=models.F('tenure'))
-    current_loan_sum = current_loans.aggregate(sum=models.Sum('loan_amount'))['sum'] or 0
-    if current_loan_sum > customer.approved_limit:
-        return 0
-
-    current_emis_sum = current_loans.aggregate(sum=models.Sum('monthly_repayment'))['sum'] or 0
-    if current_emis_sum > decimal.Decimal('0.5') * customer.monthly_salary:
-        return 0
-
-    total_emis = sum(l.tenure for l in loans)
-    paid_on_time = sum(l.emis_paid_on_time for l in loans)
-    paid_ratio = paid_on_time / total_emis if total_emis > 0 else 1
-
-    no_loans = loans.count()
-    current_year = timezone.now().year
-    current_year_loans = loans.filter(start_date__year=current_year).count()
-    volume = loans.aggregate(sum=models.Sum('loan_amount'))['sum'] or 0
-
-    score = min(100, (paid_ratio * 40) + min(no_loans * 5, 20) + min(current_year_loans * 10, 20) + min(volume / 100000, 20))
-    return int(score)
+    return score_cache.cached_credit_score(customer, profile_credit_score)
 
 
 def calculate_emi(loan_amount, interest_rate, tenure):
-    if interest_rate == 0:
-        return loan_amount / tenure
-    r = interest_rate / 12 / 100
-    emi = (loan_amount * r * (1 + r) ** tenure) / ((1 + r) ** tenure - 1)
-    return emi
+    return float(amortization.emi(loan_amount, interest_rate, tenure))
+
+
+def parse_number(value):
+    if isinstance(value, bool):
+        raise TypeError('boolean is not a number')
+    if isinstance(value, (int, float)):
+        return value
+    return float(value)
+
+
+def parse_application(item):
+    customer_id = item.get('customer_id') if isinstance(item, dict) else None
+    try:
+        application = {
+            'customer_id': int(customer_id),
+            'loan_amount': parse_number(item['loan_amount']),
+            'interest_rate': parse_number(item['interest_rate']),
+            'tenure': int(item['tenure']),
+        }
+    except (KeyError, TypeError, ValueError):
+        return {'customer_id': customer_id, 'error': 'customer_id, loan_amount, interest_rate and tenure are required numbers'}
+    if application['loan_amount'] <= 0 or application['interest_rate'] < 0 or application['tenure'] <= 0:
+        return {'customer_id': customer_id, 'error': 'loan_amount and tenure must be positive and interest_rate non-negative'}
+    return application
+
+
+def approved_limit_for(monthly_income):
+    return round(36 * monthly_income / 100000) * 100000
+
+
+def parse_applicant(item):
+    if not isinstance(item, dict):
+        return {'error': 'Expected an object'}
+    try:
+        applicant = {
+            'first_name': str(item['first_name']).strip(),
+            'last_name': str(item['last_name']).strip(),
+            'age': int(item['age']),
+            'monthly_salary': to_money(parse_number(item['monthly_income'])),
+            'phone_number': str(item['phone_number']).strip(),
+        }
+    except (KeyError, TypeError, ValueError, ArithmeticError):
+        return {'error': 'first_name, last_name, age, monthly_income and phone_number are required'}
+    if not applicant['first_name'] or not applicant['last_name']:
+        return {'error': 'first_name and last_name must not be empty'}
+    if len(applicant['first_name']) > 100 or len(applicant['last_name']) > 100 or len(applicant['phone_number']) > 15:
+        return {'error': 'Names are limited to 100 characters and phone_number to 15'}
+    if applicant['age'] < 18:
+        return {'error': 'Age must be at least 18'}
+    if applicant['monthly_salary'] <= 0:
+        return {'error': 'monthly_income must be positive'}
+    applicant['approved_limit'] = approved_limit_for(applicant['monthly_salary'])
+    return applicant
 
 
 class RegisterCustomer(APIView):
@@ -63,21 +104,48 @@ class RegisterCustomer(APIView):
         if int(age) < 18:
             return Response({'error': 'Age must be at least 18'}, status=status.HTTP_400_BAD_REQUEST)
 
-        approved_limit = round(36 * monthly_income / 100000) * 100000
-
-        customer = Customer.objects.create(
+        # customer_id is allocated before the insert (see loans.ids).
+        customer = save_new(Customer(
             first_name=first_name,
             last_name=last_name,
             age=age,
             monthly_salary=monthly_income,
-            approved_limit=approved_limit,
+            approved_limit=approved_limit_for(monthly_income),
             phone_number=phone_number
-        )
-        customer.customer_id = customer.id
-        customer.save()
+        ))
+
+        return Response(customer_data(customer), status=status.HTTP_201_CREATED)
+
 
-        serializer = CustomerSerializer(customer)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+class RegisterCustomerBulk(APIView):
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            return Response({'error': 'Expected a list of applicants'}, status=status.HTTP_400_BAD_REQUEST)
+        max_items = settings.REGISTER_BULK_MAX_ITEMS
+        if len(items) > max_items:
+            return Response({'error': f'At most {max_items} applicants per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        applicants = [parse_applicant(item) for item in items]
+        valid = [applicant for applicant in applicants if 'error' not in applicant]
+        customers = [
+            Customer(customer_id=customer_id, **applicant)
+            for customer_id, applicant in zip(customer_ids.take(len(valid)), valid)
+        ]
+        bulk_create_new(Customer, customers, batch_size=settings.INGEST_BATCH_SIZE)
+
+        created = map(customer_data, customers)
+        results = [
+            {'index': index, 'error': applicant['error']} if 'error' in applicant else next(created)
+            for index, applicant in enumerate(applicants)
+        ]
+        return Response({
+            'created': len(customers),
+            'failed': len(applicants) - len(customers),
+            'results': results,
+        }, status=status.HTTP_201_CREATED if customers else status.HTTP_400_BAD_REQUEST)
 
 
 class CheckEligibility(APIView):
@@ -96,19 +164,7 @@ class CheckEligibility(APIView):
             return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
 
         score = calculate_credit_score(customer)
-        approval = False
-        corrected_interest_rate = interest_rate
-
-        if score > 50:
-            approval = True
-        elif 30 < score <= 50:
-            approval = True
-            corrected_interest_rate = max(interest_rate, 12)
-        elif 10 < score <= 30:
-            approval = True
-            corrected_interest_rate = max(interest_rate, 16)
-        else:
-            approval = False
+        approval, corrected_interest_rate = loan_decision(score, interest_rate)
 
         monthly_installment = calculate_emi(loan_amount, corrected_interest_rate, tenure)
 
@@ -122,6 +178,78 @@ class CheckEligibility(APIView):
         })
 
 
+class CheckEligibilityBatch(APIView):
+    def post(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            return Response({'error': 'Expected a list of applications'}, status=status.HTTP_400_BAD_REQUEST)
+        max_items = settings.ELIGIBILITY_BATCH_MAX_ITEMS
+        if len(items) > max_items:
+            return Response({'error': f'At most {max_items} applications per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        applications = [parse_application(item) for item in items]
+        with metrics.timed('scoring'):
+            scores = batch_credit_scores({app['customer_id'] for app in applications if 'error' not in app})
+
+        results = []
+        for app in applications:
+            if 'error' in app:
+                results.append(app)
+                continue
+            customer_id = app['customer_id']
+            if customer_id not in scores:
+                results.append({'customer_id': customer_id, 'error': 'Customer not found'})
+                continue
+            interest_rate = app['interest_rate']
+            approval, corrected_interest_rate = loan_decision(scores[customer_id], interest_rate)
+            results.append({
+                'customer_id': customer_id,
+                'approval': approval,
+                'interest_rate': interest_rate,
+                'corrected_interest_rate': corrected_interest_rate,
+                'tenure': app['tenure'],
+                'monthly_installment': calculate_emi(app['loan_amount'], corrected_interest_rate, app['tenure']),
+            })
+        return Response({'results': results})
+
+
+class OfferGrid(APIView):
+    def get(self, request, customer_id):
+        try:
+            axes = offers.grid_axes(request.query_params)
+        except offers.InvalidGrid as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            customer = Customer.objects.get(customer_id=customer_id)
+        except Customer.DoesNotExist:
+            return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        score = calculate_credit_score(customer)
+        active_exposure, active_emi_sum = exposure(customer.pk)
+        grid = offers.offer_grid(
+            score, *axes, active_exposure, active_emi_sum, customer.approved_limit, customer.monthly_salary,
+        )
+        loan_amount, tenure, interest_rate = axes
+        return Response({
+            'customer_id': customer_id,
+            'credit_score': score,
+            'loan_amount': loan_amount.tolist(),
+            'tenure': tenure.tolist(),
+            'interest_rate': interest_rate.tolist(),
+            **{name: values.tolist() for name, values in grid.items()},
+        })
+
+
+def exposure_check(customer, loan_amount, monthly_installment):
+    """Why a new loan would overstretch the customer, or '' if it fits."""
+    active_exposure, active_emi_sum = exposure(customer.pk)
+    if active_exposure + to_money(loan_amount) > customer.approved_limit:
+        return 'Loan amount exceeds approved limit'
+    if active_emi_sum + to_money(monthly_installment) > customer.monthly_salary / 2:
+        return 'Monthly installments would exceed 50% of monthly salary'
+    return ''
+
+
 class CreateLoan(APIView):
     def get(self, request):
         return render(request, 'create_loan.html')
@@ -132,40 +260,41 @@ class CreateLoan(APIView):
         interest_rate = request.data.get('interest_rate')
         tenure = request.data.get('tenure')
 
-        try:
-            customer = Customer.objects.get(customer_id=customer_id)
-        except Customer.DoesNotExist:
-            return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+        # Applications for the same customer are decided one at a time under
+        # the customer's row lock, so parallel requests cannot each pass the
+        # limit checks and together exceed them.
+        with transaction.atomic():
+            try:
+                customer = Customer.objects.select_for_update().get(customer_id=customer_id)
+            except Customer.DoesNotExist:
+                return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        score = calculate_credit_score(customer)
-        approval = False
-        corrected_interest_rate = interest_rate
-        message = ''
-
-        if score > 50:
-            approval = True
-        elif 30 < score <= 50:
-            approval = True
-            corrected_interest_rate = max(interest_rate, 12)
-        elif 10 < score <= 30:
-            approval = True
-            corrected_interest_rate = max(interest_rate, 16)
-        else:
-            approval = False
-            message = 'Credit score too low'
+            score = calculate_credit_score(customer)
+            approval, corrected_interest_rate = loan_decision(score, interest_rate)
+            message = '' if approval else 'Credit score too low'
+
+            if approval:
+                monthly_installment = calculate_emi(loan_amount, corrected_interest_rate, tenure)
+                message = exposure_check(customer, loan_amount, monthly_installment)
+                approval = not message
+
+            if approval:
+                # The post_save signal adds the loan to the profile counters.
+                loan = save_new(Loan(
+                    customer=customer,
+                    loan_amount=to_money(loan_amount),
+                    tenure=tenure,
+                    interest_rate=corrected_interest_rate,
+                    monthly_repayment=to_money(monthly_installment),
+                    emis_paid_on_time=0,
+                    start_date=timezone.now().date(),
+                    end_date=timezone.now().date() + timezone.timedelta(days=tenure*30)
+                ))
+                Customer.objects.filter(pk=customer.pk).update(
+                    current_debt=F('current_debt') + to_money(loan_amount), updated_at=timezone.now(),
+                )
 
         if approval:
-            monthly_installment = calculate_emi(loan_amount, corrected_interest_rate, tenure)
-            loan = Loan.objects.create(
-                customer=customer,
-                loan_amount=loan_amount,
-                tenure=tenure,
-                interest_rate=corrected_interest_rate,
-                monthly_repayment=monthly_installment,
-                emis_paid_on_time=0,
-                start_date=timezone.now().date(),
-                end_date=timezone.now().date() + timezone.timedelta(days=tenure*30)
-            )
             return Response({
                 'loan_id': loan.loan_id,
                 'customer_id': customer_id,
@@ -181,41 +310,151 @@ class CreateLoan(APIView):
             })
 
 
+class ScoreCacheStats(APIView):
+    def get(self, request):
+        return Response(score_cache.stats())
+
+
+class PortfolioAnalytics(APIView):
+    def get(self, request):
+        dimension = request.query_params.get('dimension')
+        if dimension is None:
+            dimensions = analytics.DIMENSIONS
+        elif dimension in analytics.DIMENSIONS:
+            dimensions = (dimension,)
+        else:
+            return Response(
+                {'error': f"dimension must be one of {', '.join(analytics.DIMENSIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(analytics.portfolio_summary(dimensions))
+
+
+class ScoreHistory(APIView):
+    def get(self, request, customer_id):
+        customer_pk = Customer.objects.filter(customer_id=customer_id).values_list('pk', flat=True).first()
+        if customer_pk is None:
+            return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+        since = request.query_params.get('since')
+        if since is not None:
+            since = parse_date(since)
+            if since is None:
+                return Response({'error': 'since must be a date (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        history, band_changes = rescoring.score_history(customer_pk, since)
+        return Response({'customer_id': customer_id, 'history': history, 'band_changes': band_changes})
+
+
+class RescoreRunStatus(APIView):
+    def get(self, request, run_id):
+        try:
+            run = RescoreRun.objects.get(pk=run_id)
+        except RescoreRun.DoesNotExist:
+            return Response({'error': 'Rescore run not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        chunks = run.chunks.aggregate(total=Count('pk'), done=Count('pk', filter=Q(done=True)), scored=Sum('scored', default=0))
+        if run.status == RescoreRun.RUNNING:
+            run.customers = chunks['scored']
+        return Response({
+            'run_id': str(run.id),
+            'status': run.status,
+            'chunks': chunks['total'],
+            'chunks_done': chunks['done'],
+            'customers': run.customers,
+            'customers_per_second': run.customers_per_second(timezone.now()),
+            'band_changes': rescoring.band_changes(run).count(),
+            'started_at': run.started_at,
+            'finished_at': run.finished_at,
+        })
+
+
+@require_GET
+def export_data(request, kind):
+    try:
+        chunks, content_type, filename = exports.export_stream(kind, request.GET)
+    except exports.InvalidExport as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def prometheus_metrics(request):
+    task_names = sorted(name for name in current_app.tasks if name.startswith(metrics.TASK_PREFIX))
+    return HttpResponse(metrics.render(task_names), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class ViewLoanForm(APIView):
     def get(self, request):
         return render(request, 'view_loan.html')
 
 
+def loan_validators(loan):
+    """ETag and Last-Modified of a loan response, which shows the loan and its customer."""
+    stamp = f'{loan.pk}:{loan.updated_at.isoformat()}:{loan.customer.updated_at.isoformat()}'
+    etag = quote_etag(hashlib.md5(stamp.encode(), usedforsecurity=False).hexdigest())
+    return etag, max(loan.updated_at, loan.customer.updated_at)
+
+
+def is_not_modified(request, etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+        return '*' in etags or etag in etags
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(last_modified.timestamp()) <= since
+
+
+def precondition_response(request, etag, last_modified):
+    """The 412 or 304 response that the request's conditional headers call for, or None.
+
+    If-Match is checked for every method. 304 is only defined for GET and
+    HEAD (RFC 9110 15.4.5), so a POST to track-loans always gets the loan.
+    """
+    if_match = request.headers.get('If-Match')
+    if if_match and not {'*', etag} & set(parse_etags(if_match)):
+        return JsonResponse({'error': 'Precondition failed'}, status=412)
+    if request.method in ('GET', 'HEAD') and is_not_modified(request, etag, last_modified):
+        return HttpResponseNotModified()
+    return None
+
+
+def loan_detail_response(request, loan_id):
+    try:
+        loan = Loan.objects.select_related('customer').get(loan_id=loan_id)
+    except Loan.DoesNotExist:
+        return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    etag, last_modified = loan_validators(loan)
+    response = precondition_response(request, etag, last_modified)
+    if response is None:
+        response = Response(loan_data(loan))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
 class ViewLoan(APIView):
     def get(self, request, loan_id):
-        try:
-            loan = Loan.objects.get(loan_id=loan_id)
-        except Loan.DoesNotExist:
-            return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+        return loan_detail_response(request, loan_id)
+
 
-        serializer = LoanSerializer(loan)
-        return Response(serializer.data)
+def customer_loans_response(customer_id, params):
+    customer_pk = Customer.objects.filter(customer_id=customer_id).values_list('pk', flat=True).first()
+    if customer_pk is None:
+        return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        data = list_loans(customer_pk, params)
+    except InvalidPage as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    if isinstance(data, StreamingHttpResponse):
+        return data
+    return Response(data)
 
 
 class ViewLoans(APIView):
     def get(self, request, customer_id):
-        try:
-            customer = Customer.objects.get(customer_id=customer_id)
-        except Customer.DoesNotExist:
-            return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
-
-        loans = Loan.objects.filter(customer=customer)
-        data = []
-        for loan in loans:
-            repayments_left = loan.tenure - loan.emis_paid_on_time
-            data.append({
-                'loan_id': loan.loan_id,
-                'loan_amount': loan.loan_amount,
-                'interest_rate': loan.interest_rate,
-                'monthly_installment': loan.monthly_repayment,
-                'repayments_left': repayments_left
-            })
-        return Response(data)
+        return customer_loans_response(customer_id, request.query_params)
 
 
 class ViewLoansForm(APIView):
@@ -233,31 +472,11 @@ class TrackLoans(APIView):
 
         if loan_id:
             # Track specific loan
-            try:
-                loan = Loan.objects.get(loan_id=loan_id)
-                serializer = LoanSerializer(loan)
-                return Response(serializer.data)
-            except Loan.DoesNotExist:
-                return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+            return loan_detail_response(request, loan_id)
         elif customer_id:
             # Track all loans for customer
-            try:
-                customer = Customer.objects.get(customer_id=customer_id)
-            except Customer.DoesNotExist:
-                return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
-
-            loans = Loan.objects.filter(customer=customer)
-            data = []
-            for loan in loans:
-                repayments_left = loan.tenure - loan.emis_paid_on_time
-                data.append({
-                    'loan_id': loan.loan_id,
-                    'loan_amount': loan.loan_amount,
-                    'interest_rate': loan.interest_rate,
-                    'monthly_installment': loan.monthly_repayment,
-                    'repayments_left': repayments_left
-                })
-            return Response(data)
+            params = request.data if isinstance(request.data, dict) else {}
+            return customer_loans_response(customer_id, params)
         else:
             return Response({'error': 'Please provide either loan_id or customer_id'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -272,84 +491,50 @@ class UploadData(APIView):
             return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
         file_name = file.name.lower()
+        if not file_name.endswith(('.csv', '.xlsx')):
+            return Response({'error': 'Unsupported file type. Please upload CSV or XLSX files.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Spool to disk in chunks so neither this request nor the worker holds
+        # the whole file in memory; the worker streams it from there.
+        spool_dir = Path(settings.UPLOAD_SPOOL_DIR)
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        job_id = uuid.uuid4()
+        spool_path = spool_dir / f'{job_id}{Path(file_name).suffix}'
+        with open(spool_path, 'wb') as spool:
+            for chunk in file.chunks():
+                spool.write(chunk)
+
+        job = UploadJob.objects.create(id=job_id, file_name=file.name, spool_path=str(spool_path))
+        transaction.on_commit(lambda: process_upload.delay(str(job.id)))
+        return Response({
+            'job_id': str(job.id),
+            'status': job.status,
+            'status_url': reverse('upload-status', args=[job.id]),
+            'message': 'Upload received. Poll status_url for progress.',
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class UploadStatus(APIView):
+    def get(self, request, job_id):
         try:
-            if file_name.endswith('.csv'):
-                file_data = io.StringIO(file.read().decode('utf-8'))
-                reader = csv.reader(file_data)
-                header = next(reader)
-                data = list(reader)
-            elif file_name.endswith('.xlsx'):
-                wb = openpyxl.load_workbook(file)
-                sheet = wb.active
-                header = [cell.value for cell in list(sheet.rows)[0]]
-                data = [list(row) for row in sheet.iter_rows(min_row=2, values_only=True)]
-            else:
-                return Response({'error': 'Unsupported file type. Please upload CSV or XLSX files.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Check first row to determine type
-            if len(header) == 7:
-                # Customer data
-                customer_count = 0
-                for row in data:
-                    if len(row) < 7:
-                        continue
-                    try:
-                        customer_id, first_name, last_name, age, phone_number, monthly_salary, approved_limit = row[:7]
-                        Customer.objects.get_or_create(
-                            customer_id=int(customer_id),
-                            defaults={
-                                'first_name': first_name,
-                                'last_name': last_name,
-                                'phone_number': phone_number,
-                                'monthly_salary': float(monthly_salary),
-                                'approved_limit': float(approved_limit),
-                                'current_debt': 0,
-                                'age': int(age),
-                            }
-                        )
-                        customer_count += 1
-                    except Exception as e:
-                        pass  # Skip invalid rows
-                return Response({'message': f'Customer data uploaded successfully. {customer_count} customers imported.'})
-            elif len(header) == 9:
-                # Loan data
-                loan_count = 0
-                skipped_count = 0
-                for row in data:
-                    if len(row) < 9:
-                        continue
-                    try:
-                        customer_id, loan_id, loan_amount, tenure, interest_rate, monthly_repayment, emis_paid_on_time, start_date, end_date = row[:9]
-                        # Handle date parsing
-                        if isinstance(start_date, str):
-                            start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
-                        elif isinstance(start_date, datetime.datetime):
-                            start_date = start_date.date()
-                        if isinstance(end_date, str):
-                            end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
-                        elif isinstance(end_date, datetime.datetime):
-                            end_date = end_date.date()
-                        customer = Customer.objects.get(customer_id=int(customer_id))
-                        Loan.objects.get_or_create(
-                            loan_id=int(loan_id),
-                            defaults={
-                                'customer': customer,
-                                'loan_amount': float(loan_amount),
-                                'tenure': int(tenure),
-                                'interest_rate': float(interest_rate),
-                                'monthly_repayment': float(monthly_repayment),
-                                'emis_paid_on_time': int(emis_paid_on_time),
-                                'start_date': start_date,
-                                'end_date': end_date,
-                            }
-                        )
-                        loan_count += 1
-                    except Customer.DoesNotExist:
-                        skipped_count += 1
-                    except Exception as e:
-                        pass  # Skip invalid rows
-                return Response({'message': f'Loan data uploaded successfully. {loan_count} loans imported, {skipped_count} skipped (customer not found).'})
-
-            return Response({'message': 'Data uploaded successfully'})
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            job = UploadJob.objects.get(pk=job_id)
+        except UploadJob.DoesNotExist:
+            return Response({'error': 'Upload job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'job_id': str(job.id),
+            'file_name': job.file_name,
+            'kind': job.kind,
+            'status': job.status,
+            'rows_processed': job.rows_processed,
+            'inserted': job.inserted,
+            'updated': job.updated,
+            'skipped': job.skipped,
+            'failed': job.failed,
+            'errors': job.errors,
+            'rows_per_second': job.rows_per_second(timezone.now()),
+            'message': job.message,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+        })